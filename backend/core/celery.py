@@ -1,9 +1,18 @@
 # backend/core/celery.py
 import os
 from celery import Celery
+from celery.schedules import crontab
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 app = Celery('eld_system')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+app.conf.beat_schedule = {
+    # Each zone rolls over at its own local midnight; the dispatcher picks the zones
+    'eld-midnight-rollover': {
+        'task': 'eld.tasks.dispatch_rollovers',
+        'schedule': crontab(minute='*/15'),
+    },
+}
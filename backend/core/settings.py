@@ -168,6 +168,22 @@ CACHES = {
         'LOCATION': 'unique-snowflake',
     }
 }
+# HOS engine: seconds before buffered cycle hours are written to driver profiles
+HOS_CYCLE_FLUSH_SECONDS = 30
+# Memory ceiling of the in-process compliance report cache. Writes in a process drop its
+# entries at once; other processes see them through the duty revision stored on the
+# driver's HOS state, re-read once an entry was last checked this many seconds ago.
+HOS_COMPLIANCE_CACHE_BYTES = 4 * 1024 * 1024
+HOS_COMPLIANCE_CACHE_REVALIDATE_SECONDS = 5
+
+# Celery: without a broker URL, tasks run in-process (CELERY_TASK_ALWAYS_EAGER)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='memory://')
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=CELERY_BROKER_URL == 'memory://', cast=bool)
+CELERY_TIMEZONE = 'UTC'
+# Midnight rollover: drivers of each zone are split by id over this many tasks
+ELD_ROLLOVER_SHARDS = config('ELD_ROLLOVER_SHARDS', default=4, cast=int)
+ELD_ROLLOVER_BATCH_SIZE = 500
+
 # ✅ Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -4,3 +4,6 @@ class EldConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'eld'
     verbose_name = 'ELD System'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,232 @@
+# backend/eld/grid.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db.models import Q
+
+from .models import DailyLog, DailyLogGrid, DutyStatusChange
+from .timeline import STATUS_CODES, STATUSES, DutyTimeline, to_micros
+from .timezones import driver_now
+
+MINUTES_PER_DAY = 1440
+UNRECORDED = 255  # minute not covered by any status
+MICROS_PER_MINUTE = 60 * 10**6
+
+
+class DayGrid:
+    """
+    One day as 1440 status codes (uint8), one per minute from midnight.
+    Totals, rendering segments, 15-minute rounding and day-to-day
+    comparisons are array operations on that vector. A minute takes the
+    status in force at its start, so adjacent periods tile exactly.
+    """
+
+    def __init__(self, date, minutes=None):
+        self.date = date
+        if minutes is None:
+            minutes = np.full(MINUTES_PER_DAY, UNRECORDED, dtype=np.uint8)
+        self.minutes = minutes
+
+    @property
+    def midnight(self):
+        return datetime.combine(self.date, datetime.min.time())
+
+    @classmethod
+    def from_timeline(cls, timeline, date):
+        grid = cls(date)
+        day = timeline.clip_to_day(date)
+        midnight = to_micros(grid.midnight)
+        first = (day.start - midnight) // MICROS_PER_MINUTE
+        last = (day.end - midnight) // MICROS_PER_MINUTE
+        lengths = last - first
+        # Minute indices of every period laid end to end; later periods win
+        offsets = np.cumsum(lengths) - lengths
+        slots = np.repeat(first - offsets, lengths) + np.arange(lengths.sum())
+        grid.minutes[slots] = np.repeat(day.status.astype(np.uint8), lengths)
+        return grid
+
+    @classmethod
+    def from_bytes(cls, date, data):
+        return cls(date, np.frombuffer(bytes(data), dtype=np.uint8).copy())
+
+    def to_bytes(self):
+        return self.minutes.tobytes()
+
+    @classmethod
+    def for_log(cls, daily_log, current_time=None):
+        """
+        The log's stored grid with the open status up to current_time. A log
+        without a stored grid gets it computed, not saved: reads never write.
+        """
+        return cls.for_logs([daily_log], current_time)[0]
+
+    @classmethod
+    def for_logs(cls, daily_logs, current_time=None):
+        """for_log of each log; the ones without a stored grid are built with one query"""
+        daily_logs = list(daily_logs)
+        missing = []
+        for daily_log in daily_logs:
+            try:
+                daily_log.minute_grid
+            except DailyLogGrid.DoesNotExist:
+                missing.append(daily_log)
+        built = {daily_log.pk: rest for daily_log, *rest in build_grids(missing)}
+
+        grids = []
+        for daily_log in daily_logs:
+            if daily_log.pk in built:
+                grid, open_status, open_since = built[daily_log.pk]
+            else:
+                stored = daily_log.minute_grid
+                grid, open_status, open_since = cls.from_bytes(daily_log.date, stored.minutes), stored.open_status, stored.open_since
+            if open_status:
+                grid = grid.overlay(open_status, open_since, current_time or driver_now(daily_log.driver))
+            grids.append(grid)
+        return grids
+
+    def minute_of(self, value):
+        minute = (to_micros(value) - to_micros(self.midnight)) // MICROS_PER_MINUTE
+        return int(min(max(minute, 0), MINUTES_PER_DAY))
+
+    def overlay(self, status, start_time, end_time):
+        """Copy with status painted over start_time..end_time"""
+        minutes = self.minutes.copy()
+        minutes[self.minute_of(start_time):self.minute_of(end_time)] = STATUS_CODES[status]
+        return DayGrid(self.date, minutes)
+
+    def totals(self):
+        """Minutes per status, every status present"""
+        recorded = self.minutes[self.minutes != UNRECORDED]
+        counts = np.bincount(recorded, minlength=len(STATUSES))
+        return {status: int(counts[code]) for status, code in STATUS_CODES.items()}
+
+    def segments(self):
+        """(status, first minute, end minute) runs of recorded minutes"""
+        changes = np.flatnonzero(np.diff(self.minutes)) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes, [MINUTES_PER_DAY]))
+        codes = self.minutes[starts]
+        keep = codes != UNRECORDED
+        return [
+            (STATUSES[code], int(start), int(end))
+            for code, start, end in zip(codes[keep], starts[keep], ends[keep])
+        ]
+
+    def first_recorded(self):
+        recorded = np.flatnonzero(self.minutes != UNRECORDED)
+        return int(recorded[0]) if len(recorded) else None
+
+    def rounded(self, step=15):
+        """Each step-minute block takes the status covering most of it"""
+        blocks = self.minutes.reshape(-1, step)
+        counts = np.stack([(blocks == code).sum(axis=1) for code in range(len(STATUSES))], axis=1)
+        codes = np.where(counts.any(axis=1), counts.argmax(axis=1), UNRECORDED).astype(np.uint8)
+        return DayGrid(self.date, np.repeat(codes, step))
+
+    def diff(self, other):
+        """Minutes whose status differs between two grids"""
+        return np.flatnonzero(self.minutes != other.minutes)
+
+    def hourly(self):
+        """Legacy grid_data shape: which statuses occur in each hour"""
+        hours = self.minutes.reshape(24, 60)
+        present = {status: (hours == code).any(axis=1) for status, code in STATUS_CODES.items()}
+        return {
+            str(hour).zfill(2): {
+                **{status: bool(present[status][hour]) for status in STATUS_CODES},
+                'location': '',
+                'notes': '',
+            }
+            for hour in range(24)
+        }
+
+    def as_json(self):
+        return {
+            'segments': [list(segment) for segment in self.segments()],
+            'totals': {status: round(minutes / 60, 2) for status, minutes in self.totals().items()},
+        }
+
+
+def store_grid(daily_log):
+    """Rebuild and save the grid of a log from every period of the driver touching its day"""
+    midnight = datetime.combine(daily_log.date, datetime.min.time())
+    timeline = DutyTimeline.from_queryset(DutyStatusChange.objects.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=midnight),
+        daily_log__driver_id=daily_log.driver_id,
+        start_time__lt=midnight + timedelta(days=1),
+    ))
+    grid = DayGrid.from_timeline(timeline.closed, daily_log.date)
+
+    open_periods = timeline.select(timeline.open)
+    open_status, open_since = None, None
+    if len(open_periods):
+        open_status, open_since, _ = open_periods[len(open_periods) - 1]
+
+    stored, _ = DailyLogGrid.objects.update_or_create(
+        daily_log=daily_log,
+        defaults={'minutes': grid.to_bytes(), 'open_status': open_status, 'open_since': open_since}
+    )
+    daily_log.minute_grid = stored
+    return stored
+
+
+def build_grids(daily_logs):
+    """
+    (daily_log, DayGrid, open status, open since) of each log from one query
+    over its drivers' periods covering the days between the first and last
+    log. Migration 0009 keeps a frozen copy.
+    """
+    daily_logs = list(daily_logs)
+    if not daily_logs:
+        return []
+    dates = [daily_log.date for daily_log in daily_logs]
+    first_midnight = datetime.combine(min(dates), datetime.min.time())
+    last_midnight = datetime.combine(max(dates) + timedelta(days=1), datetime.min.time())
+    rows = DutyStatusChange.objects.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=first_midnight),
+        daily_log__driver_id__in={daily_log.driver_id for daily_log in daily_logs},
+        start_time__lt=last_midnight,
+    ).order_by('daily_log__driver_id', 'start_time', 'id').values_list(
+        'daily_log__driver_id', 'status', 'start_time', 'end_time'
+    )
+
+    periods, open_periods = defaultdict(list), defaultdict(list)
+    for driver_id, status, start_time, end_time in rows:
+        periods[driver_id].append((status, start_time, end_time))
+        if end_time is None:
+            open_periods[driver_id].append((status, start_time))
+    timelines = {driver_id: DutyTimeline.from_rows(rows).closed for driver_id, rows in periods.items()}
+
+    grids = []
+    for daily_log in daily_logs:
+        timeline = timelines.get(daily_log.driver_id, DutyTimeline.from_rows([]))
+        tomorrow = datetime.combine(daily_log.date + timedelta(days=1), datetime.min.time())
+        started = [period for period in open_periods[daily_log.driver_id] if period[1] < tomorrow]
+        open_status, open_since = started[-1] if started else (None, None)
+        grids.append((daily_log, DayGrid.from_timeline(timeline, daily_log.date), open_status, open_since))
+    return grids
+
+
+def store_grids(daily_logs):
+    """store_grid for many logs: build_grids, then one upsert of the grids"""
+    return DailyLogGrid.objects.bulk_create(
+        [
+            DailyLogGrid(daily_log=daily_log, minutes=grid.to_bytes(), open_status=open_status, open_since=open_since)
+            for daily_log, grid, open_status, open_since in build_grids(daily_logs)
+        ],
+        update_conflicts=True, unique_fields=['daily_log'],
+        update_fields=['minutes', 'open_status', 'open_since', 'updated_at'],
+    )
+
+
+def refresh_grids(driver_id, start_time, end_time=None):
+    """
+    Rebuild the stored grids of the driver's logs for every day in
+    start_time..end_time; without end_time (an open period) every later day
+    """
+    logs = DailyLog.objects.filter(driver_id=driver_id, date__gte=start_time.date())
+    if end_time is not None:
+        logs = logs.filter(date__lte=end_time.date())
+    for daily_log in logs:
+        store_grid(daily_log)
@@ -0,0 +1,55 @@
+# backend/eld/management/commands/daily_log_totals.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from eld.models import DailyLog
+from eld.totals import SUMMARY_FIELDS, stale_logs, store_totals
+
+
+class Command(BaseCommand):
+    help = 'Check the stored per-day totals of every daily log against its status changes, and rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rewrite the totals that differ instead of only reporting them',
+        )
+        parser.add_argument('--driver', type=int, help='Only the logs of this driver id')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Drivers whose logs are checked per query (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        logs = DailyLog.objects.only('id', 'driver_id', 'date', *SUMMARY_FIELDS).order_by('driver_id', 'date')
+        if options['driver']:
+            logs = logs.filter(driver_id=options['driver'])
+        driver_ids = list(logs.values_list('driver_id', flat=True).distinct().order_by('driver_id'))
+
+        checked, stale_count = 0, 0
+        for index in range(0, len(driver_ids), options['batch_size']):
+            batch = list(logs.filter(driver_id__in=driver_ids[index:index + options['batch_size']]))
+            checked += len(batch)
+            if options['rebuild']:
+                with transaction.atomic():
+                    stale_count += len(store_totals(batch))
+                continue
+            for daily_log, summary in stale_logs(batch):
+                stale_count += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Log {daily_log.id} (driver {daily_log.driver_id}, {daily_log.date}): '
+                    + ', '.join(
+                        f'{field} {getattr(daily_log, field)} != {value}'
+                        for field, value in summary.items() if getattr(daily_log, field) != value
+                    )
+                ))
+
+        if options['rebuild']:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the totals of {stale_count} of {checked} logs'))
+        elif stale_count:
+            raise CommandError(f'{stale_count} of {checked} logs have stale totals; run with --rebuild')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {checked} logs have up-to-date totals'))
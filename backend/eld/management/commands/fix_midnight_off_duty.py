@@ -1,8 +1,106 @@
 # backend/eld/management/commands/fix_midnight_off_duty.py
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
 from django.core.management.base import BaseCommand
-from django.utils import timezone
+from django.db import connections, transaction
+from django.db.models import F, Max, Min, Q
+
+from eld.grid import store_grids
 from eld.models import DailyLog, DutyStatusChange
-from datetime import datetime
+from eld.rollover import drivers_in_zone, rollover_zones
+from eld.timezones import local_now, utc_now
+from eld.totals import store_totals
+from hos.models import DriverHOSState
+
+
+class MidnightOffDutyRepair:
+    """
+    Adds the automatic Off Duty from midnight to logs whose first status
+    starts later. Candidates come from one annotated query (earliest status
+    change per log after the log's midnight); a log that already has the
+    automatic Off Duty starts at midnight and drops out of it. Candidates are
+    read in id order, batch by batch, and each batch is inserted with one
+    bulk_create in its own transaction.
+    """
+
+    def __init__(self, dates=None, driver_range=None, batch_size=1000, dry_run=False, utc=None):
+        self.dates = dates  # None for every day; 'today' for each driver's local today at utc
+        self.utc = utc
+        self.driver_range = driver_range  # (first, last) driver id, inclusive
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+    def candidates(self):
+        logs = DailyLog.objects.annotate(first_start=Min('status_changes__start_time')).filter(
+            Q(first_start__date__gt=F('date')) | Q(first_start__date=F('date'), first_start__time__gt=datetime.min.time())
+        )
+        if self.dates == 'today':
+            utc = self.utc or utc_now()
+            today = Q()
+            for zone in rollover_zones():
+                today |= drivers_in_zone(zone, 'driver') & Q(date=local_now(zone, utc).date())
+            logs = logs.filter(today)
+        elif self.dates is not None:
+            logs = logs.filter(date__in=self.dates)
+        if self.driver_range is not None:
+            logs = logs.filter(driver_id__gte=self.driver_range[0], driver_id__lte=self.driver_range[1])
+        return logs.order_by('id').values_list('id', 'driver_id', 'date', 'first_start')
+
+    def run(self):
+        """(logs fixed, drivers touched); with dry_run, the logs that would be"""
+        fixed, drivers, last_id = 0, set(), 0
+        while True:
+            batch = list(self.candidates().filter(id__gt=last_id)[:self.batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            if not self.dry_run:
+                self.write(batch)
+            fixed += len(batch)
+            drivers.update(driver_id for _, driver_id, _, _ in batch)
+        return fixed, len(drivers)
+
+    def write(self, batch):
+        with transaction.atomic():
+            DutyStatusChange.objects.bulk_create([
+                DutyStatusChange(
+                    daily_log_id=log_id,
+                    status='off_duty',
+                    start_time=datetime.combine(date, datetime.min.time()),
+                    end_time=first_start,
+                    location='Automatic - Start of Day',
+                    notes='Automatically created: Off Duty from Midnight (00:00) - FIXED'
+                )
+                for log_id, _, date, first_start in batch
+            ])
+            # bulk_create skips the status change signals
+            daily_logs = list(DailyLog.objects.filter(id__in=[log_id for log_id, _, _, _ in batch]))
+            store_totals(daily_logs)
+            store_grids(daily_logs)
+            driver_ids = {driver_id for _, driver_id, _, _ in batch}
+            # History changed before the counters' start: rebuilt on the next read,
+            # under a new state id that no cached report matches
+            DriverHOSState.objects.filter(driver_id__in=driver_ids).delete()
+
+
+def close_connections():
+    """Worker initializer: forked workers open their own connections, never the parent's"""
+    connections.close_all()
+
+
+def repair_drivers(dates, driver_range, batch_size, dry_run, utc):
+    """Worker process entry point: one driver id range"""
+    return MidnightOffDutyRepair(dates, driver_range, batch_size, dry_run, utc).run()
+
+
+def driver_ranges(first, last, workers):
+    """Split first..last (inclusive) into at most workers contiguous ranges"""
+    size = max(1, -(-(last - first + 1) // workers))
+    return [(start, min(start + size - 1, last)) for start in range(first, last + 1, size)]
+
 
 class Command(BaseCommand):
     help = 'Fix existing logs to start Off Duty from midnight (00:00) instead of first status time'
@@ -11,99 +109,79 @@ class Command(BaseCommand):
         parser.add_argument(
             '--date',
             type=str,
-            help='Specific date to fix (YYYY-MM-DD format). If not provided, fixes today\'s logs.',
+            help='Specific date to fix (YYYY-MM-DD format). If not provided, fixes each driver\'s today at their home terminal.',
         )
         parser.add_argument(
             '--all',
             action='store_true',
             help='Fix all logs in the database',
         )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the logs that would be fixed',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Logs fixed per bulk insert and transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes, each taking a range of driver ids (default: 1)',
+        )
 
     def handle(self, *args, **options):
         """
         This command fixes existing logs to have Off Duty starting from midnight (00:00)
         instead of starting from the time of the first status change
         """
-        
+
         # Determine which logs to fix
         if options['all']:
-            daily_logs = DailyLog.objects.all()
+            dates = None
             self.stdout.write(self.style.WARNING('Fixing ALL logs in database...'))
         elif options['date']:
             try:
                 target_date = datetime.strptime(options['date'], '%Y-%m-%d').date()
-                daily_logs = DailyLog.objects.filter(date=target_date)
+                dates = [target_date]
                 self.stdout.write(self.style.WARNING(f'Fixing logs for date: {target_date}'))
             except ValueError:
                 self.stdout.write(self.style.ERROR('Invalid date format. Use YYYY-MM-DD'))
                 return
         else:
-            today = timezone.now().date()
-            daily_logs = DailyLog.objects.filter(date=today)
-            self.stdout.write(self.style.WARNING(f'Fixing today\'s logs: {today}'))
-        
-        fixed_count = 0
-        skipped_count = 0
-        
-        for daily_log in daily_logs:
-            # Get all status changes for this log, ordered by start time
-            status_changes = DutyStatusChange.objects.filter(
-                daily_log=daily_log
-            ).order_by('start_time')
-            
-            if not status_changes.exists():
-                self.stdout.write(f'  ⏭️  Skipped log {daily_log.id} - No status changes')
-                skipped_count += 1
-                continue
-            
-            first_status = status_changes.first()
-            
-            # Calculate midnight for this log's date
-            midnight = timezone.make_aware(
-                timezone.datetime.combine(daily_log.date, timezone.datetime.min.time())
-            )
-            
-            # Check if first status is already at midnight or is already off_duty from midnight
-            if first_status.start_time <= midnight or (
-                first_status.status == 'off_duty' and 
-                first_status.start_time == midnight
-            ):
-                self.stdout.write(f'  ⏭️  Skipped log {daily_log.id} - Already starts at midnight')
-                skipped_count += 1
-                continue
-            
-            # Check if there's already an automatic off_duty from midnight
-            existing_midnight_off_duty = status_changes.filter(
-                status='off_duty',
-                start_time=midnight,
-                location='Automatic - Start of Day'
-            ).first()
-            
-            if existing_midnight_off_duty:
-                self.stdout.write(f'  ⏭️  Skipped log {daily_log.id} - Already has midnight off_duty')
-                skipped_count += 1
-                continue
-            
-            # Create the automatic off_duty from midnight to first status
-            auto_off_duty = DutyStatusChange.objects.create(
-                daily_log=daily_log,
-                status='off_duty',
-                start_time=midnight,
-                end_time=first_status.start_time,
-                location='Automatic - Start of Day',
-                notes='Automatically created: Off Duty from Midnight (00:00) - FIXED'
-            )
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'  ✅ Fixed log {daily_log.id} for driver {daily_log.driver.username} '
-                    f'- Added Off Duty from {midnight.strftime("%H:%M")} to {first_status.start_time.strftime("%H:%M")}'
-                )
-            )
-            fixed_count += 1
-        
+            # Today is the driver's home-terminal day, not the server's
+            dates = 'today'
+            self.stdout.write(self.style.WARNING('Fixing today\'s logs of each driver\'s home terminal'))
+
+        started = time.perf_counter()
+        batch_size, dry_run, utc = options['batch_size'], options['dry_run'], utc_now()
+        if options['workers'] > 1:
+            bounds = DailyLog.objects.aggregate(first=Min('driver_id'), last=Max('driver_id'))
+            ranges = driver_ranges(bounds['first'], bounds['last'], options['workers']) if bounds['first'] else []
+            # Forked workers must not share the parent's connections: the parent
+            # closes its own, and each worker drops what it inherited first
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=len(ranges) or 1, mp_context=multiprocessing.get_context('fork'),
+                initializer=close_connections,
+            ) as executor:
+                results = list(executor.map(
+                    repair_drivers, [dates] * len(ranges), ranges, [batch_size] * len(ranges),
+                    [dry_run] * len(ranges), [utc] * len(ranges)
+                ))
+        else:
+            results = [MidnightOffDutyRepair(dates, None, batch_size, dry_run, utc).run()]
+
+        fixed_count = sum(fixed for fixed, _ in results)
+        driver_count = sum(drivers for _, drivers in results)
+        elapsed = time.perf_counter() - started
+        verb = 'Would fix' if dry_run else 'Fixed'
         self.stdout.write(
             self.style.SUCCESS(
-                f'\n📊 Summary: Fixed {fixed_count} logs, Skipped {skipped_count} logs'
+                f'\n📊 Summary: {verb} {fixed_count} logs of {driver_count} drivers in {elapsed:.1f}s'
             )
         )
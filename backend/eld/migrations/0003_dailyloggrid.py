@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld', '0002_dailylog_finalized_at_dailylog_from_location_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyLogGrid',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minutes', models.BinaryField()),
+                ('open_status', models.CharField(blank=True, choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty', 'On Duty (Not Driving)')], max_length=20, null=True)),
+                ('open_since', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('daily_log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='minute_grid', to='eld.dailylog')),
+            ],
+        ),
+    ]
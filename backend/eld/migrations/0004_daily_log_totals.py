@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld', '0003_dailyloggrid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailylog',
+            name='driving_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='first_status',
+            field=models.CharField(blank=True, choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty', 'On Duty (Not Driving)')], max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='last_status',
+            field=models.CharField(blank=True, choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty', 'On Duty (Not Driving)')], max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='off_duty_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='on_duty_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='open_status_change',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='eld.dutystatuschange'),
+        ),
+        migrations.AddField(
+            model_name='dailylog',
+            name='sleeper_berth_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def point_at_open_statuses(apps, schema_editor):
+    DutyStatusChange = apps.get_model('eld', 'DutyStatusChange')
+    DriverOpenStatus = apps.get_model('eld', 'DriverOpenStatus')
+    latest = {}
+    for change_id, driver_id in DutyStatusChange.objects.filter(
+        end_time__isnull=True
+    ).order_by('start_time', 'id').values_list('id', 'daily_log__driver_id'):
+        latest[driver_id] = change_id
+    DriverOpenStatus.objects.bulk_create([
+        DriverOpenStatus(driver_id=driver_id, status_change_id=change_id) for driver_id, change_id in latest.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_driverprofile_home_terminal_timezone'),
+        ('eld', '0004_daily_log_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverOpenStatus',
+            fields=[
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='open_status', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dutystatuschange',
+            index=models.Index(fields=['daily_log', 'start_time'], name='eld_change_log_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dutystatuschange',
+            index=models.Index(condition=models.Q(('end_time__isnull', True)), fields=['daily_log', 'start_time'], name='eld_change_open_idx'),
+        ),
+        migrations.AddField(
+            model_name='driveropenstatus',
+            name='status_change',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='eld.dutystatuschange'),
+        ),
+        migrations.RunPython(point_at_open_statuses, migrations.RunPython.noop),
+    ]
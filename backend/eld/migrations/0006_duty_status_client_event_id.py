@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld', '0005_open_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dutystatuschange',
+            name='client_event_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld', '0006_duty_status_client_event_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RolloverRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zone', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('shard', models.PositiveIntegerField(default=0)),
+                ('shards', models.PositiveIntegerField(default=1)),
+                ('statuses_closed', models.PositiveIntegerField(default=0)),
+                ('logs_created', models.PositiveIntegerField(default=0)),
+                ('duration_ms', models.FloatField()),
+                ('finished_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('zone', 'date', 'shard', 'shards')},
+            },
+        ),
+    ]
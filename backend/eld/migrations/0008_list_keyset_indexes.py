@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld', '0007_rollover_run'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailylog',
+            index=models.Index(fields=['date', 'id'], name='eld_log_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dutystatuschange',
+            index=models.Index(fields=['start_time', 'id'], name='eld_change_start_id_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import migrations
+from django.db.models import Q
+
+BATCH_SIZE = 500
+MINUTES_PER_DAY = 1440
+MINUTE = timedelta(minutes=1)
+UNRECORDED = 255  # minute not covered by any status
+STATUS_CODES = {
+    'off_duty': 0,
+    'sleeper_berth': 1,
+    'driving': 2,
+    'on_duty': 3,
+}
+
+
+def day_minutes(periods, date):
+    """The day's 1440 status codes, each the status in force at its start; later periods win"""
+    midnight = datetime.combine(date, datetime.min.time())
+    minutes = bytearray([UNRECORDED]) * MINUTES_PER_DAY
+    for status, start_time, end_time in periods:
+        first = max((start_time - midnight) // MINUTE, 0)
+        last = min((end_time - midnight) // MINUTE, MINUTES_PER_DAY)
+        if first < last:
+            minutes[first:last] = bytes([STATUS_CODES[status]]) * (last - first)
+    return bytes(minutes)
+
+
+def build_grids(daily_logs, DutyStatusChange):
+    """
+    A frozen copy of eld.grid.build_grids: (daily_log, minutes, open status,
+    open since) of each log from one query over its drivers' periods
+    """
+    dates = [daily_log.date for daily_log in daily_logs]
+    first_midnight = datetime.combine(min(dates), datetime.min.time())
+    last_midnight = datetime.combine(max(dates) + timedelta(days=1), datetime.min.time())
+    rows = DutyStatusChange.objects.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=first_midnight),
+        daily_log__driver_id__in={daily_log.driver_id for daily_log in daily_logs},
+        start_time__lt=last_midnight,
+    ).order_by('daily_log__driver_id', 'start_time', 'id').values_list(
+        'daily_log__driver_id', 'status', 'start_time', 'end_time'
+    )
+
+    periods, open_periods = defaultdict(list), defaultdict(list)
+    for driver_id, status, start_time, end_time in rows:
+        if end_time is None:
+            open_periods[driver_id].append((status, start_time))
+        else:
+            periods[driver_id].append((status, start_time, end_time))
+
+    grids = []
+    for daily_log in daily_logs:
+        tomorrow = datetime.combine(daily_log.date + timedelta(days=1), datetime.min.time())
+        started = [period for period in open_periods[daily_log.driver_id] if period[1] < tomorrow]
+        open_status, open_since = started[-1] if started else (None, None)
+        grids.append((daily_log, day_minutes(periods[daily_log.driver_id], daily_log.date), open_status, open_since))
+    return grids
+
+
+def store_missing_grids(apps, schema_editor):
+    """Grids of the logs created before 0003: DayGrid.for_log only computes missing ones"""
+    DailyLog = apps.get_model('eld', 'DailyLog')
+    DailyLogGrid = apps.get_model('eld', 'DailyLogGrid')
+    DutyStatusChange = apps.get_model('eld', 'DutyStatusChange')
+    missing = DailyLog.objects.filter(minute_grid__isnull=True).order_by('driver_id', 'date')
+    while True:
+        # In driver order, so each batch's period query spans few drivers
+        batch = list(missing[:BATCH_SIZE])
+        if not batch:
+            break
+        DailyLogGrid.objects.bulk_create([
+            DailyLogGrid(daily_log=daily_log, minutes=minutes, open_status=open_status, open_since=open_since)
+            for daily_log, minutes, open_status, open_since in build_grids(batch, DutyStatusChange)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld', '0008_list_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(store_missing_grids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import migrations
+
+BATCH_SIZE = 100  # drivers per batch
+MINUTES_PER_DAY = 1440
+MINUTE = timedelta(minutes=1)
+TOTAL_FIELDS = {
+    'off_duty': 'off_duty_minutes',
+    'sleeper_berth': 'sleeper_berth_minutes',
+    'driving': 'driving_minutes',
+    'on_duty': 'on_duty_minutes',
+}
+SUMMARY_FIELDS = tuple(TOTAL_FIELDS.values()) + ('first_status', 'last_status', 'open_status_change')
+
+
+def day_minutes(periods, date):
+    """The day's 1440 minutes, each the status in force at its start (None if unrecorded); later periods win"""
+    midnight = datetime.combine(date, datetime.min.time())
+    minutes = [None] * MINUTES_PER_DAY
+    for status, start_time, end_time in periods:
+        first = max((start_time - midnight) // MINUTE, 0)
+        last = min((end_time - midnight) // MINUTE, MINUTES_PER_DAY)
+        if first < last:
+            minutes[first:last] = [status] * (last - first)
+    return minutes
+
+
+def store_totals(apps, schema_editor):
+    """
+    Totals of the logs created before 0004, which added them as zeros: the
+    closed minutes per status of the day, its first and last status and the
+    driver's open status change. A frozen copy of eld.totals, batch by batch
+    of drivers with one query for their periods.
+    """
+    DailyLog = apps.get_model('eld', 'DailyLog')
+    DutyStatusChange = apps.get_model('eld', 'DutyStatusChange')
+    driver_ids = sorted(set(DailyLog.objects.values_list('driver_id', flat=True)))
+    for index in range(0, len(driver_ids), BATCH_SIZE):
+        batch = driver_ids[index:index + BATCH_SIZE]
+        logs = list(DailyLog.objects.filter(driver_id__in=batch))
+        last_midnight = {}
+        for daily_log in logs:
+            tomorrow = datetime.combine(daily_log.date + timedelta(days=1), datetime.min.time())
+            last_midnight[daily_log.driver_id] = max(last_midnight.get(daily_log.driver_id, tomorrow), tomorrow)
+
+        by_day, open_changes = defaultdict(list), {}
+        rows = DutyStatusChange.objects.filter(daily_log__driver_id__in=batch).order_by(
+            'daily_log__driver_id', 'start_time', 'id'
+        ).values_list('daily_log__driver_id', 'id', 'status', 'start_time', 'end_time')
+        for driver_id, change_id, status, start_time, end_time in rows:
+            if end_time is None:
+                if start_time < last_midnight[driver_id]:
+                    open_changes[driver_id] = (change_id, status, start_time)
+                continue
+            # Every day the closed period touches
+            date = start_time.date()
+            while datetime.combine(date, datetime.min.time()) < end_time:
+                by_day[(driver_id, date)].append((status, start_time, end_time))
+                date += timedelta(days=1)
+
+        for daily_log in logs:
+            minutes = day_minutes(by_day[(daily_log.driver_id, daily_log.date)], daily_log.date)
+            recorded = [status for status in minutes if status is not None]
+            for status, field in TOTAL_FIELDS.items():
+                setattr(daily_log, field, recorded.count(status))
+            tomorrow = datetime.combine(daily_log.date + timedelta(days=1), datetime.min.time())
+            open_change = open_changes.get(daily_log.driver_id)
+            if open_change is not None and open_change[2] >= tomorrow:
+                open_change = None
+            daily_log.first_status = recorded[0] if recorded else (open_change[1] if open_change else None)
+            daily_log.last_status = open_change[1] if open_change else (recorded[-1] if recorded else None)
+            daily_log.open_status_change_id = open_change[0] if open_change else None
+        DailyLog.objects.bulk_update(logs, SUMMARY_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld', '0009_backfill_daily_log_grids'),
+    ]
+
+    operations = [
+        migrations.RunPython(store_totals, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
 # backend/eld/models.py - Version complète
-from django.db import models
+from django.db import models, transaction
 from users.models import CustomUser, Company
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -66,6 +66,18 @@ class DailyLog(models.Model):
     is_certified = models.BooleanField(default=False)
     certified_at = models.DateTimeField(null=True, blank=True)
     
+    # Totals of the day, kept up to date with every status change write
+    # (closed time only; the open status is counted by the reader)
+    off_duty_minutes = models.PositiveIntegerField(default=0)
+    sleeper_berth_minutes = models.PositiveIntegerField(default=0)
+    driving_minutes = models.PositiveIntegerField(default=0)
+    on_duty_minutes = models.PositiveIntegerField(default=0)
+    first_status = models.CharField(max_length=20, choices=DUTY_STATUS, null=True, blank=True)
+    last_status = models.CharField(max_length=20, choices=DUTY_STATUS, null=True, blank=True)
+    open_status_change = models.ForeignKey(
+        'DutyStatusChange', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -73,25 +85,26 @@ class DailyLog(models.Model):
         verbose_name = "Driver's Daily Log"
         verbose_name_plural = "Driver's Daily Logs"
         unique_together = ['driver', 'date']
-    
-    def generate_grid_data(self):
-        """Génère la structure de grille exacte comme dans blank-paper-log.png"""
-        grid = {}
-        for hour in range(24):
-            grid[str(hour).zfill(2)] = {
-                'off_duty': hour >= 22 or hour < 6,  # Exemple: off-duty la nuit
-                'sleeper_berth': False,
-                'driving': hour >= 6 and hour < 18,  # Exemple: driving de jour
-                'on_duty': hour >= 18 and hour < 22, # Exemple: on-duty le soir
-                'location': '',
-                'notes': ''
-            }
-        return grid
+        indexes = [
+            # Keyset pages of the log list across drivers, newest first
+            models.Index(fields=['date', 'id'], name='eld_log_date_id_idx'),
+        ]
     
     def save(self, *args, **kwargs):
-        if not self.grid_data:
-            self.grid_data = self.generate_grid_data()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                # A status left open on an earlier day already covers the new day
+                from .grid import store_grids
+                from .totals import store_totals
+                store_totals([self])
+                store_grids([self])
+    
+    def generate_grid_data(self, current_time=None):
+        """Structure de grille horaire (blank-paper-log.png), dérivée de la grille minute"""
+        from .grid import DayGrid
+        return DayGrid.for_log(self, current_time).hourly()
     
     def __str__(self):
         return f"Daily Log - {self.driver.get_full_name()} - {self.date}"
@@ -103,6 +116,29 @@ class DutyStatusChange(models.Model):
     end_time = models.DateTimeField(null=True, blank=True)
     location = models.CharField(max_length=255)
     notes = models.TextField(blank=True, null=True)
+    # Set by in-cab devices syncing offline changes, so a retried batch is applied once
+    client_event_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Days covered when loaded, so a moved period also refreshes the days it left
+        instance._loaded_range = (instance.__dict__.get('start_time'), instance.__dict__.get('end_time'))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # The post_save handlers update the day totals inside this transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def touched_range(self):
+        """(start, end) covering the period now and as loaded; end None while open"""
+        starts, ends = [self.start_time], [self.end_time]
+        loaded_start, loaded_end = getattr(self, '_loaded_range', (None, None))
+        if loaded_start is not None:
+            starts.append(loaded_start)
+            ends.append(loaded_end)
+        return min(starts), None if None in ends else max(ends)
     
     def duration_hours(self):
         if self.end_time:
@@ -111,6 +147,63 @@ class DutyStatusChange(models.Model):
     
     def __str__(self):
         return f"{self.get_status_display()} at {self.location}"
+    
+    class Meta:
+        indexes = [
+            # Duty history of a driver's logs from a start time on (HOS engine, timelines)
+            models.Index(fields=['daily_log', 'start_time'], name='eld_change_log_start_idx'),
+            # Open statuses only: a handful of rows however long the history
+            models.Index(
+                fields=['daily_log', 'start_time'], name='eld_change_open_idx',
+                condition=models.Q(end_time__isnull=True)
+            ),
+            # Keyset pages of the status change list across drivers
+            models.Index(fields=['start_time', 'id'], name='eld_change_start_id_idx'),
+        ]
+
+class DriverOpenStatus(models.Model):
+    """
+    The driver's current open status change, so finding it is a primary-key
+    fetch. Kept in the same transaction as every status change write; when
+    several changes are open it points at the latest.
+    """
+    driver = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='open_status')
+    status_change = models.OneToOneField(DutyStatusChange, on_delete=models.CASCADE, related_name='+')
+    
+    @classmethod
+    def current(cls, driver):
+        """The driver's open DutyStatusChange or None"""
+        pointer = cls.objects.select_related('status_change').filter(pk=driver.pk).first()
+        return pointer.status_change if pointer else None
+    
+    @classmethod
+    def refresh(cls, driver_id):
+        """Point at the driver's latest open status change, or drop the pointer"""
+        change_id = DutyStatusChange.objects.filter(
+            daily_log__driver_id=driver_id, end_time__isnull=True
+        ).order_by('-start_time', '-id').values_list('id', flat=True).first()
+        if change_id is None:
+            cls.objects.filter(pk=driver_id).delete()
+        else:
+            cls.objects.update_or_create(driver_id=driver_id, defaults={'status_change_id': change_id})
+    
+    def __str__(self):
+        return f"Open status of {self.driver.username}"
+
+class DailyLogGrid(models.Model):
+    """
+    Packed 24-hour grid of a log's day: one status byte per minute, 1440
+    bytes. Holds closed periods only; the open status is overlaid on read.
+    Rebuilt when a status change touching the day is saved or deleted.
+    """
+    daily_log = models.OneToOneField(DailyLog, on_delete=models.CASCADE, related_name='minute_grid')
+    minutes = models.BinaryField()
+    open_status = models.CharField(max_length=20, choices=DailyLog.DUTY_STATUS, null=True, blank=True)
+    open_since = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Grid for {self.daily_log}"
 
 class LogCertification(models.Model):
     daily_log = models.OneToOneField(DailyLog, on_delete=models.CASCADE)
@@ -120,4 +213,24 @@ class LogCertification(models.Model):
     user_agent = models.TextField()
     
     def __str__(self):
-        return f"Certification for {self.daily_log}"
\ No newline at end of file
+        return f"Certification for {self.daily_log}"
+
+class RolloverRun(models.Model):
+    """
+    One midnight rollover of a time-zone bucket (a zone and a shard of its
+    drivers), with what it did and how long it took
+    """
+    zone = models.CharField(max_length=50)
+    date = models.DateField()  # the zone's new day
+    shard = models.PositiveIntegerField(default=0)
+    shards = models.PositiveIntegerField(default=1)
+    statuses_closed = models.PositiveIntegerField(default=0)
+    logs_created = models.PositiveIntegerField(default=0)
+    duration_ms = models.FloatField()
+    finished_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Rollover {self.zone} {self.date} shard {self.shard}/{self.shards}"
+    
+    class Meta:
+        unique_together = ['zone', 'date', 'shard', 'shards']
@@ -0,0 +1,74 @@
+# backend/eld/pagination.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first keyset pagination on (ordering_field, id). The cursor holds
+    the last row's field value and id, so every page is one range scan of
+    the (field, id) index however deep the client pages. Every list is
+    paginated, page_size pages by default and never more than max_page_size.
+    """
+    ordering_field = None
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        self.request = request
+        self.field = queryset.model._meta.get_field(self.ordering_field)
+        try:
+            page_size = int(params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        page_size = min(max(page_size, 1), self.max_page_size)
+
+        queryset = queryset.order_by(f'-{self.ordering_field}', '-id')
+        position = self.decode_cursor(params.get(self.cursor_query_param))
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{self.ordering_field}__lt': value}) | Q(**{self.ordering_field: value, 'id__lt': pk})
+            )
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [self.field.value_to_string(last), last.pk]
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return self.field.to_python(value), int(pk)
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+
+class DailyLogPagination(KeysetPagination):
+    ordering_field = 'date'
+
+
+class DutyStatusChangePagination(KeysetPagination):
+    ordering_field = 'start_time'
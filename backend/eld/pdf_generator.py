@@ -6,6 +6,7 @@ import io
 from datetime import datetime
 from django.utils import timezone
 import pytz
+from .grid import DayGrid
 
 # ✅ Define colors for each duty status
 OFF_DUTY_COLOR = Color(0.7, 0.7, 0.7)      # Light grey
@@ -332,8 +333,9 @@ class FMCSAPDFGenerator:
                 pdf.line(total_col_x, y_line, total_col_x + total_col_width, y_line)
             
             # ===== REMPLISSAGE =====
-            self._draw_total_hours(pdf, daily_log, total_col_x + 5, grid_top, row_height)
-            self._fill_grid_with_status_data(pdf, daily_log, grid_top, grid_x, hour_width, row_height)
+            grid = DayGrid.for_log(daily_log)
+            self._draw_total_hours(pdf, grid, total_col_x + 5, grid_top, row_height)
+            self._fill_grid_with_status_data(pdf, grid, grid_top, grid_x, hour_width, row_height)
             
             # ✅ Draw color legend
             legend_y = grid_top - grid_height - 30
@@ -369,23 +371,11 @@ class FMCSAPDFGenerator:
             pdf.setFont("Helvetica", 7)
             pdf.drawString(item_x + 0.35 * inch, y, label)
     
-    def _draw_total_hours(self, pdf, daily_log, x, y_start, row_height):
+    def _draw_total_hours(self, pdf, grid, x, y_start, row_height):
         """Afficher les totaux d'heures pour chaque statut"""
         try:
-            status_changes = daily_log.status_changes.all()
-            
-            totals = {
-                'off_duty': 0,
-                'sleeper_berth': 0,
-                'driving': 0,
-                'on_duty': 0
-            }
-            
-            # Calculer les totaux
-            for change in status_changes:
-                if change.status in totals and change.end_time:
-                    duration = (change.end_time - change.start_time).total_seconds() / 3600
-                    totals[change.status] += duration
+            # Calculer les totaux (minutes de la grille)
+            totals = {status: minutes / 60 for status, minutes in grid.totals().items()}
             
             # Afficher les totaux
             pdf.setFont("Helvetica-Bold", 8)
@@ -399,10 +389,9 @@ class FMCSAPDFGenerator:
         except Exception as e:
             print(f"Erreur calcul totaux: {e}")
     
-    def _fill_grid_with_status_data(self, pdf, daily_log, grid_top, grid_x, hour_width, row_height):
+    def _fill_grid_with_status_data(self, pdf, grid, grid_top, grid_x, hour_width, row_height):
         """✅ Fill grid with status data - OFF DUTY from midnight to first status"""
         try:
-            status_changes = daily_log.status_changes.all().order_by('start_time')
             
             status_to_row = {
                 'off_duty': 0,
@@ -412,66 +401,36 @@ class FMCSAPDFGenerator:
             }
             
             # ✅ STEP 1: Draw OFF DUTY from midnight (00:00) to first status change
-            if status_changes.exists():
-                first_change = status_changes.first()
-                first_start = self.to_local_time(first_change.start_time)
-                first_hour = first_start.hour
-                first_minute = first_start.minute
-                
+            first_minute = grid.first_recorded()
+            if first_minute:
                 # Calculate duration from midnight to first status
-                duration_from_midnight = first_hour + first_minute/60
+                duration_from_midnight = first_minute / 60
                 
-                if duration_from_midnight > 0:
-                    # Draw OFF DUTY line from midnight
-                    off_duty_row_idx = status_to_row['off_duty']
-                    x_start = grid_x + 1
-                    y_off_duty = grid_top - (off_duty_row_idx * row_height) - (row_height / 2)
-                    
-                    # ✅ Calculate width - ensure it doesn't exceed grid width
-                    width_off_duty = (duration_from_midnight * hour_width) - 2
-                    max_width = (24 * hour_width) - 2  # Maximum grid width
-                    width_off_duty = min(width_off_duty, max_width)
-                    
-                    pdf.setFillColor(OFF_DUTY_COLOR)  # Light grey for Off Duty
-                    pdf.rect(x_start, y_off_duty - 5, width_off_duty, 10, fill=1, stroke=0)
-                    
-                    # ✅ Save end position for connecting line
-                    off_duty_end_x = x_start + width_off_duty
-                    off_duty_y = y_off_duty
-                else:
-                    off_duty_end_x = None
-                    off_duty_y = None
-            else:
-                off_duty_end_x = None
-                off_duty_y = None
+                # Draw OFF DUTY line from midnight
+                off_duty_row_idx = status_to_row['off_duty']
+                x_start = grid_x + 1
+                y_off_duty = grid_top - (off_duty_row_idx * row_height) - (row_height / 2)
+                
+                # ✅ Calculate width - ensure it doesn't exceed grid width
+                width_off_duty = (duration_from_midnight * hour_width) - 2
+                max_width = (24 * hour_width) - 2  # Maximum grid width
+                width_off_duty = min(width_off_duty, max_width)
+                
+                pdf.setFillColor(OFF_DUTY_COLOR)  # Light grey for Off Duty
+                pdf.rect(x_start, y_off_duty - 5, width_off_duty, 10, fill=1, stroke=0)
             
-            # ✅ STEP 2: Draw all status changes (NO CONNECTING LINES)
-            for change in status_changes:
-                if change.status in status_to_row:
-                    row_idx = status_to_row[change.status]
-                    
-                    # Get times (no conversion needed)
-                    start_local = self.to_local_time(change.start_time)
-                    start_hour = start_local.hour
-                    start_minute = start_local.minute
+            # ✅ STEP 2: Draw all status runs of the minute grid (NO CONNECTING LINES)
+            for change_status, start_minute, end_minute in grid.segments():
+                if change_status in status_to_row:
+                    row_idx = status_to_row[change_status]
                     
                     # Position in grid
-                    x_offset = (start_hour + start_minute/60) * hour_width
+                    x_offset = (start_minute / 60) * hour_width
                     x = grid_x + x_offset + 1
                     y = grid_top - (row_idx * row_height) - (row_height / 2)
                     
                     # Duration calculation
-                    duration = 1
-                    if change.end_time:
-                        end_local = self.to_local_time(change.end_time)
-                        end_hour = end_local.hour
-                        end_minute = end_local.minute
-                        duration = (end_hour + end_minute/60) - (start_hour + start_minute/60)
-                        
-                        # Handle overnight duration
-                        if duration < 0:
-                            duration = 24 + duration
-                        duration = max(0.1, duration)
+                    duration = max(0.1, (end_minute - start_minute) / 60)
                     
                     width = (duration * hour_width) - 2
                     height = 10
@@ -489,7 +448,7 @@ class FMCSAPDFGenerator:
                         'driving': DRIVING_COLOR,          # Green
                         'on_duty': ON_DUTY_COLOR           # Orange
                     }
-                    pdf.setFillColor(status_colors.get(change.status, black))
+                    pdf.setFillColor(status_colors.get(change_status, black))
                     
                     # Draw horizontal line for status duration
                     pdf.rect(x, y - 5, width, height, fill=1, stroke=0)
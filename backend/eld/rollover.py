@@ -0,0 +1,185 @@
+# backend/eld/rollover.py
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, Q
+
+from hos.cache import bump_revisions
+from hos.models import DriverHOSState
+from .grid import store_grids
+from .models import DailyLog, DriverOpenStatus, DutyStatusChange, RolloverRun
+from .timezones import HOME_TERMINAL_TIMEZONES, driver_timezone, local_now, utc_now
+from .totals import store_totals
+
+logger = logging.getLogger(__name__)
+
+
+def rollover_zones():
+    return sorted({settings.TIME_ZONE} | {zone for zone, _ in HOME_TERMINAL_TIMEZONES})
+
+
+def roll_over(status_ids, utc, local_nows):
+    """
+    Close the still-open statuses among status_ids at their driver's
+    midnight and start the new day with Off Duty, set-based: one update per
+    midnight, one insert of the missing logs and one of the new statuses.
+    Statuses closed meanwhile are skipped, so a re-run changes nothing.
+    A driver who already recorded a status on the new day (a rollover run
+    late) gets a closed Off Duty up to that status instead of a second open
+    one, and several statuses left open start the day once; the command this
+    replaced always added an open Off Duty per status.
+    local_nows caches the local time of each zone at the utc reading.
+    Returns (closed, logs created, statuses created).
+    """
+    statuses = list(DutyStatusChange.objects.select_for_update(of=('self',)).filter(
+        pk__in=status_ids, end_time__isnull=True
+    ).select_related('daily_log__driver__driverprofile', 'daily_log__driver__company'))
+    due = []
+    for status in statuses:
+        zone = driver_timezone(status.daily_log.driver)
+        if zone not in local_nows:
+            local_nows[zone] = local_now(zone, utc)
+        now = local_nows[zone]
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if status.daily_log.date == (now - timedelta(days=1)).date():
+            due.append((status, now, midnight))
+    if not due:
+        return 0, 0, 0
+
+    # Close at midnight: one UPDATE per distinct midnight
+    by_midnight = {}
+    for status, _, midnight in due:
+        status.end_time = midnight
+        by_midnight.setdefault(midnight, []).append(status.pk)
+    for midnight, ids in by_midnight.items():
+        DutyStatusChange.objects.filter(pk__in=ids).update(end_time=midnight)
+
+    # Next-day logs; a log the driver already opened is kept as is
+    keys = {(status.daily_log.driver_id, now.date()) for status, now, _ in due}
+    existing = set(DailyLog.objects.filter(
+        driver_id__in={driver_id for driver_id, _ in keys}, date__in={date for _, date in keys}
+    ).values_list('driver_id', 'date'))
+    DailyLog.objects.bulk_create([
+        DailyLog(
+            driver_id=status.daily_log.driver_id,
+            date=now.date(),
+            carrier=status.daily_log.carrier,
+            vehicle_number=status.daily_log.vehicle_number,
+            trailer_number=status.daily_log.trailer_number,
+            main_office_address=status.daily_log.main_office_address,
+            home_terminal_address=status.daily_log.home_terminal_address,
+        )
+        for status, now, _ in due if (status.daily_log.driver_id, now.date()) not in existing
+    ], ignore_conflicts=True)
+    new_logs = {
+        (daily_log.driver_id, daily_log.date): daily_log
+        for daily_log in DailyLog.objects.filter(
+            driver_id__in={driver_id for driver_id, _ in keys}, date__in={date for _, date in keys}
+        )
+        if (daily_log.driver_id, daily_log.date) in keys
+    }
+    # A driver who already recorded a status today gets Off Duty up to it only
+    first_starts = dict(DutyStatusChange.objects.filter(
+        daily_log__in=list(new_logs.values())
+    ).values_list('daily_log_id').annotate(first_start=Min('start_time')))
+
+    new_statuses, advanced, rebuilt = [], {}, {}
+    for status, now, midnight in due:
+        driver = status.daily_log.driver
+        daily_log = new_logs[(driver.pk, now.date())]
+        first_start = first_starts.get(daily_log.id)
+        first_starts[daily_log.id] = midnight
+        if first_start is not None:
+            # The day already started, by the driver or by another status left
+            # open: the period closed here comes before statuses the state has
+            # already folded, so the state is rebuilt instead of advanced
+            advanced.pop(driver.pk, None)
+            rebuilt[driver.pk] = (driver, now)
+            if first_start <= midnight:
+                continue
+        new_statuses.append(DutyStatusChange(
+            daily_log=daily_log,
+            status='off_duty',
+            start_time=midnight,
+            end_time=first_start,
+            location='Automatic - New Day',
+            notes='Automatically created: New day started at midnight'
+        ))
+        if first_start is None:
+            advanced[driver.pk] = (
+                driver, [(status.status, status.start_time, status.end_time)], ('off_duty', midnight), now
+            )
+    DutyStatusChange.objects.bulk_create(new_statuses)
+
+    # bulk_create and update skip the status change signals: keep what they maintain
+    touched_logs = [status.daily_log for status, _, _ in due] + list(new_logs.values())
+    store_totals(touched_logs)
+    store_grids(touched_logs)
+    DriverOpenStatus.objects.bulk_create(
+        [DriverOpenStatus(driver_id=change.daily_log.driver_id, status_change=change)
+         for change in new_statuses if change.end_time is None],
+        update_conflicts=True, unique_fields=['driver'], update_fields=['status_change'],
+    )
+    DriverHOSState.advance_many(advanced.values())
+    for driver, now in rebuilt.values():
+        DriverOpenStatus.refresh(driver.pk)
+        DriverHOSState.rebuild(driver, now)
+    bump_revisions({status.daily_log.driver_id for status, _, _ in due})
+    return len(due), len(keys) - len(existing & keys), len(new_statuses)
+
+
+def drivers_in_zone(zone, driver='daily_log__driver'):
+    """Q matching rows whose driver (reached through the driver path) has zone as home terminal"""
+    in_zone = Q(**{f'{driver}__driverprofile__home_terminal_timezone': zone})
+    if zone == settings.TIME_ZONE:
+        # Drivers without a home-terminal zone follow the server's
+        in_zone |= (
+            Q(**{f'{driver}__driverprofile__isnull': True})
+            | Q(**{f'{driver}__driverprofile__home_terminal_timezone__isnull': True})
+            | Q(**{f'{driver}__driverprofile__home_terminal_timezone': ''})
+        )
+    return in_zone
+
+
+def bucket_status_ids(zone, yesterday, shard=0, shards=1):
+    """Ids of the open statuses on yesterday's logs of the zone's drivers whose id falls in the shard"""
+    in_zone = drivers_in_zone(zone)
+    statuses = DutyStatusChange.objects.filter(in_zone, end_time__isnull=True, daily_log__date=yesterday)
+    if shards > 1:
+        statuses = statuses.annotate(shard=F('daily_log__driver_id') % shards).filter(shard=shard)
+    return list(statuses.order_by('id').values_list('id', flat=True))
+
+
+def roll_over_bucket(zone, shard=0, shards=1, batch_size=500, utc=None):
+    """
+    Midnight rollover of one time-zone bucket: the drivers of the zone whose
+    id falls in the shard. Chunks of batch_size run in their own transaction.
+    The run is recorded in RolloverRun with its duration.
+    """
+    started = time.perf_counter()
+    utc = utc or utc_now()
+    local_nows = {zone: local_now(zone, utc)}
+    today = local_nows[zone].date()
+    status_ids = bucket_status_ids(zone, today - timedelta(days=1), shard, shards)
+
+    closed_count, logs_created, statuses_created = 0, 0, 0
+    for index in range(0, len(status_ids), batch_size):
+        with transaction.atomic():
+            closed, logs, statuses = roll_over(status_ids[index:index + batch_size], utc, local_nows)
+        closed_count += closed
+        logs_created += logs
+        statuses_created += statuses
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    run, _ = RolloverRun.objects.update_or_create(
+        zone=zone, date=today, shard=shard, shards=shards,
+        defaults={'statuses_closed': closed_count, 'logs_created': logs_created, 'duration_ms': duration_ms}
+    )
+    logger.info(
+        'Rollover %s shard %s/%s for %s: closed %s statuses, created %s logs in %.1f ms',
+        zone, shard, shards, today, closed_count, logs_created, duration_ms
+    )
+    return run
@@ -1,5 +1,6 @@
 # backend/eld/serializers.py
 from rest_framework import serializers
+from .grid import DayGrid
 from .models import DailyLog, DutyStatusChange, LogCertification
 
 class DutyStatusChangeSerializer(serializers.ModelSerializer):
@@ -8,12 +9,23 @@ class DutyStatusChangeSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('daily_log',)  # ⭐️ AJOUTER cette ligne
 
+class DutyStatusEventSerializer(serializers.Serializer):
+    """One status change of an offline sync batch"""
+    client_event_id = serializers.CharField(max_length=64)
+    status = serializers.ChoiceField(choices=DailyLog.DUTY_STATUS)
+    start_time = serializers.DateTimeField()
+    location = serializers.CharField(max_length=255)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
 class DailyLogSerializer(serializers.ModelSerializer):
     status_changes = DutyStatusChangeSerializer(many=True, read_only=True)
     driver_name = serializers.CharField(source='driver.get_full_name', read_only=True)
     driver_first_name = serializers.CharField(source='driver.first_name', read_only=True)
     driver_last_name = serializers.CharField(source='driver.last_name', read_only=True)
     carrier_name = serializers.CharField(source='carrier.name', read_only=True)
+    # Derived from the minute grid; the stored JSON is no longer written
+    grid_data = serializers.SerializerMethodField()
+    grid = serializers.SerializerMethodField()
     
     class Meta:
         model = DailyLog
@@ -22,8 +34,22 @@ class DailyLogSerializer(serializers.ModelSerializer):
             'driver', 'carrier', 'main_office_address', 
             'home_terminal_address', 'is_certified', 'certified_at', 
             'is_finalized', 'finalized_at',
+            'off_duty_minutes', 'sleeper_berth_minutes', 'driving_minutes', 'on_duty_minutes',
+            'first_status', 'last_status', 'open_status_change',
             'created_at', 'updated_at'
         )
+    
+    def get_grid_data(self, obj):
+        return self._day_grid(obj).hourly()
+    
+    def get_grid(self, obj):
+        return self._day_grid(obj).as_json()
+    
+    def _day_grid(self, obj):
+        # Both fields read one grid; list pages come with theirs already built
+        if not hasattr(obj, '_day_grid'):
+            obj._day_grid = DayGrid.for_log(obj)
+        return obj._day_grid
 
 class LogCertificationSerializer(serializers.ModelSerializer):
     class Meta:
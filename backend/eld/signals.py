@@ -0,0 +1,27 @@
+# backend/eld/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .grid import refresh_grids
+from .models import DailyLog, DriverOpenStatus, DutyStatusChange
+from .totals import refresh_totals
+
+
+@receiver(post_save, sender=DutyStatusChange)
+@receiver(post_delete, sender=DutyStatusChange)
+def duty_status_changed(sender, instance, **kwargs):
+    try:
+        driver_id = instance.daily_log.driver_id
+    except DailyLog.DoesNotExist:
+        # Deleted along with its log, and its grid with it
+        return
+    start_time, end_time = instance.touched_range()
+    # Day totals in the same transaction as the write; an open period runs into later days
+    refresh_totals(driver_id, start_time, end_time)
+    if end_time is None:
+        # Opened, closed or removed an open status
+        DriverOpenStatus.refresh(driver_id)
+    instance._loaded_range = (instance.start_time, instance.end_time)
+    # Only the days the period touches change; rebuilt once the rows are visible
+    transaction.on_commit(lambda: refresh_grids(driver_id, start_time, end_time))
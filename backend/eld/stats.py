@@ -0,0 +1,96 @@
+# backend/eld/stats.py
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.db.models import Case, Count, F, IntegerField, Sum, When
+from django.db.models.functions import TruncDate
+
+from hos.models import HOSViolation
+from hos.sql import DAY_SECONDS, DIALECTS
+from trips.models import Trip
+from .models import DailyLog
+
+CYCLE_DAYS = 8  # today and the 7 days before, as shown on the dashboard
+
+# One aggregate over the driver's logs of the cycle, with the violation
+# days and active trips as scalar subqueries. On-duty time comes from the
+# totals each log keeps of its day, so statuses still open are not counted
+# until they close.
+DASHBOARD_SQL = """
+SELECT
+    SUM(log.driving_minutes + log.on_duty_minutes) * 60 AS cycle_seconds,
+    SUM(CASE WHEN log.date = %(today)s THEN log.driving_minutes + log.on_duty_minutes ELSE 0 END) * 60
+        AS today_seconds,
+    SUM(log.total_miles_driving_today) AS total_miles,
+    COUNT(*) AS logged_days,
+    (
+        SELECT COUNT(DISTINCT {violation_epoch} / {day})
+        FROM hos_hosviolation violation
+        WHERE violation.driver_id = %(driver)s
+            AND violation.violation_time >= %(first_midnight)s AND violation.violation_time < %(tomorrow)s
+    ) AS violation_days,
+    (
+        SELECT COUNT(*)
+        FROM trips_trip
+        WHERE driver_id = %(driver)s AND status IN ('planned', 'in_progress')
+    ) AS active_trips
+FROM eld_dailylog log
+WHERE log.driver_id = %(driver)s AND log.date >= %(first_day)s AND log.date <= %(today)s
+"""
+
+
+def dashboard_sql():
+    """DASHBOARD_SQL for the current connection, None on a backend without a dialect"""
+    dialect = DIALECTS.get(connection.vendor)
+    if dialect is None:
+        return None
+    return DASHBOARD_SQL.format(
+        violation_epoch=dialect['epoch'].format('violation.violation_time'),
+        day=DAY_SECONDS,
+    )
+
+
+def dashboard_stats(driver, today):
+    """
+    Everything the driver dashboard shows, in one query: on-duty seconds of
+    the cycle and of today (from the logs' day totals), miles, active trips, and
+    the logged days of the cycle next to the days with a persisted HOS
+    violation. Backends without a dialect get the same figures from three
+    ORM queries.
+    """
+    midnight = datetime.combine(today, datetime.min.time())
+    tomorrow = midnight + timedelta(days=1)
+    first_day = today - timedelta(days=CYCLE_DAYS - 1)
+    params = {
+        'driver': driver.pk,
+        'today': today,
+        'first_day': first_day,
+        'first_midnight': datetime.combine(first_day, datetime.min.time()),
+        'tomorrow': tomorrow,
+    }
+    sql = dashboard_sql()
+    if sql is None:
+        return orm_dashboard_stats(driver, params)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return dict(zip(columns, cursor.fetchone()))
+
+
+def orm_dashboard_stats(driver, params):
+    on_duty_seconds = (F('driving_minutes') + F('on_duty_minutes')) * 60
+    stats = DailyLog.objects.filter(
+        driver=driver, date__gte=params['first_day'], date__lte=params['today']
+    ).aggregate(
+        cycle_seconds=Sum(on_duty_seconds),
+        today_seconds=Sum(Case(
+            When(date=params['today'], then=on_duty_seconds), default=0, output_field=IntegerField()
+        )),
+        total_miles=Sum('total_miles_driving_today'),
+        logged_days=Count('id'),
+    )
+    stats['violation_days'] = HOSViolation.objects.filter(
+        driver=driver, violation_time__gte=params['first_midnight'], violation_time__lt=params['tomorrow']
+    ).annotate(day=TruncDate('violation_time')).values('day').distinct().count()
+    stats['active_trips'] = Trip.objects.filter(driver=driver, status__in=['planned', 'in_progress']).count()
+    return stats
@@ -0,0 +1,217 @@
+# backend/eld/sync.py
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Q
+
+from hos.cache import bump_revision
+from hos.models import DriverHOSState
+from users.models import CustomUser
+from .grid import refresh_grids
+from .models import DailyLog, DriverOpenStatus, DutyStatusChange
+from .timezones import driver_now
+from .totals import refresh_totals
+
+MAX_BATCH_SIZE = 500
+# Device clocks drift; anything later than this is rejected as a future status
+CLOCK_SKEW = timedelta(minutes=5)
+
+
+def split_at_midnight(status, start_time, end_time):
+    """(status, start, end) pieces of a period, one per day; an open period stays on its first day"""
+    if end_time is None:
+        return [(status, start_time, None)]
+    pieces = []
+    while start_time < end_time:
+        midnight = datetime.combine(start_time.date() + timedelta(days=1), datetime.min.time())
+        piece_end = min(end_time, midnight)
+        pieces.append((status, start_time, piece_end))
+        start_time = piece_end
+    return pieces
+
+
+class StatusBatch:
+    """
+    Ordered duty status changes recorded by an in-cab device while offline,
+    applied in one transaction. Each event starts a status that runs until
+    the next accepted event; the last one stays open, and the driver's
+    previously open status is closed at the first. Periods crossing midnight
+    are split onto the log of each day, creating the missing logs.
+    Ordering, overlaps and finalized days are checked in memory against the
+    driver's latest start; an event that fails is rejected on its own. No
+    piece may land on a finalized log, nor may the status it closes belong
+    to one.
+    Events carry a client_event_id: one already stored is reported as a
+    duplicate, so a retried batch writes nothing twice.
+    Rows are written with bulk_create, which skips the status change signals;
+    the day totals, open-status pointer, grids, HOS state and compliance
+    cache revision are brought up to date here instead.
+    """
+
+    def __init__(self, driver, events, log_defaults, current_time=None):
+        self.driver = driver
+        self.events = events  # validated event dicts, in the device's order
+        self.log_defaults = log_defaults
+        self.current_time = current_time or driver_now(driver)
+
+    def apply(self):
+        """One result dict per event, in order"""
+        results = [
+            {'index': index, 'client_event_id': event['client_event_id'], 'result': None, 'id': None}
+            for index, event in enumerate(self.events)
+        ]
+        with transaction.atomic():
+            # Concurrent syncs of one driver (a retry racing the original) run one after the other
+            CustomUser.objects.select_for_update().filter(pk=self.driver.pk).first()
+            previous = DriverOpenStatus.current(self.driver)
+            accepted = self._validate(results, previous)
+            if accepted:
+                self._write(accepted, previous)
+        return results
+
+    def _validate(self, results, previous):
+        event_ids = [event['client_event_id'] for event in self.events]
+        stored = {
+            event_id: (change_id, driver_id)
+            for event_id, change_id, driver_id in DutyStatusChange.objects.filter(
+                client_event_id__in=event_ids
+            ).values_list('client_event_id', 'id', 'daily_log__driver_id')
+        }
+        # Events may only follow the driver's history: after its latest start and
+        # its latest end, except for the open status they close
+        latest = DutyStatusChange.objects.filter(daily_log__driver=self.driver).aggregate(
+            start=Max('start_time'), end=Max('end_time')
+        )
+        latest_start = max(filter(None, latest.values()), default=None)
+        # Every day a piece can land on: from the open status to the last event
+        dates = [event['start_time'].date() for event in self.events]
+        if previous is not None:
+            dates.append(previous.start_time.date())
+        days = Q(date__gte=min(dates), date__lte=max(dates))
+        if previous is not None:
+            days |= Q(pk=previous.daily_log_id)
+        finalized_logs = list(DailyLog.objects.filter(
+            days, driver=self.driver, is_finalized=True
+        ).values_list('id', 'date'))
+        finalized_ids = {log_id for log_id, _ in finalized_logs}
+        finalized = {date for _, date in finalized_logs}
+
+        accepted, seen = [], set()
+        latest_time = self.current_time + CLOCK_SKEW
+        for event, result in zip(self.events, results):
+            event_id = event['client_event_id']
+            error = None
+            if event_id in stored:
+                change_id, driver_id = stored[event_id]
+                if driver_id == self.driver.pk:
+                    result.update(result='duplicate', id=change_id)
+                    continue
+                error = ('client_event_id', 'Already used by another driver')
+            elif event_id in seen:
+                error = ('client_event_id', 'Appears more than once in the batch')
+            elif latest_start is not None and (
+                event['start_time'] < latest_start or event['start_time'] == latest['start']
+            ):
+                error = ('start_time', f'Overlaps the status changes up to {latest_start.isoformat()}')
+            elif event['start_time'] > latest_time:
+                error = ('start_time', 'Is in the future')
+            elif event['start_time'].date() in finalized:
+                error = ('start_time', 'The log of this day is finalized')
+
+            seen.add(event_id)
+            if error:
+                result.update(result='rejected', errors={error[0]: [error[1]]})
+                continue
+            accepted.append((event, result))
+            latest['start'] = latest_start = event['start_time']
+
+        # Where each accepted event ends depends on the next one: drop events
+        # whose pieces would reach a finalized day until none do
+        while True:
+            blocked = self._on_finalized(accepted, previous, finalized_ids, finalized)
+            if blocked is None:
+                return accepted
+            position, message = blocked
+            _, result = accepted.pop(position)
+            result.update(result='rejected', errors={'start_time': [message]})
+
+    @staticmethod
+    def _on_finalized(accepted, previous, finalized_ids, finalized):
+        """(position, error) of the first accepted event writing to a finalized log, None if none does"""
+        for position, (event, _) in enumerate(accepted):
+            if position == 0 and previous is not None:
+                if previous.daily_log_id in finalized_ids:
+                    return 0, 'Would close the open status of a finalized log'
+                for _, start_time, _ in split_at_midnight(previous.status, previous.start_time, event['start_time']):
+                    if start_time.date() in finalized:
+                        return 0, f'The open status would continue on the finalized log of {start_time.date()}'
+            end_time = accepted[position + 1][0]['start_time'] if position + 1 < len(accepted) else None
+            for _, start_time, _ in split_at_midnight(event['status'], event['start_time'], end_time)[1:]:
+                if start_time.date() in finalized:
+                    return position, f'Would continue on the finalized log of {start_time.date()}'
+        return None
+
+    def _write(self, accepted, previous):
+        first_start = accepted[0][0]['start_time']
+        pieces = []  # (status, start, end, {extra fields}, result of the event or None)
+        if previous is not None:
+            previous_pieces = split_at_midnight(previous.status, previous.start_time, first_start)
+            previous.end_time = previous_pieces[0][2]
+            continued = {'location': previous.location, 'notes': 'Continued past midnight while offline'}
+            pieces += [piece + (continued, None) for piece in previous_pieces[1:]]
+        elif not DutyStatusChange.objects.filter(
+            daily_log__driver=self.driver, daily_log__date=first_start.date()
+        ).exists():
+            # First status of the day: Off Duty from midnight, as for a live change
+            midnight = datetime.combine(first_start.date(), datetime.min.time())
+            if first_start > midnight:
+                pieces.append(('off_duty', midnight, first_start, {
+                    'location': 'Automatic - Start of Day',
+                    'notes': 'Automatically created: Off Duty from Midnight (00:00)',
+                }, None))
+
+        for position, (event, result) in enumerate(accepted):
+            end_time = accepted[position + 1][0]['start_time'] if position + 1 < len(accepted) else None
+            fields = {'location': event['location'], 'notes': event.get('notes')}
+            for index, piece in enumerate(split_at_midnight(event['status'], event['start_time'], end_time)):
+                if index == 0:
+                    pieces.append(piece + (dict(fields, client_event_id=event['client_event_id']), result))
+                else:
+                    pieces.append(piece + (fields, None))
+
+        logs = self._logs({start_time.date() for _, start_time, _, _, _ in pieces})
+        changes = [
+            DutyStatusChange(
+                daily_log=logs[start_time.date()], status=status, start_time=start_time, end_time=end_time, **fields
+            )
+            for status, start_time, end_time, fields, _ in pieces
+        ]
+        if previous is not None:
+            DutyStatusChange.objects.filter(pk=previous.pk).update(end_time=previous.end_time)
+        DutyStatusChange.objects.bulk_create(changes)
+        for change, (_, _, _, _, result) in zip(changes, pieces):
+            if result is not None:
+                result.update(result='created', id=change.id)
+
+        earliest = previous.start_time if previous is not None else changes[0].start_time
+        refresh_totals(self.driver.pk, earliest)
+        DriverOpenStatus.refresh(self.driver.pk)
+
+        closed = [(previous.status, previous.start_time, previous.end_time)] if previous is not None else []
+        closed += [(change.status, change.start_time, change.end_time) for change in changes[:-1]]
+        DriverHOSState.advance(self.driver, closed, (changes[-1].status, changes[-1].start_time), self.current_time)
+
+        driver_id = self.driver.pk
+        transaction.on_commit(lambda: refresh_grids(driver_id, earliest, None))
+        bump_revision(driver_id)
+
+    def _logs(self, dates):
+        """{date: DailyLog} of the driver for the dates, creating the missing ones"""
+        logs = {daily_log.date: daily_log for daily_log in DailyLog.objects.filter(driver=self.driver, date__in=dates)}
+        missing = [
+            DailyLog(driver=self.driver, date=date, **self.log_defaults) for date in sorted(dates - set(logs))
+        ]
+        # bulk_create skips DailyLog.save; their totals are stored with the rest
+        for daily_log in DailyLog.objects.bulk_create(missing):
+            logs[daily_log.date] = daily_log
+        return logs
@@ -0,0 +1,42 @@
+# backend/eld/tasks.py
+from datetime import datetime
+
+from celery import shared_task
+from django.conf import settings
+
+from .models import RolloverRun
+from .rollover import roll_over_bucket, rollover_zones
+from .timezones import local_now, utc_now
+
+
+@shared_task
+def roll_over_zone(zone, shard=0, shards=1, utc=None):
+    """Midnight rollover of one zone's shard of drivers; utc is an ISO time for replays"""
+    run = roll_over_bucket(
+        zone, shard, shards, settings.ELD_ROLLOVER_BATCH_SIZE, datetime.fromisoformat(utc) if utc else None
+    )
+    return {'zone': zone, 'shard': shard, 'statuses_closed': run.statuses_closed, 'duration_ms': run.duration_ms}
+
+
+@shared_task
+def dispatch_rollovers(utc=None):
+    """
+    Fired by beat every few minutes: each zone whose local day has not
+    rolled over yet gets one roll_over_zone task per shard without a
+    RolloverRun for that day. Normally that is just after local midnight;
+    after missed beats or a broker outage the next tick catches up. Returns
+    the buckets sent.
+    """
+    now = datetime.fromisoformat(utc) if utc else utc_now()
+    shards = settings.ELD_ROLLOVER_SHARDS
+    done = set(RolloverRun.objects.filter(
+        date__in={local_now(zone, now).date() for zone in rollover_zones()}, shards=shards
+    ).values_list('zone', 'date', 'shard'))
+    sent = []
+    for zone in rollover_zones():
+        today = local_now(zone, now).date()
+        for shard in range(shards):
+            if (zone, today, shard) not in done:
+                roll_over_zone.delay(zone, shard, shards, now.isoformat())
+                sent.append((zone, shard))
+    return sent
@@ -1,3 +1,647 @@
+from datetime import datetime, timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from hos.models import DriverHOSState, HOSRuleEngine, HOSViolation
+from hos.sql import DIALECTS
+from users.models import Company, CustomUser, DriverProfile
+from .grid import DayGrid, store_grids
+from .management.commands.fix_midnight_off_duty import MidnightOffDutyRepair
+from .models import DailyLog, DailyLogGrid, DriverOpenStatus, DutyStatusChange, RolloverRun
+from .pagination import DailyLogPagination
+from .rollover import roll_over_bucket, rollover_zones
+from .stats import dashboard_stats
+from .tasks import dispatch_rollovers
+from .timeline import DutyTimeline
+from .timezones import driver_now, driver_today, local_now, offset_table
+
+
+class TimelineTestMixin:
+    def setUp(self):
+        company = Company.objects.create(name='Test Carrier', dot_number='1234567', main_office_address='Test Office')
+        self.driver = CustomUser.objects.create_user(
+            username='driver', email='driver@example.com', password='password',
+            user_type='driver', company=company
+        )
+        self.daily_log = DailyLog.objects.create(
+            driver=self.driver, date=datetime(2025, 1, 10).date(), carrier=company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1'
+        )
+        self.midnight = datetime(2025, 1, 10)
+
+    def at(self, hours):
+        return self.midnight + timedelta(hours=hours)
+
+
+class DutyTimelineTests(TimelineTestMixin, TestCase):
+    def test_round_trips_rows_from_one_query(self):
+        rows = [
+            ('off_duty', self.at(0), self.at(6) + timedelta(microseconds=123)),
+            ('driving', self.at(6) + timedelta(microseconds=123), self.at(11)),
+            ('on_duty', self.at(11), None),
+        ]
+        for status, start_time, end_time in rows:
+            DutyStatusChange.objects.create(
+                daily_log=self.daily_log, status=status, start_time=start_time, end_time=end_time
+            )
+
+        with self.assertNumQueries(1):
+            timeline = DutyTimeline.for_daily_log(self.daily_log)
+        self.assertEqual(list(timeline), rows)
+        self.assertEqual(timeline.status.dtype.name, 'int8')
+        self.assertEqual(timeline.start.dtype.name, 'int64')
+
+    def test_totals_count_open_periods_only_up_to_current_time(self):
+        timeline = DutyTimeline.from_rows([
+            ('driving', self.at(6), self.at(11)),
+            ('on_duty', self.at(11), None),
+        ], current_time=self.at(12))
+
+        self.assertEqual(timeline.totals(), {
+            'off_duty': 0.0, 'sleeper_berth': 0.0, 'driving': 5 * 3600.0, 'on_duty': 3600.0,
+        })
+        self.assertEqual(timeline.closed.total_seconds(('driving', 'on_duty')), 5 * 3600.0)
+
+    def test_clip_merge_and_overlaps(self):
+        timeline = DutyTimeline.from_rows([
+            ('off_duty', self.at(-4), self.at(2)),
+            ('off_duty', self.at(2), self.at(6)),
+            ('driving', self.at(6), self.at(20)),
+            ('on_duty', self.at(19), self.at(27)),
+        ])
+
+        day = timeline.clip_to_day(self.midnight.date())
+        self.assertEqual(day.totals()['off_duty'], 6 * 3600.0)
+        self.assertEqual(day.totals()['on_duty'], 5 * 3600.0)
+
+        merged = timeline.merge_adjacent()
+        self.assertEqual(list(merged)[0], ('off_duty', self.at(-4), self.at(6)))
+        self.assertEqual(len(merged), 3)
+
+        self.assertEqual(list(timeline.overlaps()), [3])
+
+
+class DayGridTests(TimelineTestMixin, TestCase):
+    def test_minute_vector_totals_segments_and_rounding(self):
+        timeline = DutyTimeline.from_rows([
+            ('sleeper_berth', self.at(-3), self.at(5) + timedelta(minutes=50)),
+            ('driving', self.at(5) + timedelta(minutes=50), self.at(11)),
+            ('off_duty', self.at(11), self.at(11) + timedelta(minutes=5)),
+            ('driving', self.at(11) + timedelta(minutes=5), self.at(14)),
+        ])
+        grid = DayGrid.from_timeline(timeline, self.midnight.date())
+
+        self.assertEqual(grid.totals(), {'off_duty': 5, 'sleeper_berth': 350, 'driving': 485, 'on_duty': 0})
+        self.assertEqual(grid.segments()[:2], [('sleeper_berth', 0, 350), ('driving', 350, 660)])
+        self.assertEqual(grid.first_recorded(), 0)
+
+        rounded = grid.rounded(15)
+        self.assertEqual(rounded.segments()[:2], [('sleeper_berth', 0, 345), ('driving', 345, 840)])
+        self.assertEqual(list(grid.diff(rounded)), list(range(345, 350)) + list(range(660, 665)))
+        self.assertTrue(grid.hourly()['12']['driving'])
+        self.assertFalse(grid.hourly()['20']['driving'])
+
+    def test_stored_grid_follows_status_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            change = DutyStatusChange.objects.create(
+                daily_log=self.daily_log, status='driving', start_time=self.at(6), end_time=self.at(8)
+            )
+        stored = DailyLogGrid.objects.get(daily_log=self.daily_log)
+        grid = DayGrid.from_bytes(self.daily_log.date, stored.minutes)
+        self.assertEqual(grid.totals()['driving'], 120)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(8))
+        daily_log = DailyLog.objects.get(id=self.daily_log.id)
+        grid = DayGrid.for_log(daily_log, current_time=self.at(9))
+        self.assertEqual(grid.totals()['on_duty'], 60)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change.delete()
+        daily_log = DailyLog.objects.get(id=self.daily_log.id)
+        self.assertEqual(DayGrid.for_log(daily_log, current_time=self.at(9)).totals()['driving'], 0)
+
+    def test_missing_grid_is_computed_without_writing(self):
+        # Status changes saved outside captureOnCommitCallbacks: no grid is stored
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(6), end_time=self.at(8))
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(8))
+        DailyLogGrid.objects.all().delete()
+        daily_log = DailyLog.objects.select_related('driver').get(id=self.daily_log.id)
+
+        with self.assertNumQueries(2):
+            grid = DayGrid.for_log(daily_log, current_time=self.at(9))
+
+        self.assertEqual((grid.totals()['driving'], grid.totals()['on_duty']), (120, 60))
+        self.assertFalse(DailyLogGrid.objects.exists())
+
+    def test_new_log_is_created_with_its_grid(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='sleeper_berth', start_time=self.at(20))
+        tomorrow = DailyLog.objects.create(
+            driver=self.driver, date=self.daily_log.date + timedelta(days=1), carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1'
+        )
+        stored = DailyLogGrid.objects.get(daily_log=tomorrow)
+        self.assertEqual((stored.open_status, stored.open_since), ('sleeper_berth', self.at(20)))
+        self.assertEqual(DayGrid.from_bytes(tomorrow.date, stored.minutes).first_recorded(), None)
+
+    def test_migration_builds_the_grids_of_existing_logs(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(6), end_time=self.at(8))
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(8))
+        store_grids([self.daily_log])
+        expected = DailyLogGrid.objects.values_list('minutes', 'open_status', 'open_since').get()
+        DailyLogGrid.objects.all().delete()
+
+        import_module('eld.migrations.0009_backfill_daily_log_grids').store_missing_grids(apps, None)
+
+        stored = DailyLogGrid.objects.values_list('minutes', 'open_status', 'open_since').get()
+        self.assertEqual((bytes(stored[0]), *stored[1:]), (bytes(expected[0]), *expected[1:]))
+
+
+class OffsetTableTests(TimelineTestMixin, TestCase):
+    def test_transitions_match_dst_rules(self):
+        table = offset_table('America/New_York')
+
+        # 2025: clocks spring forward at 07:00 UTC on March 9, fall back at 06:00 UTC on November 2
+        self.assertEqual(table.to_local(datetime(2025, 3, 9, 6, 59)), datetime(2025, 3, 9, 1, 59))
+        self.assertEqual(table.to_local(datetime(2025, 3, 9, 7, 0)), datetime(2025, 3, 9, 3, 0))
+        self.assertEqual(table.to_local(datetime(2025, 11, 2, 6, 0)), datetime(2025, 11, 2, 1, 0))
+        self.assertEqual(table.to_utc(datetime(2025, 7, 1, 12, 0)), datetime(2025, 7, 1, 16, 0))
+
+        start, end = table.day_bounds(datetime(2025, 3, 9).date())
+        self.assertEqual(end - start, timedelta(hours=23))
+        self.assertEqual(list(table.offset_seconds([0, 1_750_000_000])), [-5 * 3600, -4 * 3600])
+        self.assertEqual(offset_table('America/Phoenix').offsets.tolist(), [-7 * 3600])
+
+    def test_driver_day_follows_home_terminal(self):
+        DriverProfile.objects.create(
+            user=self.driver, home_terminal_address='Test Terminal',
+            home_terminal_timezone='America/Los_Angeles'
+        )
+        driver = CustomUser.objects.select_related('driverprofile').get(id=self.driver.id)
+        utc = datetime(2025, 1, 10, 5, 30)
+
+        self.assertEqual(driver_now(driver, utc), datetime(2025, 1, 9, 21, 30))
+        self.assertEqual(driver_today(driver, utc), datetime(2025, 1, 9).date())
+
+
+class DashboardStatsTests(TimelineTestMixin, TestCase):
+    def test_one_query_with_clipped_today_and_violation_days(self):
+        yesterday = DailyLog.objects.create(
+            driver=self.driver, date=self.daily_log.date - timedelta(days=1), carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1',
+            total_miles_driving_today=300
+        )
+        DutyStatusChange.objects.create(daily_log=yesterday, status='driving', start_time=self.at(-4), end_time=self.at(2))
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(6), end_time=self.at(7))
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(7), end_time=self.at(11))
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(11))
+        HOSViolation.objects.create(
+            driver=self.driver, violation_type='11_hour', violation_time=self.at(-2), description='Test'
+        )
+
+        with self.assertNumQueries(1):
+            stats = dashboard_stats(self.driver, self.daily_log.date)
+
+        self.assertEqual(stats['cycle_seconds'], 11 * 3600)
+        self.assertEqual(stats['today_seconds'], 7 * 3600)
+        self.assertEqual(stats['total_miles'], 300)
+        self.assertEqual((stats['logged_days'], stats['violation_days'], stats['active_trips']), (2, 1, 0))
+
+        # A backend without an SQL dialect gets the same figures from the ORM
+        with mock.patch.dict(DIALECTS, clear=True), self.assertNumQueries(3):
+            self.assertEqual(dashboard_stats(self.driver, self.daily_log.date), stats)
+
+
+class DailyLogTotalsTests(TimelineTestMixin, TestCase):
+    def totals(self, daily_log):
+        daily_log.refresh_from_db()
+        return (
+            daily_log.off_duty_minutes, daily_log.sleeper_berth_minutes,
+            daily_log.driving_minutes, daily_log.on_duty_minutes,
+            daily_log.first_status, daily_log.last_status, daily_log.open_status_change_id,
+        )
+
+    def test_writes_keep_totals_of_every_touched_day(self):
+        yesterday = DailyLog.objects.create(
+            driver=self.driver, date=self.daily_log.date - timedelta(days=1), carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1'
+        )
+        night = DutyStatusChange.objects.create(
+            daily_log=yesterday, status='sleeper_berth', start_time=self.at(-6), end_time=self.at(6)
+        )
+        driving = DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(6))
+
+        self.assertEqual(self.totals(yesterday), (0, 360, 0, 0, 'sleeper_berth', 'sleeper_berth', None))
+        self.assertEqual(self.totals(self.daily_log), (0, 360, 0, 0, 'sleeper_berth', 'driving', driving.id))
+
+        driving.end_time = self.at(9)
+        driving.save()
+        self.assertEqual(self.totals(self.daily_log), (0, 360, 180, 0, 'sleeper_berth', 'driving', None))
+
+        # Moved entirely into yesterday: both days change
+        night.start_time, night.end_time = self.at(-8), self.at(-2)
+        night.save()
+        self.assertEqual(self.totals(yesterday), (0, 360, 0, 0, 'sleeper_berth', 'sleeper_berth', None))
+        self.assertEqual(self.totals(self.daily_log), (0, 0, 180, 0, 'driving', 'driving', None))
+
+        DutyStatusChange.objects.filter(pk=driving.pk).delete()
+        self.assertEqual(self.totals(self.daily_log), (0, 0, 0, 0, None, None, None))
+
+    def test_command_reports_and_rebuilds_stale_totals(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(6), end_time=self.at(8))
+        DailyLog.objects.filter(pk=self.daily_log.pk).update(on_duty_minutes=0, last_status=None)
+
+        with self.assertRaises(CommandError):
+            call_command('daily_log_totals', stdout=StringIO())
+        call_command('daily_log_totals', '--rebuild', stdout=StringIO())
+
+        self.assertEqual(self.totals(self.daily_log), (0, 0, 0, 120, 'on_duty', 'on_duty', None))
+        call_command('daily_log_totals', stdout=StringIO())
+
+
+    def test_migration_backfills_the_totals_of_existing_logs(self):
+        yesterday = DailyLog.objects.create(
+            driver=self.driver, date=self.daily_log.date - timedelta(days=1), carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1'
+        )
+        DutyStatusChange.objects.create(daily_log=yesterday, status='sleeper_berth', start_time=self.at(-6), end_time=self.at(6))
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(6), end_time=self.at(9))
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(9))
+        expected = [self.totals(yesterday), self.totals(self.daily_log)]
+        # As 0004 left them
+        DailyLog.objects.update(
+            off_duty_minutes=0, sleeper_berth_minutes=0, driving_minutes=0, on_duty_minutes=0,
+            first_status=None, last_status=None, open_status_change=None
+        )
+
+        import_module('eld.migrations.0010_backfill_daily_log_totals').store_totals(apps, None)
+
+        self.assertEqual([self.totals(yesterday), self.totals(self.daily_log)], expected)
+
+class OpenStatusTests(TimelineTestMixin, TestCase):
+    def test_pointer_follows_the_latest_open_status(self):
+        first = DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(6))
+        self.assertEqual(DriverOpenStatus.current(self.driver), first)
+
+        first.end_time = self.at(7)
+        first.save()
+        second = DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(7))
+        with self.assertNumQueries(1):
+            self.assertEqual(DriverOpenStatus.current(self.driver), second)
+
+        second.delete()
+        self.assertIsNone(DriverOpenStatus.current(self.driver))
+
+    @skipUnless(connection.vendor == 'sqlite', 'asserts on SQLite query plans')
+    def test_hot_queries_use_their_indexes(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(6))
+        plans = {
+            'open': DutyStatusChange.objects.filter(
+                daily_log=self.daily_log, end_time__isnull=True
+            ).order_by('-start_time').explain(),
+            # The query of DutyTimeline.for_driver, as the HOS engine runs it
+            'history': DutyStatusChange.objects.filter(
+                daily_log__driver=self.driver, start_time__gte=self.at(-24)
+            ).order_by('start_time', 'id').values_list('status', 'start_time', 'end_time').explain(),
+            'rollover': DutyStatusChange.objects.filter(
+                end_time__isnull=True, daily_log__date__in=[self.daily_log.date]
+            ).explain(),
+            'pointer': DriverOpenStatus.objects.select_related('status_change').filter(pk=self.driver.pk).explain(),
+        }
+
+        self.assertIn('eld_change_open_idx', plans['open'])
+        self.assertIn('eld_change_log_start_idx (daily_log_id=? AND start_time>?)', plans['history'])
+        self.assertIn('eld_change_open_idx', plans['rollover'])
+        self.assertNotIn('SCAN eld_driveropenstatus', plans['pointer'])
+        self.assertIn('SEARCH eld_dutystatuschange USING INTEGER PRIMARY KEY', plans['pointer'])
+
+
+class StatusSyncTests(TimelineTestMixin, TestCase):
+    def sync(self, events):
+        client = APIClient()
+        client.force_authenticate(self.driver)
+        payload = {'events': [
+            {'client_event_id': event_id, 'status': status, 'start_time': start_time.isoformat(), 'location': 'Yard'}
+            for event_id, status, start_time in events
+        ]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('duty-status-change-sync'), payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_batch_spanning_days_closes_the_open_status_and_creates_logs(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(20))
+        events = [('e1', 'driving', self.at(22)), ('e2', 'sleeper_berth', self.at(27)), ('e3', 'on_duty', self.at(38))]
+
+        body = self.sync(events)
+
+        self.assertEqual([result['result'] for result in body['results']], ['created'] * 3)
+        rows = list(DutyStatusChange.objects.filter(daily_log__driver=self.driver).order_by('start_time').values_list(
+            'daily_log__date', 'status', 'start_time', 'end_time', 'client_event_id'
+        ))
+        next_day = self.daily_log.date + timedelta(days=1)
+        self.assertEqual(rows, [
+            (self.daily_log.date, 'on_duty', self.at(20), self.at(22), None),
+            (self.daily_log.date, 'driving', self.at(22), self.at(24), 'e1'),
+            (next_day, 'driving', self.at(24), self.at(27), None),
+            (next_day, 'sleeper_berth', self.at(27), self.at(38), 'e2'),
+            (next_day, 'on_duty', self.at(38), None, 'e3'),
+        ])
+        new_log = DailyLog.objects.get(driver=self.driver, date=next_day)
+        self.assertEqual((new_log.driving_minutes, new_log.sleeper_berth_minutes, new_log.last_status), (180, 660, 'on_duty'))
+        self.assertEqual(DriverOpenStatus.current(self.driver).client_event_id, 'e3')
+        self.assertTrue(DailyLogGrid.objects.filter(daily_log=new_log).exists())
+
+    def test_retry_is_idempotent_and_overlaps_are_rejected(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(6), end_time=self.at(9))
+        first = self.sync([('e1', 'on_duty', self.at(10)), ('e2', 'driving', self.at(11))])
+        self.assertEqual(first['created'], 2)
+        rows = DutyStatusChange.objects.count()
+
+        retry = self.sync([
+            ('e1', 'on_duty', self.at(10)), ('e2', 'driving', self.at(11)),
+            ('e3', 'off_duty', self.at(8)), ('e4', 'off_duty', self.at(12)), ('e4', 'on_duty', self.at(13)),
+        ])
+
+        self.assertEqual([result['result'] for result in retry['results']], [
+            'duplicate', 'duplicate', 'rejected', 'created', 'rejected'
+        ])
+        self.assertEqual(retry['results'][0]['id'], first['results'][0]['id'])
+        self.assertIn('start_time', retry['results'][2]['errors'])
+        self.assertIn('client_event_id', retry['results'][4]['errors'])
+        self.assertEqual(DutyStatusChange.objects.count(), rows + 1)
+        self.assertEqual(
+            DutyStatusChange.objects.get(client_event_id='e2').end_time, self.at(12)
+        )
+
+
+    def test_no_piece_lands_on_a_finalized_log(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='on_duty', start_time=self.at(20))
+        DailyLog.objects.create(
+            driver=self.driver, date=self.daily_log.date + timedelta(days=1), carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1',
+            is_finalized=True
+        )
+
+        # Driving from 22:00 would run through the finalized day; so would the open status after it
+        body = self.sync([('e1', 'driving', self.at(22)), ('e2', 'off_duty', self.at(54))])
+
+        self.assertEqual([result['result'] for result in body['results']], ['rejected', 'rejected'])
+        self.assertEqual(DutyStatusChange.objects.count(), 1)
+        self.assertEqual(self.sync([('e3', 'driving', self.at(22))])['created'], 1)
+
+        # The status a batch closes must not be on a finalized log either
+        DailyLog.objects.exclude(pk=self.daily_log.pk).update(is_finalized=False)
+        DailyLog.objects.filter(pk=self.daily_log.pk).update(is_finalized=True)
+        body = self.sync([('e4', 'off_duty', self.at(30))])
+        self.assertEqual(body['results'][0]['errors'], {'start_time': ['Would close the open status of a finalized log']})
+        self.assertIsNone(DutyStatusChange.objects.get(client_event_id='e3').end_time)
+
+
+class RolloverTests(TimelineTestMixin, TestCase):
+    def test_closes_open_statuses_at_midnight_once(self):
+        today = driver_today(self.driver)
+        midnight = datetime.combine(today, datetime.min.time())
+        DailyLog.objects.filter(pk=self.daily_log.pk).update(date=today - timedelta(days=1))
+        driving = DutyStatusChange.objects.create(
+            daily_log=self.daily_log, status='driving', start_time=midnight - timedelta(hours=2)
+        )
+        DriverHOSState.rebuild(self.driver, midnight - timedelta(hours=1))
+
+        out = StringIO()
+        call_command('close_daily_logs', stdout=out)
+        self.assertIn('closed 1 open status changes and created 1 day logs', out.getvalue())
+        call_command('close_daily_logs', stdout=out)
+        self.assertIn('closed 0 open status changes', out.getvalue())
+
+        driving.refresh_from_db()
+        self.assertEqual(driving.end_time, midnight)
+        new_log = DailyLog.objects.get(driver=self.driver, date=today)
+        off_duty = DriverOpenStatus.current(self.driver)
+        self.assertEqual((off_duty.daily_log_id, off_duty.status, off_duty.start_time), (new_log.id, 'off_duty', midnight))
+        self.daily_log.refresh_from_db()
+        self.assertEqual((self.daily_log.driving_minutes, self.daily_log.open_status_change_id), (120, None))
+        self.assertEqual(DailyLogGrid.objects.get(daily_log=new_log).open_status, 'off_duty')
+        state = DriverHOSState.objects.get(driver=self.driver)
+        self.assertEqual((state.open_status, state.open_since), ('off_duty', midnight))
+        # Recorded like the scheduled rollover, which then has nothing left to do
+        self.assertEqual(dispatch_rollovers.apply().get(), [])
+
+    def test_late_rollover_fills_midnight_up_to_the_first_status_of_the_day(self):
+        driving = DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(20))
+        today_log = DailyLog.objects.create(
+            driver=self.driver, date=self.daily_log.date + timedelta(days=1), carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1'
+        )
+        on_duty = DutyStatusChange.objects.create(daily_log=today_log, status='on_duty', start_time=self.at(30))
+
+        # 07:00 in Kigali: the driver went on duty at 06:00, before the rollover ran
+        run = roll_over_bucket('Africa/Kigali', utc=self.at(29))
+
+        self.assertEqual((run.statuses_closed, run.logs_created), (1, 0))
+        driving.refresh_from_db()
+        self.assertEqual(driving.end_time, self.at(24))
+        self.assertEqual(
+            list(today_log.status_changes.order_by('start_time').values_list('status', 'start_time', 'end_time')),
+            [('off_duty', self.at(24), self.at(30)), ('on_duty', self.at(30), None)]
+        )
+        self.assertEqual(DriverOpenStatus.current(self.driver), on_duty)
+
+    def test_late_rollover_rebuilds_the_state_after_the_driver_started_the_day(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(14))
+        DriverHOSState.rebuild(self.driver, self.at(20))
+        client = APIClient()
+        client.force_authenticate(self.driver)
+        # 06:00 in Kigali: the first status of the day writes its own Off Duty from midnight
+        with mock.patch('eld.timezones.utc_now', return_value=self.at(28)):
+            response = client.post(reverse('duty-status-change-list'), {
+                'status': 'on_duty', 'start_time': self.at(30).isoformat(), 'location': 'Yard'
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        roll_over_bucket('Africa/Kigali', utc=self.at(29))
+
+        self.assertEqual(DutyStatusChange.objects.filter(start_time=self.at(24)).count(), 1)
+        now = self.at(31)
+        self.assertEqual(
+            DriverHOSState.for_driver(self.driver, now).compliance_report(now),
+            HOSRuleEngine.calculate_compliance(self.driver, now)
+        )
+
+    def test_scheduled_rollover_runs_each_zone_at_its_midnight(self):
+        # Server zone (Africa/Kigali, UTC+2) driver next to a New York one
+        eastern = CustomUser.objects.create_user(
+            username='eastern', email='eastern@example.com', password='password',
+            user_type='driver', company=self.driver.company
+        )
+        DriverProfile.objects.create(
+            user=eastern, home_terminal_address='Test Terminal', home_terminal_timezone='America/New_York'
+        )
+        eastern_log = DailyLog.objects.create(
+            driver=eastern, date=self.daily_log.date, carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-2'
+        )
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(20))
+        eastern_driving = DutyStatusChange.objects.create(daily_log=eastern_log, status='driving', start_time=self.at(20))
+
+        # 00:05 in Kigali, 17:05 the day before in New York
+        utc = (self.at(22) + timedelta(minutes=5)).isoformat()
+        sent = dispatch_rollovers.apply(kwargs={'utc': utc}).get()
+
+        # Every zone without a rollover of its current day; New York's closes nothing yet
+        self.assertEqual(sent, [(zone, shard) for zone in rollover_zones() for shard in range(4)])
+        self.assertEqual(DriverOpenStatus.current(self.driver).start_time, self.at(24))
+        eastern_driving.refresh_from_db()
+        self.assertIsNone(eastern_driving.end_time)
+        runs = RolloverRun.objects.filter(zone='Africa/Kigali', date=self.daily_log.date + timedelta(days=1))
+        self.assertEqual(sorted(runs.values_list('shard', 'statuses_closed')), [
+            (shard, int(shard == self.driver.id % 4)) for shard in range(4)
+        ])
+        self.assertTrue(all(run.duration_ms >= 0 for run in runs))
+        self.assertEqual(dispatch_rollovers.apply(kwargs={'utc': utc}).get(), [])
+
+    def test_missed_midnight_is_caught_up(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(20))
+        # 03:30 in Kigali: beat was down from before midnight until now
+        utc = self.at(25) + timedelta(minutes=30)
+        RolloverRun.objects.bulk_create([
+            RolloverRun(zone=zone, date=local_now(zone, utc).date(), shard=shard, shards=4, duration_ms=0)
+            for zone in rollover_zones() if zone != 'Africa/Kigali'
+            for shard in range(4)
+        ])
+
+        sent = dispatch_rollovers.apply(kwargs={'utc': utc.isoformat()}).get()
+
+        self.assertEqual(sent, [('Africa/Kigali', shard) for shard in range(4)])
+        self.assertEqual(DriverOpenStatus.current(self.driver).start_time, self.at(24))
+
+
+
+class MidnightOffDutyRepairTests(TimelineTestMixin, TestCase):
+    def test_dry_run_counts_and_repair_is_idempotent(self):
+        DutyStatusChange.objects.create(daily_log=self.daily_log, status='driving', start_time=self.at(6), end_time=self.at(9))
+        at_midnight = DailyLog.objects.create(
+            driver=self.driver, date=self.daily_log.date + timedelta(days=1), carrier=self.driver.company,
+            main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1'
+        )
+        DutyStatusChange.objects.create(daily_log=at_midnight, status='on_duty', start_time=self.at(24), end_time=self.at(26))
+        rows = DutyStatusChange.objects.count()
+
+        out = StringIO()
+        call_command('fix_midnight_off_duty', '--all', '--dry-run', stdout=out)
+        self.assertIn('Would fix 1 logs of 1 drivers', out.getvalue())
+        self.assertEqual(DutyStatusChange.objects.count(), rows)
+
+        call_command('fix_midnight_off_duty', '--all', '--batch-size', '1', stdout=out)
+        call_command('fix_midnight_off_duty', '--all', stdout=out)
+        self.assertIn('Fixed 0 logs', out.getvalue())
+
+        off_duty = DutyStatusChange.objects.get(daily_log=self.daily_log, status='off_duty')
+        self.assertEqual((off_duty.start_time, off_duty.end_time), (self.midnight, self.at(6)))
+        self.daily_log.refresh_from_db()
+        self.assertEqual((self.daily_log.off_duty_minutes, self.daily_log.first_status), (360, 'off_duty'))
+
+    def test_default_fixes_each_drivers_home_terminal_today(self):
+        eastern = CustomUser.objects.create_user(
+            username='eastern', email='eastern@example.com', password='password',
+            user_type='driver', company=self.driver.company
+        )
+        DriverProfile.objects.create(
+            user=eastern, home_terminal_address='Test Terminal', home_terminal_timezone='America/New_York'
+        )
+        # 01:00 on the 11th in Kigali, the server zone; 18:00 on the 10th in New York
+        utc = self.at(23)
+        logs = []
+        for driver in (self.driver, eastern):
+            # Today and yesterday at the driver's terminal; only today is fixed
+            for days in (0, 1):
+                date = driver_today(driver, utc) - timedelta(days=days)
+                daily_log, _ = DailyLog.objects.get_or_create(
+                    driver=driver, date=date, defaults={
+                        'carrier': self.driver.company, 'main_office_address': 'Test Office',
+                        'home_terminal_address': 'Test Terminal', 'vehicle_number': 'T-1',
+                    }
+                )
+                start = datetime.combine(date, datetime.min.time()) + timedelta(minutes=1)
+                DutyStatusChange.objects.create(daily_log=daily_log, status='on_duty', start_time=start, end_time=start)
+                logs.append((daily_log, days == 0))
+
+        self.assertEqual(MidnightOffDutyRepair('today', utc=utc).run(), (2, 2))
+
+        for daily_log, fixed in logs:
+            self.assertEqual(daily_log.status_changes.filter(status='off_duty').exists(), fixed)
+
+
+class ListPaginationTests(TimelineTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for days in range(1, 5):
+            daily_log = DailyLog.objects.create(
+                driver=self.driver, date=self.daily_log.date - timedelta(days=days), carrier=self.driver.company,
+                main_office_address='Test Office', home_terminal_address='Test Terminal', vehicle_number='T-1'
+            )
+            DutyStatusChange.objects.create(
+                daily_log=daily_log, status='driving', start_time=self.at(6 - 24 * days), end_time=self.at(9 - 24 * days)
+            )
+        # Grids are stored on commit, which tests never reach
+        store_grids(DailyLog.objects.all())
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='password', user_type='admin'
+        ))
+
+    def test_daily_logs_page_by_date_and_id_in_constant_queries(self):
+        url = reverse('daily-log-list')
+        # The page with its drivers, carriers and grids, then its status changes
+        with self.assertNumQueries(2):
+            first = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([log['date'] for log in first['results']], ['2025-01-10', '2025-01-09'])
+
+        dates = [log['date'] for log in first['results']]
+        next_url = first['next']
+        while next_url:
+            page = self.client.get(next_url).json()
+            dates += [log['date'] for log in page['results']]
+            next_url = page['next']
+        self.assertEqual(dates, ['2025-01-10', '2025-01-09', '2025-01-08', '2025-01-07', '2025-01-06'])
+
+        filtered = self.client.get(url, {'start_date': '2025-01-07', 'end_date': '2025-01-08', 'driver': self.driver.id})
+        # Paginated without cursor or page_size too
+        self.assertEqual([log['date'] for log in filtered.json()['results']], ['2025-01-08', '2025-01-07'])
+        DailyLog.objects.filter(date='2025-01-06').update(is_finalized=True)
+        finalized = self.client.get(url, {'is_finalized': 'true', 'page_size': 1}).json()
+        self.assertEqual(([log['date'] for log in finalized['results']], finalized['next']), (['2025-01-06'], None))
+        with mock.patch.object(DailyLogPagination, 'max_page_size', 3):
+            capped = self.client.get(url, {'page_size': 10 ** 6}).json()
+        self.assertEqual(len(capped['results']), 3)
+        self.assertIsNotNone(capped['next'])
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
+
+    def test_page_without_stored_grids_builds_them_in_one_query(self):
+        expected = self.client.get(reverse('daily-log-list'), {'page_size': 3}).json()['results']
+        DailyLogGrid.objects.all().delete()
+        # The page, its status changes, then one period query for the page's grids
+        with self.assertNumQueries(3):
+            results = self.client.get(reverse('daily-log-list'), {'page_size': 3}).json()['results']
+        self.assertEqual(
+            [(log['grid'], log['grid_data']) for log in results], [(log['grid'], log['grid_data']) for log in expected]
+        )
+        self.assertFalse(DailyLogGrid.objects.exists())
 
-# Create your tests here.
+    def test_status_changes_filter_on_start_time(self):
+        response = self.client.get(reverse('duty-status-change-list'), {
+            'start_date': '2025-01-07', 'end_date': '2025-01-08', 'page_size': 1
+        }).json()
+        self.assertEqual([change['start_time'] for change in response['results']], ['2025-01-08T06:00:00'])
+        page = self.client.get(response['next']).json()
+        self.assertEqual([change['start_time'] for change in page['results']], ['2025-01-07T06:00:00'])
+        self.assertIsNone(page['next'])
@@ -0,0 +1,156 @@
+# backend/eld/timeline.py
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .models import DutyStatusChange
+
+STATUS_CODES = {
+    'off_duty': 0,
+    'sleeper_berth': 1,
+    'driving': 2,
+    'on_duty': 3,
+}
+STATUSES = tuple(sorted(STATUS_CODES, key=STATUS_CODES.get))
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value):
+    """Naive datetime to whole epoch seconds (times are stored without tz)"""
+    return int((value - EPOCH).total_seconds())
+
+
+def to_micros(value):
+    """Naive datetime to epoch microseconds, exact for stored times"""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class DutyTimeline:
+    """
+    Duty periods as parallel NumPy columns: status code (int8), start and
+    end as epoch microseconds (int64) and an open flag. Microseconds keep
+    the round trip to the stored datetimes exact, so the HOS engine sees
+    the same values it would read from the rows.
+    Open periods end at current_time when one is given and are otherwise
+    zero-length, so totals only count closed time.
+    """
+
+    def __init__(self, status, start, end, open_mask):
+        self.status = status
+        self.start = start
+        self.end = end
+        self.open = open_mask
+
+    @classmethod
+    def from_rows(cls, rows, current_time=None):
+        """rows: (status, start_time, end_time) tuples, end_time None while open"""
+        statuses, starts, ends, open_flags = [], [], [], []
+        for status, start_time, end_time in rows:
+            statuses.append(STATUS_CODES[status])
+            starts.append(to_micros(start_time))
+            if end_time is not None:
+                ends.append(to_micros(end_time))
+            elif current_time is not None:
+                ends.append(max(to_micros(current_time), starts[-1]))
+            else:
+                ends.append(starts[-1])
+            open_flags.append(end_time is None)
+        return cls(
+            np.array(statuses, dtype=np.int8),
+            np.array(starts, dtype=np.int64),
+            np.array(ends, dtype=np.int64),
+            np.array(open_flags, dtype=bool),
+        )
+
+    @classmethod
+    def from_queryset(cls, queryset, current_time=None):
+        """Single values_list query over DutyStatusChange rows, in start order"""
+        rows = queryset.order_by('start_time', 'id').values_list('status', 'start_time', 'end_time')
+        return cls.from_rows(rows, current_time)
+
+    @classmethod
+    def for_driver(cls, driver, since=None, until=None, current_time=None):
+        """Periods of the driver starting in since..until"""
+        queryset = DutyStatusChange.objects.filter(daily_log__driver=driver)
+        if since is not None:
+            queryset = queryset.filter(start_time__gte=since)
+        if until is not None:
+            queryset = queryset.filter(start_time__lte=until)
+        return cls.from_queryset(queryset, current_time)
+
+    @classmethod
+    def for_daily_log(cls, daily_log, current_time=None):
+        return cls.from_queryset(DutyStatusChange.objects.filter(daily_log=daily_log), current_time)
+
+    def __len__(self):
+        return len(self.status)
+
+    def __getitem__(self, index):
+        return (
+            STATUSES[self.status[index]],
+            from_micros(self.start[index]),
+            None if self.open[index] else from_micros(self.end[index]),
+        )
+
+    def __iter__(self):
+        """(status, start_time, end_time) tuples, end_time None while open"""
+        for index in range(len(self.status)):
+            yield self[index]
+
+    def select(self, mask):
+        return DutyTimeline(self.status[mask], self.start[mask], self.end[mask], self.open[mask])
+
+    @property
+    def closed(self):
+        return self.select(~self.open)
+
+    @property
+    def durations(self):
+        """Seconds per period"""
+        return (self.end - self.start) / 1e6
+
+    def totals(self):
+        """Seconds per status, every status present"""
+        seconds = np.bincount(self.status, weights=self.durations, minlength=len(STATUSES))
+        return {status: float(seconds[code]) for status, code in STATUS_CODES.items()}
+
+    def total_seconds(self, statuses):
+        totals = self.totals()
+        return sum(totals[status] for status in statuses)
+
+    def clip(self, start_time, end_time):
+        """Parts of the periods inside start_time..end_time; empty parts are dropped"""
+        start = np.maximum(self.start, to_micros(start_time))
+        end = np.minimum(self.end, to_micros(end_time))
+        keep = end > start
+        # An open period stays open only if the cut did not shorten it
+        open_mask = self.open & (self.end <= end)
+        return DutyTimeline(self.status[keep], start[keep], end[keep], open_mask[keep])
+
+    def clip_to_day(self, date):
+        midnight = datetime.combine(date, datetime.min.time())
+        return self.clip(midnight, midnight + timedelta(days=1))
+
+    def merge_adjacent(self):
+        """Collapse runs of same-status periods that touch end to start"""
+        if len(self) < 2:
+            return self
+        breaks = (
+            (self.status[1:] != self.status[:-1])
+            | (self.start[1:] != self.end[:-1])
+            | self.open[:-1]
+        )
+        firsts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+        lasts = np.concatenate((firsts[1:] - 1, [len(self) - 1]))
+        return DutyTimeline(self.status[firsts], self.start[firsts], self.end[lasts], self.open[lasts])
+
+    def overlaps(self):
+        """Indices of periods starting before an earlier period has ended"""
+        if len(self) < 2:
+            return np.array([], dtype=np.int64)
+        running_end = np.maximum.accumulate(self.end)[:-1]
+        return np.flatnonzero(self.start[1:] < running_end) + 1
@@ -0,0 +1,133 @@
+# backend/eld/timezones.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+
+# Duty times are stored as naive wall-clock times of the driver's home
+# terminal. These zones cover the continental US fleet plus the server zone.
+#
+# Known limitation: only "now" goes through the offset tables (local_now,
+# driver_now, local_nows). Durations, rule windows, day totals and grids
+# still subtract wall-clock times, so a period spanning a DST change is off
+# by the hour the clocks moved: an hour short in spring, an hour long in
+# fall, and a 23- or 25-hour day still has 1440 grid minutes. to_utc and
+# day_bounds give the true instants for when those paths convert through
+# the table; nothing outside the tests calls them yet.
+HOME_TERMINAL_TIMEZONES = (
+    ('America/New_York', 'Eastern'),
+    ('America/Chicago', 'Central'),
+    ('America/Denver', 'Mountain'),
+    ('America/Phoenix', 'Mountain (no DST)'),
+    ('America/Los_Angeles', 'Pacific'),
+    ('America/Anchorage', 'Alaska'),
+    ('Pacific/Honolulu', 'Hawaii'),
+    ('Africa/Kigali', 'Central Africa'),
+)
+EPOCH = datetime(1970, 1, 1)
+TABLE_YEARS = (2000, 2050)
+
+
+class OffsetTable:
+    """
+    UTC offset transitions of one zone between TABLE_YEARS, precomputed once.
+    instants[i] is the UTC epoch second from which offsets[i] applies, so any
+    lookup, scalar or a whole column of times, is a searchsorted over them.
+    Times outside the table keep the nearest known offset. Local wall times
+    that occur twice when clocks fall back resolve to the later offset.
+    """
+
+    def __init__(self, zone, years=TABLE_YEARS):
+        self.zone = zone
+        tz = ZoneInfo(zone)
+
+        def offset_at(seconds):
+            moment = datetime.fromtimestamp(int(seconds), dt_timezone.utc)
+            return int(moment.astimezone(tz).utcoffset().total_seconds())
+
+        day = 86400
+        first = int((datetime(years[0], 1, 1) - EPOCH).total_seconds())
+        last = int((datetime(years[1] + 1, 1, 1) - EPOCH).total_seconds())
+        instants, offsets = [first], [offset_at(first)]
+        for seconds in range(first + day, last, day):
+            offset = offset_at(seconds)
+            if offset == offsets[-1]:
+                continue
+            # Changes happen at most once a day: bisect the second it took effect
+            low, high = seconds - day, seconds
+            while high - low > 1:
+                middle = (low + high) // 2
+                if offset_at(middle) == offset:
+                    high = middle
+                else:
+                    low = middle
+            instants.append(high)
+            offsets.append(offset)
+
+        self.instants = np.array(instants, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        # Wall-clock second from which each offset applies, for local -> UTC
+        self.local_instants = self.instants + self.offsets
+
+    def offset_seconds(self, utc_seconds):
+        """Offset for UTC epoch seconds; scalar or array"""
+        index = np.searchsorted(self.instants, utc_seconds, side='right') - 1
+        return self.offsets[np.maximum(index, 0)]
+
+    def local_offset_seconds(self, local_seconds):
+        """Offset in force at wall-clock epoch seconds; scalar or array"""
+        index = np.searchsorted(self.local_instants, local_seconds, side='right') - 1
+        return self.offsets[np.maximum(index, 0)]
+
+    def to_local(self, utc_time):
+        seconds = (utc_time - EPOCH).total_seconds()
+        return utc_time + timedelta(seconds=int(self.offset_seconds(seconds)))
+
+    def to_utc(self, local_time):
+        seconds = (local_time - EPOCH).total_seconds()
+        return local_time - timedelta(seconds=int(self.local_offset_seconds(seconds)))
+
+    def day_bounds(self, day):
+        """UTC start and end of a local calendar day (23 or 25 hours long on DST days)"""
+        midnight = datetime.combine(day, datetime.min.time())
+        return self.to_utc(midnight), self.to_utc(midnight + timedelta(days=1))
+
+
+@lru_cache(maxsize=None)
+def offset_table(zone):
+    return OffsetTable(zone)
+
+
+def utc_now():
+    return datetime.now(dt_timezone.utc).replace(tzinfo=None)
+
+
+def driver_timezone(driver):
+    """The driver's home-terminal zone, the server zone when none is set"""
+    profile = getattr(driver, 'driverprofile', None) if driver is not None else None
+    return getattr(profile, 'home_terminal_timezone', '') or settings.TIME_ZONE
+
+
+def local_now(zone=None, now=None):
+    """Wall-clock time in zone; now is a naive UTC time (default: the clock)"""
+    return offset_table(zone or settings.TIME_ZONE).to_local(now or utc_now())
+
+
+def driver_now(driver, now=None):
+    return local_now(driver_timezone(driver), now)
+
+
+def driver_today(driver, now=None):
+    return driver_now(driver, now).date()
+
+
+def local_nows(zones, now=None):
+    """
+    Wall-clock time for each of a list of zones at one UTC instant.
+    One table lookup per distinct zone, however many drivers share it.
+    """
+    now = now or utc_now()
+    by_zone = {zone: offset_table(zone).to_local(now) for zone in set(zones)}
+    return [by_zone[zone] for zone in zones]
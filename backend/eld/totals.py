@@ -0,0 +1,108 @@
+# backend/eld/totals.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+
+from .grid import DayGrid
+from .models import DailyLog, DutyStatusChange
+from .timeline import DutyTimeline
+
+TOTAL_FIELDS = {
+    'off_duty': 'off_duty_minutes',
+    'sleeper_berth': 'sleeper_berth_minutes',
+    'driving': 'driving_minutes',
+    'on_duty': 'on_duty_minutes',
+}
+SUMMARY_FIELDS = tuple(TOTAL_FIELDS.values()) + ('first_status', 'last_status', 'open_status_change_id')
+
+
+def day_summary(timeline, open_change, date):
+    """
+    Stored totals of one day: closed minutes per status from the day's
+    minute grid, the first and last status of the day, and the driver's
+    open status change if it started before the day ended.
+    open_change is an (id, status, start_time) tuple or None.
+    """
+    grid = DayGrid.from_timeline(timeline.closed, date)
+    totals = grid.totals()
+    summary = {field: totals[status] for status, field in TOTAL_FIELDS.items()}
+    segments = grid.segments()
+    tomorrow = datetime.combine(date + timedelta(days=1), datetime.min.time())
+    if open_change is not None and open_change[2] >= tomorrow:
+        open_change = None
+
+    first = segments[0][0] if segments else None
+    last = segments[-1][0] if segments else None
+    summary['first_status'] = first or (open_change[1] if open_change else None)
+    summary['last_status'] = open_change[1] if open_change else last
+    summary['open_status_change_id'] = open_change[0] if open_change else None
+    return summary
+
+
+def expected_summaries(daily_logs):
+    """
+    {log id: summary} for the given logs, from one query over their drivers'
+    periods covering the days between the first and last log
+    """
+    logs_by_driver = defaultdict(list)
+    for daily_log in daily_logs:
+        logs_by_driver[daily_log.driver_id].append(daily_log)
+    if not logs_by_driver:
+        return {}
+
+    dates = [daily_log.date for logs in logs_by_driver.values() for daily_log in logs]
+    first_midnight = datetime.combine(min(dates), datetime.min.time())
+    last_midnight = datetime.combine(max(dates) + timedelta(days=1), datetime.min.time())
+    rows = DutyStatusChange.objects.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=first_midnight),
+        daily_log__driver_id__in=list(logs_by_driver),
+        start_time__lt=last_midnight,
+    ).order_by('daily_log__driver_id', 'start_time', 'id').values_list(
+        'daily_log__driver_id', 'id', 'status', 'start_time', 'end_time'
+    )
+
+    periods, open_changes = defaultdict(list), {}
+    for driver_id, change_id, status, start_time, end_time in rows:
+        periods[driver_id].append((status, start_time, end_time))
+        if end_time is None:
+            open_changes[driver_id] = (change_id, status, start_time)
+
+    summaries = {}
+    for driver_id, logs in logs_by_driver.items():
+        timeline = DutyTimeline.from_rows(periods[driver_id])
+        for daily_log in logs:
+            summaries[daily_log.id] = day_summary(timeline, open_changes.get(driver_id), daily_log.date)
+    return summaries
+
+
+def stale_logs(daily_logs):
+    """(log, expected summary) for each log whose stored totals differ"""
+    summaries = expected_summaries(daily_logs)
+    return [
+        (daily_log, summaries[daily_log.id]) for daily_log in daily_logs
+        if any(getattr(daily_log, field) != value for field, value in summaries[daily_log.id].items())
+    ]
+
+
+def store_totals(daily_logs):
+    """Bring the stored totals of the logs up to date; returns the logs written"""
+    stale = stale_logs(list(daily_logs))
+    for daily_log, summary in stale:
+        for field, value in summary.items():
+            setattr(daily_log, field, value)
+    if stale:
+        DailyLog.objects.bulk_update([daily_log for daily_log, _ in stale], SUMMARY_FIELDS)
+    return [daily_log for daily_log, _ in stale]
+
+
+def refresh_totals(driver_id, start_time, end_time=None):
+    """
+    Update the stored totals of the driver's logs for every day in
+    start_time..end_time; without end_time (an open period) every later day
+    """
+    logs = DailyLog.objects.filter(driver_id=driver_id, date__gte=start_time.date())
+    if end_time is not None:
+        logs = logs.filter(date__lte=end_time.date())
+    return store_totals(logs.only('id', 'driver_id', 'date', *SUMMARY_FIELDS))
+
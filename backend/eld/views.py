@@ -1,28 +1,42 @@
+import logging
+
 from rest_framework import viewsets, permissions, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
 from django.http import HttpResponse
+from django.db import transaction
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
 from math import radians, sin, cos, sqrt, atan2
 
 # Import des modèles
-from .models import DailyLog, DutyStatusChange, LogCertification
-from .serializers import DailyLogSerializer, DutyStatusChangeSerializer
+from .grid import DayGrid
+from .models import DailyLog, DriverOpenStatus, DutyStatusChange, LogCertification
+from .serializers import DailyLogSerializer, DutyStatusChangeSerializer, DutyStatusEventSerializer
 from .pdf_generator import FMCSAPDFGenerator, TripPDFGenerator
+from .pagination import DailyLogPagination, DutyStatusChangePagination
+from .stats import dashboard_stats
+from .sync import MAX_BATCH_SIZE, StatusBatch
 
 # Import Trip depuis l'app trips
 from trips.models import Trip
+from hos.models import DriverHOSState
+from hos.writeback import cycle_hours_writer
+from users.models import CustomUser
+from .timezones import driver_now, driver_today
+
+logger = logging.getLogger(__name__)
 
 # ✅ Helper function to get local time (not UTC)
-def get_local_now():
-    """Get current local time without timezone conversion"""
-    return datetime.now()
+def get_local_now(driver=None):
+    """Current wall-clock time at the driver's home terminal (server zone without one)"""
+    return driver_now(driver)
 
-def get_local_today():
-    """Get today's date in local timezone"""
-    return datetime.now().date()
+def get_local_today(driver=None):
+    """Today's date at the driver's home terminal"""
+    return driver_today(driver)
 
 class DailyLogPDFView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -68,22 +82,66 @@ class TripPDFView(APIView):
             return Response({"error": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
 
 # Gardez vos vues existantes pour DailyLogViewSet et DutyStatusChangeViewSet
+def _list_filters(request, date_field, driver_field, on_datetime=False):
+    """
+    Filters of a list endpoint from ?start_date, ?end_date (YYYY-MM-DD, on
+    date_field) and ?driver (id, on driver_field). A datetime field is
+    compared with midnights, so its index still applies.
+    """
+    filters = {}
+    start_date = parse_date(request.query_params.get('start_date') or '')
+    end_date = parse_date(request.query_params.get('end_date') or '')
+    if on_datetime:
+        if start_date:
+            filters[f'{date_field}__gte'] = datetime.combine(start_date, datetime.min.time())
+        if end_date:
+            filters[f'{date_field}__lt'] = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    else:
+        if start_date:
+            filters[f'{date_field}__gte'] = start_date
+        if end_date:
+            filters[f'{date_field}__lte'] = end_date
+    driver = request.query_params.get('driver')
+    if driver and driver.isdigit():
+        filters[driver_field] = int(driver)
+    return filters
+
 class DailyLogViewSet(viewsets.ModelViewSet):
     serializer_class = DailyLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DailyLogPagination
     
     def get_queryset(self):
         user = self.request.user
+        # Everything the serializer reads per log: driver and carrier names,
+        # the driver's zone for the open status, the grid and the status changes
+        logs = DailyLog.objects.select_related(
+            'minute_grid', 'driver__driverprofile', 'carrier'
+        ).prefetch_related('status_changes')
+        if self.action == 'list':
+            logs = logs.filter(**_list_filters(self.request, 'date', 'driver_id'))
+            # ?is_finalized=true: the logs that have a PDF, filtered before paging
+            is_finalized = self.request.query_params.get('is_finalized')
+            if is_finalized in ('true', 'false'):
+                logs = logs.filter(is_finalized=is_finalized == 'true')
         if user.user_type == 'driver':
-            return DailyLog.objects.filter(driver=user)
+            return logs.filter(driver=user)
         elif user.user_type == 'admin':
             # ✅ Admin sees ALL daily logs from ALL drivers
-            return DailyLog.objects.all()
+            return logs.all()
         elif user.user_type == 'manager':
             # Manager sees only logs from drivers in their company
-            return DailyLog.objects.filter(driver__company=user.company)
+            return logs.filter(driver__company=user.company)
         return DailyLog.objects.none()
     
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            # Logs without a stored grid get theirs from one query for the page, not one each
+            for daily_log, grid in zip(page, DayGrid.for_logs(page)):
+                daily_log._day_grid = grid
+        return page
+    
     def perform_create(self, serializer):
         # ✅ Check if daily log already exists for this driver and date
         log_date = serializer.validated_data.get('date')
@@ -154,7 +212,7 @@ class DailyLogViewSet(viewsets.ModelViewSet):
         )
         
         daily_log.is_certified = True
-        daily_log.certified_at = get_local_now()
+        daily_log.certified_at = get_local_now(daily_log.driver)
         daily_log.save()
         
         return Response({"message": "Log certified successfully"})
@@ -182,7 +240,7 @@ class DailyLogViewSet(viewsets.ModelViewSet):
         daily_log.to_location = request.data.get('to_location')
         daily_log.total_miles_driving_today = request.data.get('total_miles_driving_today', 0)
         daily_log.is_finalized = True
-        daily_log.finalized_at = get_local_now()
+        daily_log.finalized_at = get_local_now(daily_log.driver)
         
         # Close any open status changes
         open_statuses = DutyStatusChange.objects.filter(
@@ -190,10 +248,12 @@ class DailyLogViewSet(viewsets.ModelViewSet):
             end_time__isnull=True
         )
         for status in open_statuses:
-            status.end_time = get_local_now()
+            status.end_time = get_local_now(daily_log.driver)
             status.save()
         
         daily_log.save()
+        DriverHOSState.rebuild(daily_log.driver)
+        transaction.on_commit(cycle_hours_writer.flush)
         
         return Response({
             "message": "Daily log finalized successfully",
@@ -203,7 +263,7 @@ class DailyLogViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Récupérer ou créer le journal d'aujourd'hui"""
-        today = get_local_today()
+        today = get_local_today(request.user)
         
         try:
             daily_log = DailyLog.objects.get(driver=request.user, date=today)
@@ -248,51 +308,21 @@ class DailyLogViewSet(viewsets.ModelViewSet):
         """Get driver statistics for dashboard"""
         try:
             driver = request.user
-            today = get_local_today()
-            
-            # Get current cycle (last 7 days)
-            seven_days_ago = today - timedelta(days=7)
-            logs_last_7_days = DailyLog.objects.filter(
-                driver=driver,
-                date__gte=seven_days_ago,
-                date__lte=today
-            )
+            today = get_local_today(driver)
             
-            # Calculate total hours used in cycle
-            total_hours_used = 0
-            total_miles = 0
+            # One aggregate query over the last 7 days and today
+            stats = dashboard_stats(driver, today)
+            total_hours_used = (stats['cycle_seconds'] or 0) / 3600
+            today_hours = (stats['today_seconds'] or 0) / 3600
+            total_miles = stats['total_miles'] or 0
+            active_trips = stats['active_trips']
             
-            for log in logs_last_7_days:
-                status_changes = log.status_changes.all()
-                for change in status_changes:
-                    if change.status in ['driving', 'on_duty'] and change.end_time:
-                        duration = (change.end_time - change.start_time).total_seconds() / 3600
-                        total_hours_used += duration
-                
-                if log.total_miles_driving_today:
-                    total_miles += log.total_miles_driving_today
-            
-            # Get today's log
-            today_log = DailyLog.objects.filter(driver=driver, date=today).first()
-            today_hours = 0
-            if today_log:
-                status_changes = today_log.status_changes.all()
-                for change in status_changes:
-                    if change.status in ['driving', 'on_duty'] and change.end_time:
-                        duration = (change.end_time - change.start_time).total_seconds() / 3600
-                        today_hours += duration
-            
-            # Get active trips count
-            from trips.models import Trip
-            active_trips = Trip.objects.filter(
-                driver=driver,
-                status__in=['planned', 'in_progress']
-            ).count()
-            
-            # Calculate compliance percentage
-            violations_count = 0
-            total_logs = DailyLog.objects.filter(driver=driver).count()
-            compliance_percentage = 100 if total_logs > 0 else 0
+            # Share of logged days without a recorded HOS violation
+            logged_days = stats['logged_days']
+            violation_days = min(stats['violation_days'], logged_days)
+            compliance_percentage = (
+                round((logged_days - violation_days) / logged_days * 100) if logged_days else 0
+            )
             
             return Response({
                 "hours_used": round(total_hours_used, 1),
@@ -389,22 +419,25 @@ class DailyLogViewSet(viewsets.ModelViewSet):
 class DutyStatusChangeViewSet(viewsets.ModelViewSet):
     serializer_class = DutyStatusChangeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DutyStatusChangePagination
     
     def get_queryset(self):
         user = self.request.user
+        changes = DutyStatusChange.objects.all()
+        if self.action == 'list':
+            changes = changes.filter(**_list_filters(self.request, 'start_time', 'daily_log__driver_id', on_datetime=True))
         if user.user_type == 'driver':
-            return DutyStatusChange.objects.filter(daily_log__driver=user)
+            return changes.filter(daily_log__driver=user)
         elif user.user_type == 'admin':
             # ✅ Admin sees ALL status changes from ALL drivers
-            return DutyStatusChange.objects.all()
+            return changes
         elif user.user_type == 'manager':
             # Manager sees status changes from drivers in their company
-            return DutyStatusChange.objects.filter(daily_log__driver__company=user.company)
+            return changes.filter(daily_log__driver__company=user.company)
         return DutyStatusChange.objects.none()
     
-    def perform_create(self, serializer):
-        today = get_local_today()
-        
+    def _log_defaults(self):
+        """Fields of a new daily log of the requesting driver"""
         # Get company info with fallbacks
         company = self.request.user.company
         
@@ -429,64 +462,144 @@ class DutyStatusChangeViewSet(viewsets.ModelViewSet):
         except:
             home_terminal = 'Not Specified'
         
-        daily_log, created = DailyLog.objects.get_or_create(
-            driver=self.request.user,
-            date=today,
-            defaults={
-                'carrier': company,
-                'main_office_address': main_office,
-                'home_terminal_address': home_terminal,
-                'total_miles_driving_today': 0,
-                'total_mileage_today': 0,
-                'vehicle_number': "NOT-ASSIGNED",
-            }
-        )
+        return {
+            'carrier': company,
+            'main_office_address': main_office,
+            'home_terminal_address': home_terminal,
+            'total_miles_driving_today': 0,
+            'total_mileage_today': 0,
+            'vehicle_number': "NOT-ASSIGNED",
+        }
+    
+    def perform_create(self, serializer):
+        # One transaction under the driver's row lock, as for an offline sync:
+        # concurrent changes of one driver close and open statuses one after the other
+        with transaction.atomic():
+            CustomUser.objects.select_for_update().filter(pk=self.request.user.pk).first()
+            today = get_local_today(self.request.user)
         
-        # ✅ BLOCK STATUS CHANGES IF LOG IS FINALIZED
-        if daily_log.is_finalized:
-            from rest_framework.exceptions import ValidationError
-            raise ValidationError({
-                "error": "Cannot add status changes to a finalized log",
-                "detail": f"This log was finalized on {daily_log.finalized_at}. No further changes are allowed."
-            })
+            daily_log, created = DailyLog.objects.get_or_create(
+                driver=self.request.user,
+                date=today,
+                defaults=self._log_defaults()
+            )
         
-        # ✅ AUTO-CLOSE PREVIOUS STATUS (Auto-fill after 15 min)
-        # Find the last status change without end_time
-        previous_status = DutyStatusChange.objects.filter(
-            daily_log=daily_log,
-            end_time__isnull=True
-        ).order_by('-start_time').first()
+            # ✅ BLOCK STATUS CHANGES IF LOG IS FINALIZED
+            if daily_log.is_finalized:
+                from rest_framework.exceptions import ValidationError
+                raise ValidationError({
+                    "error": "Cannot add status changes to a finalized log",
+                    "detail": f"This log was finalized on {daily_log.finalized_at}. No further changes are allowed."
+                })
         
-        new_start_time = serializer.validated_data.get('start_time', get_local_now())
+            # ✅ AUTO-CLOSE PREVIOUS STATUS (Auto-fill after 15 min)
+            # The driver's open status, by primary key; only today's log is auto-closed
+            previous_status = DriverOpenStatus.current(self.request.user)
+            if previous_status and previous_status.daily_log_id != daily_log.id:
+                previous_status = None
         
-        # ✅ No timezone conversion needed with USE_TZ = False
-        # Times are stored as-is from frontend
+            new_start_time = serializer.validated_data.get('start_time', get_local_now(self.request.user))
+            closed_periods = []
         
-        if previous_status:
-            # Set end_time to the start_time of the new status
-            previous_status.end_time = new_start_time
-            previous_status.save()
-            print(f"✅ Auto-closed previous status: {previous_status.status} at {previous_status.end_time}")
-        else:
-            # ✅ FIRST STATUS OF THE DAY - Create "Off Duty" from Midnight (00:00)
-            # Check if this is the first status change of the day
-            status_count = DutyStatusChange.objects.filter(daily_log=daily_log).count()
+            # ✅ No timezone conversion needed with USE_TZ = False
+            # Times are stored as-is from frontend
+        
+            if previous_status:
+                # Set end_time to the start_time of the new status
+                previous_status.end_time = new_start_time
+                previous_status.save()
+                closed_periods.append((previous_status.status, previous_status.start_time, previous_status.end_time))
+                logger.debug('Auto-closed previous status: %s at %s', previous_status.status, previous_status.end_time)
+            else:
+                # ✅ FIRST STATUS OF THE DAY - Create "Off Duty" from Midnight (00:00)
+                # Check if this is the first status change of the day
+                status_count = DutyStatusChange.objects.filter(daily_log=daily_log).count()
             
-            if status_count == 0:
-                # Create automatic "Off Duty" status from midnight (00:00) to the new status start time
-                # Use the date from daily_log to ensure we get midnight of the correct day
-                midnight = datetime.combine(daily_log.date, datetime.min.time())
+                if status_count == 0:
+                    # Create automatic "Off Duty" status from midnight (00:00) to the new status start time
+                    # Use the date from daily_log to ensure we get midnight of the correct day
+                    midnight = datetime.combine(daily_log.date, datetime.min.time())
                 
-                # Only create if the new status doesn't start at midnight
-                if new_start_time > midnight:
-                    auto_off_duty = DutyStatusChange.objects.create(
-                        daily_log=daily_log,
-                        status='off_duty',
-                        start_time=midnight,
-                        end_time=new_start_time,
-                        location='Automatic - Start of Day',
-                        notes='Automatically created: Off Duty from Midnight (00:00)'
-                    )
-                    print(f"✅ Auto-created Off Duty from Midnight (00:00) to {new_start_time}")
+                    # Only create if the new status doesn't start at midnight
+                    if new_start_time > midnight:
+                        auto_off_duty = DutyStatusChange.objects.create(
+                            daily_log=daily_log,
+                            status='off_duty',
+                            start_time=midnight,
+                            end_time=new_start_time,
+                            location='Automatic - Start of Day',
+                            notes='Automatically created: Off Duty from Midnight (00:00)'
+                        )
+                        closed_periods.append((auto_off_duty.status, auto_off_duty.start_time, auto_off_duty.end_time))
+                        logger.debug('Auto-created Off Duty from Midnight (00:00) to %s', new_start_time)
+        
+            new_status = serializer.save(daily_log=daily_log)
+        
+            # ✅ Advance the driver's HOS state with the closed and newly opened periods
+            if new_status.end_time:
+                closed_periods.append((new_status.status, new_status.start_time, new_status.end_time))
+                open_period = None
+            else:
+                open_period = (new_status.status, new_status.start_time)
+            DriverHOSState.advance(self.request.user, closed_periods, open_period, get_local_now(self.request.user))
+    
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Offline sync: an ordered batch of status changes recorded by the
+        driver's device, applied in one transaction with a result per event.
+        Retrying a batch is safe; events already stored report 'duplicate'.
+        """
+        if request.user.user_type != 'driver':
+            return Response(
+                {"error": "Only drivers can sync status changes"},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        serializer.save(daily_log=daily_log)
\ No newline at end of file
+        events = request.data.get('events') if isinstance(request.data, dict) else None
+        if not isinstance(events, list) or not events:
+            return Response({"error": "events must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > MAX_BATCH_SIZE:
+            return Response(
+                {"error": f"A batch holds at most {MAX_BATCH_SIZE} events"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Malformed events are rejected on their own; the rest are applied in order
+        valid, invalid = [], {}
+        for index, event in enumerate(events):
+            serializer = DutyStatusEventSerializer(data=event)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                invalid[index] = {
+                    'index': index,
+                    'client_event_id': event.get('client_event_id') if isinstance(event, dict) else None,
+                    'result': 'rejected',
+                    'id': None,
+                    'errors': serializer.errors,
+                }
+        
+        batch_results = StatusBatch(request.user, [event for _, event in valid], self._log_defaults()).apply()
+        for (index, _), result in zip(valid, batch_results):
+            result['index'] = index
+        results = sorted(batch_results + list(invalid.values()), key=lambda result: result['index'])
+        
+        return Response({
+            'results': results,
+            'created': sum(result['result'] == 'created' for result in results),
+            'duplicates': sum(result['result'] == 'duplicate' for result in results),
+            'rejected': sum(result['result'] == 'rejected' for result in results),
+        })
+    
+    def perform_update(self, serializer):
+        # Editing a past interval invalidates the incremental counters
+        duty_status = serializer.save()
+        DriverHOSState.rebuild(duty_status.daily_log.driver)
+        transaction.on_commit(cycle_hours_writer.flush)
+    
+    def perform_destroy(self, instance):
+        driver = instance.daily_log.driver
+        instance.delete()
+        DriverHOSState.rebuild(driver)
+        transaction.on_commit(cycle_hours_writer.flush)
\ No newline at end of file
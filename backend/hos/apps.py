@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,218 @@
+# backend/hos/backfill.py
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.utils import timezone
+
+from eld.models import DutyStatusChange
+from eld.timezones import driver_now
+from users.models import CustomUser
+from .models import HOSRuleEngine, HOSViolation, OpenViolation, ViolationBackfillCheckpoint
+from .projection import ViolationProjector
+
+VIOLATION_TYPES = ('14_hour', '11_hour', 'break', '70_hour')
+
+
+class TransitionEvaluator:
+    """
+    Rule evaluation at every status transition of one driver, in time order.
+    Reset-anchored counters come from HOSRuleEngine.accumulate; the trailing
+    break and cycle look-backs slide over deques of the periods inside them,
+    so memory is bounded by the look-backs rather than the history.
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.totals = HOSRuleEngine.empty_totals()
+        self.break_periods = deque()  # (status, start_time, seconds) inside the break look-back
+        self.cycle_periods = deque()  # (start_time, seconds) on duty since the last restart
+        self.cycle_seconds = 0.0
+        self.violated = set()
+
+    def add(self, status, start_time, end_time):
+        """Fold a period; returns the violations that began when it ended and the types that cleared"""
+        plan = self.plan
+        seconds = (end_time - start_time).total_seconds()
+        last_restart_at = self.totals['last_restart_at']
+        HOSRuleEngine.accumulate(self.totals, status, start_time, end_time, end_time, plan)
+
+        if self.totals['last_restart_at'] != last_restart_at:
+            self.cycle_periods.clear()
+            self.cycle_seconds = 0.0
+        if status in HOSRuleEngine.SERVICE_STATUSES:
+            self.cycle_periods.append((start_time, seconds))
+            self.cycle_seconds += seconds
+        cycle_from = end_time - plan.window_lengths['cycle']
+        while self.cycle_periods and self.cycle_periods[0][0] < cycle_from:
+            self.cycle_seconds -= self.cycle_periods.popleft()[1]
+
+        self.break_periods.append((status, start_time, seconds))
+        break_from = end_time - plan.window_lengths['break']
+        while self.break_periods and self.break_periods[0][1] < break_from:
+            self.break_periods.popleft()
+
+        self.totals.update({
+            'cycle_seconds': self.cycle_seconds,
+            'break_driving_seconds': sum(s for st, _, s in self.break_periods if st == 'driving'),
+            'break_taken': any(
+                st in HOSRuleEngine.REST_STATUSES and s >= 1800 for st, _, s in self.break_periods
+            ),
+        })
+        results = HOSRuleEngine.evaluate_rules(self.totals, end_time, plan)
+        violations = {
+            result['violation_type']: result for result in results if result['violation_type'] in VIOLATION_TYPES
+        }
+
+        started = [result for violation_type, result in violations.items() if violation_type not in self.violated]
+        cleared = [violation_type for violation_type in self.violated if violation_type not in violations]
+        self.violated = set(violations)
+        return started, cleared
+
+
+class ViolationBackfill:
+    """
+    Replays every driver's full duty history and writes the violations found
+    at each status transition as HOSViolation rows, as the live tracker
+    would have: stamped with the instant the limit was crossed, resolved at
+    the transition where the rule cleared, and the ones still in progress
+    registered in OpenViolation.
+    Rows are streamed with iterator() in driver and time order, violations
+    are written with bulk_create (duplicates on driver, type and time are
+    skipped by the unique constraint) and the checkpoint advances after each
+    driver, so an interrupted run resumes with the next unfinished driver.
+    """
+
+    def __init__(self, key='default', chunk_size=2000, batch_size=1000,
+                 progress=None, progress_every=10000, current_time=None):
+        self.key = key
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.progress = progress
+        self.progress_every = progress_every
+        self.current_time = current_time  # open statuses end here; by default, now at each driver's terminal
+        self.pending = []
+        self.resolved = []
+
+    def run(self, restart=False):
+        checkpoint, _ = ViolationBackfillCheckpoint.objects.get_or_create(key=self.key)
+        if restart:
+            checkpoint.last_driver_id = 0
+            checkpoint.periods_processed = checkpoint.violations_created = 0
+            checkpoint.completed_at = None
+            checkpoint.save()
+
+        rows = DutyStatusChange.objects.filter(
+            daily_log__driver_id__gt=checkpoint.last_driver_id
+        ).order_by('daily_log__driver_id', 'start_time', 'id').values_list(
+            'daily_log__driver_id', 'status', 'start_time', 'end_time'
+        ).iterator(chunk_size=self.chunk_size)
+
+        for driver_id, periods in groupby(rows, key=itemgetter(0)):
+            driver = CustomUser.objects.select_related('company', 'driverprofile').get(id=driver_id)
+            evaluator = TransitionEvaluator(HOSRuleEngine.plan_for_driver(driver))
+            current_time = self.current_time or driver_now(driver)
+            in_progress = {}  # violation_type: HOSViolation not yet cleared
+            for _, status, start_time, end_time in periods:
+                end_time = end_time or current_time
+                started, cleared = evaluator.add(status, start_time, end_time)
+                if started:
+                    # Stamped as ViolationTracker.detect does, so both paths write the same row
+                    instants = ViolationProjector.first_violations(driver_id, start_time, end_time, evaluator.plan)
+                    for result in started:
+                        result['violation_time'] = instants.get(result['violation_type']) or end_time
+                        violation = self._violation(driver_id, result)
+                        self.pending.append(violation)
+                        in_progress[result['violation_type']] = violation
+                for violation_type in cleared:
+                    violation = in_progress.pop(violation_type)
+                    violation.is_resolved, violation.resolved_at = True, end_time
+                    self.resolved.append(violation)
+                if len(self.pending) + len(self.resolved) >= self.batch_size:
+                    checkpoint.violations_created += self.flush()
+                checkpoint.periods_processed += 1
+                if self.progress and checkpoint.periods_processed % self.progress_every == 0:
+                    self.progress(checkpoint)
+
+            checkpoint.violations_created += self.flush()
+            self.index_open(driver_id, in_progress, current_time)
+            checkpoint.last_driver_id = driver_id
+            checkpoint.save()
+
+        checkpoint.completed_at = timezone.now()
+        checkpoint.save()
+        if self.progress:
+            self.progress(checkpoint)
+        return checkpoint
+
+    def flush(self):
+        """Write pending violations and resolutions; returns how many violations were new"""
+        pending, self.pending = self.pending, []
+        resolved, self.resolved = self.resolved, []
+        created = 0
+        if pending:
+            driver_ids = {violation.driver_id for violation in pending}
+            before = HOSViolation.objects.filter(driver_id__in=driver_ids).count()
+            HOSViolation.objects.bulk_create(pending, ignore_conflicts=True)
+            created = HOSViolation.objects.filter(driver_id__in=driver_ids).count() - before
+        if resolved:
+            # Rows inserted resolved are done; rows written before (an earlier
+            # flush, run or the live tracker) take their resolution here
+            resolved_at = {
+                (violation.driver_id, violation.violation_type, violation.violation_time): violation.resolved_at
+                for violation in resolved
+            }
+            rows = HOSViolation.objects.filter(
+                driver_id__in={violation.driver_id for violation in resolved}, is_resolved=False
+            ).values_list('id', 'driver_id', 'violation_type', 'violation_time')
+            updates = []
+            for violation_id, driver_id, violation_type, violation_time in rows:
+                key = (driver_id, violation_type, violation_time)
+                if key in resolved_at:
+                    updates.append(HOSViolation(id=violation_id, is_resolved=True, resolved_at=resolved_at[key]))
+            HOSViolation.objects.bulk_update(updates, ['is_resolved', 'resolved_at'])
+        return created
+
+    @staticmethod
+    def index_open(driver_id, in_progress, current_time):
+        """
+        Point the driver's OpenViolation entries at the violations still in
+        progress at the end of the replay and close the others, so the live
+        tracker carries on from the backfilled history
+        """
+        stored = {
+            violation_type: violation_id
+            for violation_id, violation_type, violation_time in HOSViolation.objects.filter(
+                driver_id=driver_id, violation_type__in=list(in_progress)
+            ).values_list('id', 'violation_type', 'violation_time')
+            if in_progress[violation_type].violation_time == violation_time
+        }
+        with transaction.atomic():
+            entries = dict(OpenViolation.objects.select_for_update().filter(
+                driver_id=driver_id
+            ).values_list('violation_type', 'violation_id'))
+            closed = [violation_type for violation_type in entries if violation_type not in stored]
+            if closed:
+                HOSViolation.objects.filter(
+                    id__in=[entries[violation_type] for violation_type in closed], is_resolved=False
+                ).update(is_resolved=True, resolved_at=current_time)
+                OpenViolation.objects.filter(driver_id=driver_id, violation_type__in=closed).delete()
+            for violation_type, violation_id in stored.items():
+                if entries.get(violation_type) != violation_id:
+                    OpenViolation.objects.update_or_create(
+                        driver_id=driver_id, violation_type=violation_type, defaults={'violation_id': violation_id}
+                    )
+
+    @staticmethod
+    def _violation(driver_id, result):
+        return HOSViolation(
+            driver_id=driver_id,
+            violation_type=result['violation_type'],
+            violation_time=result['violation_time'],
+            description=result['description'],
+            remaining_driving=result.get('remaining_driving'),
+            remaining_hours=result.get('remaining_hours'),
+            remaining_time=result.get('remaining_time'),
+            break_required=result.get('break_required'),
+        )
@@ -0,0 +1,165 @@
+# backend/hos/benchmark.py
+import json
+import platform
+import time
+from datetime import datetime
+
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from eld.models import DailyLog
+from .cache import compliance_cache
+from .fleet import FleetComplianceCalculator
+from .models import DriverHOSState, HOSRuleEngine
+from .synthetic import SyntheticFleet
+
+
+class BenchmarkSuite:
+    """
+    Times the HOS engine and the hot endpoints on synthetic fleets.
+    Each size is generated inside a transaction that is rolled back, so the
+    suite can run against any database without leaving rows behind. Every
+    case records the best wall time of `repeat` runs and the number of
+    queries of one run; results compare against a saved JSON baseline.
+    """
+
+    def __init__(self, sizes=((10, 8),), seed=0, repeat=5, sample=20, progress=None):
+        self.sizes = sizes
+        self.seed = seed
+        self.repeat = repeat
+        self.sample = sample
+        self.progress = progress
+
+    def run(self):
+        results = {
+            'meta': {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'seed': self.seed,
+                'repeat': self.repeat,
+            },
+            'cases': {},
+        }
+        for drivers, days in self.sizes:
+            with transaction.atomic():
+                fleet = SyntheticFleet(drivers=drivers, days=days, seed=self.seed)
+                started = time.perf_counter()
+                company, manager, driver_list = fleet.create(prefix='benchmark')
+                results['cases'][f'generate[{drivers}x{days}]'] = {
+                    'ms': round((time.perf_counter() - started) * 1000, 3), 'queries': None
+                }
+                for name, case in self.cases(fleet, company, manager, driver_list):
+                    key = f'{name}[{drivers}x{days}]'
+                    results['cases'][key] = self.measure(case)
+                    if self.progress:
+                        self.progress(key, results['cases'][key])
+                transaction.set_rollback(True)
+        return results
+
+    def cases(self, fleet, company, manager, drivers):
+        now = fleet.end_time
+        sample = drivers[:self.sample]
+        driver_client, manager_client = APIClient(HTTP_HOST='localhost'), APIClient(HTTP_HOST='localhost')
+        driver_client.force_authenticate(drivers[0])
+        manager_client.force_authenticate(manager)
+        daily_log = DailyLog.objects.filter(driver=drivers[0]).order_by('-date')[1:2].first()
+
+        def per_driver(func):
+            return lambda: [func(driver) for driver in sample]
+
+        def get(client, url):
+            def request():
+                response = client.get(url, secure=True)
+                if response.status_code != 200:
+                    raise RuntimeError(f'{url} returned {response.status_code}')
+            return request
+
+        def cold_compliance():
+            compliance_cache.clear()
+            get(driver_client, '/api/hos/compliance/')()
+
+        yield 'engine.calculate_compliance', per_driver(
+            lambda driver: HOSRuleEngine.calculate_compliance(driver, now)
+        )
+        yield 'engine.state_rebuild', per_driver(lambda driver: DriverHOSState.rebuild(driver, now))
+        yield 'engine.fleet_table', lambda: FleetComplianceCalculator.for_company(company, now).fleet_table()
+        yield 'api.compliance', cold_compliance
+        yield 'api.compliance_cached', get(driver_client, '/api/hos/compliance/')
+        yield 'api.fleet', get(manager_client, '/api/hos/compliance/fleet/')
+        yield 'api.driver_stats', get(driver_client, '/api/eld/daily-logs/driver_stats/')
+        if daily_log:
+            yield 'api.daily_log_pdf', get(driver_client, f'/api/eld/daily-logs/{daily_log.id}/pdf/')
+
+    def measure(self, case):
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            case()
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            case()
+            timings.append((time.perf_counter() - started) * 1000)
+        return {'ms': round(min(timings), 3), 'queries': queries.count}
+
+
+class QueryCounter:
+    """Counts every query, including those of requests (which reset connection.queries)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+# Absolute ceilings per case, whatever the fleet size: wall time of one
+# request and queries issued. hos_benchmark checks both on every run,
+# baseline or not; the test suite checks queries only, wall time being
+# too noisy on a shared machine.
+BUDGETS = {
+    'api.driver_stats': {'ms': 10.0, 'queries': 2},
+}
+
+
+def over_budget(results, budgets=BUDGETS, fields=('ms', 'queries')):
+    """Cases over their budget in any of fields, as (case, field, budget, value) tuples"""
+    failures = []
+    for key, case in results['cases'].items():
+        budget = budgets.get(key.split('[')[0])
+        if not budget:
+            continue
+        for field in fields:
+            if field in budget and case[field] is not None and case[field] > budget[field]:
+                failures.append((key, field, budget[field], case[field]))
+    return failures
+
+
+def compare(results, baseline, tolerance=0.25, min_ms=1.0):
+    """
+    Cases slower than the baseline by more than `tolerance` (and by at least
+    `min_ms`, so sub-millisecond jitter is ignored), or issuing more queries
+    than it did. Returns (case, field, baseline value, new value) tuples.
+    """
+    regressions = []
+    for key, case in results['cases'].items():
+        before = baseline.get('cases', {}).get(key)
+        if not before or key.startswith('generate'):
+            continue
+        if case['ms'] - before['ms'] > max(before['ms'] * tolerance, min_ms):
+            regressions.append((key, 'ms', before['ms'], case['ms']))
+        if before['queries'] is not None and case['queries'] > before['queries']:
+            regressions.append((key, 'queries', before['queries'], case['queries']))
+    return regressions
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save(results, path):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
@@ -0,0 +1,146 @@
+# backend/hos/cache.py
+import pickle
+import threading
+from collections import OrderedDict
+from time import monotonic
+from weakref import WeakSet
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from eld.timezones import driver_now
+from .models import DriverHOSState
+
+
+def get_revision(driver_id):
+    """
+    (state id, revision) of the driver's stored HOS state, None without one.
+    Read from the database, so a bump in one process reaches the cached
+    reports of all of them; a state deleted and rebuilt gets a new id.
+    """
+    return DriverHOSState.objects.filter(driver_id=driver_id).values_list('pk', 'revision').first()
+
+
+def bump_revisions(driver_ids):
+    """Invalidate every cached compliance report of the drivers"""
+    invalidate_reports(driver_ids)
+    return DriverHOSState.objects.filter(driver_id__in=driver_ids).update(revision=F('revision') + 1)
+
+
+def bump_revision(driver_id):
+    return bump_revisions([driver_id])
+
+
+def invalidate_reports(driver_ids):
+    """
+    Drop the drivers' entries from every cache of this process, now and once
+    the writer commits, so a read racing the transaction cannot keep the
+    state from before it. Other processes see the bumped revision.
+    """
+    driver_ids = list(driver_ids)
+
+    def drop():
+        for cache in list(ComplianceCache.instances):
+            cache.invalidate(driver_ids)
+    drop()
+    transaction.on_commit(drop)
+
+
+class ComplianceCache:
+    """
+    LRU cache of compliance reports keyed by (driver id, duty revision).
+    An entry is the driver's HOS state as of the revision; a hit projects it
+    to the current time in memory without a query. Writes in this process
+    drop entries through invalidate_reports; the revision is re-read from the
+    database once an entry was last checked revalidate_after seconds ago,
+    which bounds how long a write from another process goes unseen. Entries
+    also miss once a counted period ages out of a rule window. Total size is
+    bounded by HOS_COMPLIANCE_CACHE_BYTES, least recently used entries go first.
+    """
+
+    instances = WeakSet()
+
+    def __init__(self, max_bytes=None, revalidate_after=None):
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self._entries = OrderedDict()  # driver_id -> (revision, state, size, checked_at)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        ComplianceCache.instances.add(self)
+
+    @property
+    def limit(self):
+        if self.max_bytes is not None:
+            return self.max_bytes
+        return getattr(settings, 'HOS_COMPLIANCE_CACHE_BYTES', 4 * 1024 * 1024)
+
+    @property
+    def revalidate_seconds(self):
+        if self.revalidate_after is not None:
+            return self.revalidate_after
+        return getattr(settings, 'HOS_COMPLIANCE_CACHE_REVALIDATE_SECONDS', 5)
+
+    def report(self, driver, current_time=None):
+        if not current_time:
+            current_time = driver_now(driver)
+
+        checked_at = monotonic()
+        with self._lock:
+            entry = self._entries.get(driver.id)
+            if entry is not None and entry[1].is_stale(current_time):
+                entry = None
+            if entry is not None and checked_at - entry[3] < self.revalidate_seconds:
+                self._entries.move_to_end(driver.id)
+                self.hits += 1
+                return entry[1].compliance_report(current_time)
+
+        if entry is not None and get_revision(driver.id) == entry[0]:
+            with self._lock:
+                # Unless dropped meanwhile, checked again from now
+                if self._entries.get(driver.id) is entry:
+                    self._entries[driver.id] = entry[:3] + (checked_at,)
+                    self._entries.move_to_end(driver.id)
+                self.hits += 1
+            return entry[1].compliance_report(current_time)
+
+        with self._lock:
+            self.misses += 1
+        state = DriverHOSState.for_driver(driver, current_time)
+        # The loaded row's own revision: a bump since the read above only costs a miss.
+        # A state computed for a driver without one is kept until a writer stores it
+        self._store(driver.id, (state.pk, state.revision) if state.pk else None, state, checked_at)
+        return state.compliance_report(current_time)
+
+    def invalidate(self, driver_ids):
+        with self._lock:
+            for driver_id in driver_ids:
+                entry = self._entries.pop(driver_id, None)
+                if entry is not None:
+                    self._size -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, driver_id, revision, state, checked_at):
+        size = len(pickle.dumps(state))
+        with self._lock:
+            # Only the latest revision of a driver is kept: older ones can never hit
+            previous = self._entries.pop(driver_id, None)
+            if previous is not None:
+                self._size -= previous[2]
+            if size > self.limit:
+                return
+            self._entries[driver_id] = (revision, state, size, checked_at)
+            self._size += size
+            while self._size > self.limit:
+                self._size -= self._entries.popitem(last=False)[1][2]
+
+
+compliance_cache = ComplianceCache()
@@ -0,0 +1,332 @@
+# backend/hos/equivalence.py
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from eld.timeline import STATUS_CODES, DutyTimeline, to_epoch
+from .fleet import FleetComplianceCalculator
+from .models import DriverHOSState, HOSRuleEngine
+from .rules import RULE_SETS, get_plan
+from .synthetic import generate_periods
+
+STATUSES = tuple(STATUS_CODES)
+DURATIONS = (0, 15, 30, 60, 120, 180, 300, 420, 480, 600, 660, 2040)  # minutes
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'equivalence')
+
+
+def visible_periods(periods, current_time, plan):
+    """What the compliance query loads: periods started inside the plan's history"""
+    return [period for period in periods if current_time - plan.history <= period[1] <= current_time]
+
+
+# Engines: (periods, current_time, plan) -> compliance report. Periods are
+# (status, start_time, end_time) in start order, end_time None while open.
+
+def reference_engine(periods, current_time, plan):
+    """HOSRuleEngine.calculate_compliance without the query"""
+    totals = HOSRuleEngine.sweep(periods, current_time, plan)
+    results = HOSRuleEngine.evaluate_rules(totals, current_time, plan)
+    return HOSRuleEngine.build_report(None, results, current_time, plan)
+
+
+def timeline_engine(periods, current_time, plan):
+    """The sweep fed from DutyTimeline columns"""
+    return reference_engine(DutyTimeline.from_rows(periods), current_time, plan)
+
+
+def incremental_state_engine(periods, current_time, plan):
+    """
+    DriverHOSState as the status change endpoints drive it: advanced at
+    every change, rebuilt whenever it is missing or expired, then read at
+    current_time. Nothing is saved; the stored fields round-trip in memory.
+    """
+    state = None
+    closed = [period for period in periods if period[2] is not None]
+    open_periods = [period for period in periods if period[2] is None]
+    for index, (status, start_time, end_time) in enumerate(closed):
+        if state is None or state.is_stale(end_time):
+            state = DriverHOSState(rule_set=plan.key)
+            history = visible_periods(closed[:index + 1], end_time, plan)
+            state._store_totals(HOSRuleEngine.sweep(history, end_time, plan), None, end_time)
+        else:
+            totals = state._load_totals()
+            HOSRuleEngine.accumulate(totals, status, start_time, end_time, end_time, plan)
+            state._store_totals(totals, None, end_time)
+        state.computed_at = end_time
+
+    open_period = open_periods[-1] if open_periods else None
+    if state is not None and open_period is not None:
+        state._store_totals(state._load_totals(), open_period, state.computed_at)
+    if state is None or state.is_stale(current_time):
+        state = DriverHOSState(rule_set=plan.key)
+        state._store_totals(HOSRuleEngine.sweep(closed, current_time, plan), open_period, current_time)
+        state.computed_at = current_time
+    return state.compliance_report(current_time)
+
+
+class _FleetOfOne(FleetComplianceCalculator):
+    """FleetComplianceCalculator over in-memory periods of a single driver"""
+
+    def __init__(self, periods, current_time, plan):
+        self.current_time = current_time
+        self.current_times = [current_time]
+        self.drivers = [None]
+        self.driver_index = {}
+        self.plans = [plan]
+        self.periods = periods
+
+    def load_columns(self):
+        now = to_epoch(self.current_time)
+        return (
+            np.zeros(len(self.periods), dtype=np.int64),
+            np.array([STATUS_CODES[status] for status, _, _ in self.periods], dtype=np.int8),
+            np.array([to_epoch(start_time) for _, start_time, _ in self.periods], dtype=np.int64),
+            np.array([to_epoch(end_time) if end_time else now for _, _, end_time in self.periods], dtype=np.int64),
+        )
+
+
+def fleet_engine(periods, current_time, plan):
+    """The vectorized fleet computation for one driver"""
+    totals = _FleetOfOne(periods, current_time, plan).compute_totals()[0]
+    results = HOSRuleEngine.evaluate_rules(totals, current_time, plan)
+    return HOSRuleEngine.build_report(None, results, current_time, plan)
+
+
+ENGINES = {
+    'timeline': timeline_engine,
+    'incremental_state': incremental_state_engine,
+    'fleet': fleet_engine,
+}
+
+
+# Case classes: rng -> (periods, current_time). Times are whole minutes.
+
+def _contiguous(rng, start, count, durations=DURATIONS, gaps=(0,)):
+    periods, current = [], start
+    for _ in range(count):
+        end = current + timedelta(minutes=rng.choice(durations))
+        periods.append((rng.choice(STATUSES), current, end))
+        current = end + timedelta(minutes=rng.choice(gaps))
+    return periods
+
+
+def _end_of(periods, start):
+    return max((period[2] or period[1] for period in periods), default=start)
+
+
+def random_case(rng, start):
+    periods = _contiguous(rng, start, rng.randint(0, 40), gaps=(0, 0, 0, 10))
+    return periods, _end_of(periods, start) + timedelta(minutes=rng.choice((0, 30, 700)))
+
+
+def midnight_case(rng, start):
+    """Periods cut at midnight the way logs store them, plus some that straddle it"""
+    periods = []
+    for status, start_time, end_time in _contiguous(rng, start, rng.randint(1, 25)):
+        midnight = datetime.combine(start_time.date() + timedelta(days=1), datetime.min.time())
+        if start_time < midnight < end_time and rng.random() < 0.7:
+            periods += [(status, start_time, midnight), (status, midnight, end_time)]
+        else:
+            periods.append((status, start_time, end_time))
+    return periods, _end_of(periods, start) + timedelta(minutes=rng.choice((0, 1, 60)))
+
+
+def open_case(rng, start):
+    """The last status is still open at current_time"""
+    periods = _contiguous(rng, start, rng.randint(1, 30))
+    status, start_time, _ = periods[-1]
+    periods[-1] = (status, start_time, None)
+    return periods, start_time + timedelta(minutes=rng.choice((0, 1, 30, 300, 700, 2100)))
+
+
+def zero_length_case(rng, start):
+    periods = _contiguous(rng, start, rng.randint(1, 30), durations=(0, 0, 15, 60, 600))
+    return periods, _end_of(periods, start)
+
+
+def pattern_case(rng, start):
+    """Realistic duty patterns, split sleeper pairs and team driving included"""
+    pattern = rng.choice(('long_haul', 'split_sleeper', 'team', 'short_haul'))
+    end = start + timedelta(days=rng.randint(1, 9), minutes=15 * rng.randint(0, 95))
+    periods = generate_periods(pattern, start, end, rng)
+    if periods and rng.random() < 0.5:
+        periods[-1] = (periods[-1][0], periods[-1][1], None)
+    return periods, end
+
+
+CASE_CLASSES = {
+    'random': random_case,
+    'midnight_crossing': midnight_case,
+    'open_current': open_case,
+    'zero_length': zero_length_case,
+    'duty_patterns': pattern_case,
+}
+
+
+def normalize(value, places=6):
+    """Reports compared as JSON-like values, floats to `places` decimals"""
+    if isinstance(value, dict):
+        return {key: normalize(item, places) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item, places) for item in value]
+    if isinstance(value, float):
+        return round(value, places) + 0.0
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class EquivalenceHarness:
+    """
+    Runs optimized HOS engines against the reference sweep on generated
+    duty timelines and asserts identical reports. Every case class gets
+    `examples` timelines from a seeded generator, so failures reproduce.
+    A failing timeline is shrunk to a minimal counterexample and, with a
+    fixture_dir, saved as JSON; saved fixtures are replayed on every run.
+    Reference and candidate time per case class gives the speedup.
+    """
+
+    def __init__(self, engines=None, cases=None, examples=50, seed=0,
+                 reference=reference_engine, fixture_dir=None, places=6):
+        self.engines = ENGINES if engines is None else engines
+        self.cases = CASE_CLASSES if cases is None else cases
+        self.examples = examples
+        self.seed = seed
+        self.reference = reference
+        self.fixture_dir = fixture_dir
+        self.places = places
+        self.failures = []
+
+    def run(self):
+        """{engine: {case: {examples, failures, reference_ms, candidate_ms, speedup}}}"""
+        results = {}
+        for name, engine in self.engines.items():
+            results[name] = {}
+            for case, periods, current_time, rule_set in self.examples_for(name):
+                stats = results[name].setdefault(case, {
+                    'examples': 0, 'failures': 0, 'reference_ms': 0.0, 'candidate_ms': 0.0,
+                })
+                expected, actual, reference_s, candidate_s = self.check(
+                    engine, periods, current_time, rule_set
+                )
+                stats['examples'] += 1
+                stats['reference_ms'] += reference_s * 1000
+                stats['candidate_ms'] += candidate_s * 1000
+                if expected != actual:
+                    stats['failures'] += 1
+                    self.failures.append(self.counterexample(name, case, engine, periods, current_time, rule_set))
+            for stats in results[name].values():
+                stats['speedup'] = round(stats['reference_ms'] / stats['candidate_ms'], 3) if stats['candidate_ms'] else None
+                stats['reference_ms'] = round(stats['reference_ms'], 3)
+                stats['candidate_ms'] = round(stats['candidate_ms'], 3)
+        return results
+
+    def examples_for(self, engine_name):
+        """(case, periods, current_time, rule_set): saved fixtures first, then generated ones"""
+        for fixture in load_fixtures(self.fixture_dir):
+            if fixture['engine'] == engine_name:
+                yield 'fixtures', fixture['periods'], fixture['current_time'], fixture['rule_set']
+        start = datetime(2025, 1, 1)
+        for case, generate in self.cases.items():
+            rng = random.Random(f'{self.seed}-{case}')
+            for _ in range(self.examples):
+                periods, current_time = generate(rng, start + timedelta(minutes=15 * rng.randint(0, 96)))
+                yield case, periods, current_time, rng.choice(sorted(RULE_SETS))
+
+    def check(self, engine, periods, current_time, rule_set):
+        """(reference report, engine report, reference seconds, engine seconds)"""
+        plan = get_plan(rule_set)
+        periods = visible_periods(periods, current_time, plan)
+        started = time.perf_counter()
+        expected = normalize(self.reference(periods, current_time, plan), self.places)
+        reference_s = time.perf_counter() - started
+        started = time.perf_counter()
+        try:
+            actual = normalize(engine(periods, current_time, plan), self.places)
+        except Exception as error:
+            actual = {'error': repr(error)}
+        return expected, actual, reference_s, time.perf_counter() - started
+
+    def fails(self, engine, periods, current_time, rule_set):
+        expected, actual, _, _ = self.check(engine, periods, current_time, rule_set)
+        return expected != actual
+
+    def shrink(self, engine, periods, current_time, rule_set):
+        """Greedily drop periods, halve durations and close open ones while the engines still disagree"""
+        periods = list(periods)
+        progress = True
+        while progress:
+            progress = False
+            for candidate in self._smaller(periods):
+                if self.fails(engine, candidate, current_time, rule_set):
+                    periods, progress = candidate, True
+                    break
+        return periods
+
+    @staticmethod
+    def _smaller(periods):
+        for index in range(len(periods)):
+            yield periods[:index] + periods[index + 1:]
+        for index, (status, start_time, end_time) in enumerate(periods):
+            if end_time is None:
+                continue
+            minutes = int((end_time - start_time).total_seconds() // 60)
+            if minutes > 1:
+                half = (status, start_time, start_time + timedelta(minutes=minutes // 2))
+                yield periods[:index] + [half] + periods[index + 1:]
+            if status != 'off_duty':
+                yield periods[:index] + [('off_duty', start_time, end_time)] + periods[index + 1:]
+
+    def counterexample(self, engine_name, case, engine, periods, current_time, rule_set):
+        periods = self.shrink(engine, periods, current_time, rule_set)
+        expected, actual, _, _ = self.check(engine, periods, current_time, rule_set)
+        fixture = {
+            'engine': engine_name,
+            'case': case,
+            'rule_set': rule_set,
+            'current_time': current_time.isoformat(),
+            'periods': [
+                [status, start_time.isoformat(), end_time.isoformat() if end_time else None]
+                for status, start_time, end_time in periods
+            ],
+            'expected': expected,
+            'actual': actual,
+        }
+        if self.fixture_dir and case != 'fixtures':
+            fixture['path'] = save_fixture(fixture, self.fixture_dir)
+        return fixture
+
+
+def save_fixture(fixture, directory):
+    """Write a counterexample as <engine>-<case>-<digest>.json; returns the path"""
+    os.makedirs(directory, exist_ok=True)
+    content = json.dumps(fixture, indent=2, sort_keys=True)
+    digest = hashlib.sha1(content.encode()).hexdigest()[:10]
+    path = os.path.join(directory, f"{fixture['engine']}-{fixture['case']}-{digest}.json")
+    with open(path, 'w') as handle:
+        handle.write(content + '\n')
+    return path
+
+
+def load_fixtures(directory):
+    """Saved counterexamples with their times parsed back"""
+    if not directory or not os.path.isdir(directory):
+        return []
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as handle:
+            fixture = json.load(handle)
+        fixture['current_time'] = datetime.fromisoformat(fixture['current_time'])
+        fixture['periods'] = [
+            (status, datetime.fromisoformat(start_time), datetime.fromisoformat(end_time) if end_time else None)
+            for status, start_time, end_time in fixture['periods']
+        ]
+        fixtures.append(fixture)
+    return fixtures
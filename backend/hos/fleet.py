@@ -0,0 +1,232 @@
+# backend/hos/fleet.py
+from datetime import timedelta
+
+import numpy as np
+
+from eld.models import DutyStatusChange
+from eld.timeline import EPOCH, STATUS_CODES, to_epoch
+from eld.timezones import driver_timezone, local_now, local_nows
+from users.models import CustomUser
+from .models import HOSRuleEngine
+
+class FleetComplianceCalculator:
+    """
+    Fleet-wide HOS compliance in one query.
+    All duty periods of the fleet are loaded into columnar NumPy arrays
+    (driver index, status code, start and end epoch seconds) and every rule
+    counter is computed for all drivers at once with grouped reductions.
+    Without an explicit current_time every driver is evaluated at the
+    wall-clock time of their own home terminal.
+    """
+
+    def __init__(self, drivers, current_time=None):
+        self.drivers = list(drivers.select_related('company', 'driverprofile'))
+        self.driver_index = {driver.id: index for index, driver in enumerate(self.drivers)}
+        self.plans = [HOSRuleEngine.plan_for_driver(driver) for driver in self.drivers]
+        if current_time:
+            self.current_times = [current_time] * len(self.drivers)
+        else:
+            self.current_times = local_nows([driver_timezone(driver) for driver in self.drivers])
+        self.current_time = current_time or max(self.current_times, default=None) or local_now()
+
+    @classmethod
+    def for_company(cls, company, current_time=None):
+        drivers = CustomUser.objects.filter(user_type='driver', company=company).order_by('id')
+        return cls(drivers, current_time)
+
+    def plan_seconds(self, duration_of):
+        """One plan duration per driver index, in seconds"""
+        return np.array([int(duration_of(plan).total_seconds()) for plan in self.plans], dtype=np.int64)
+
+    def now_seconds(self):
+        """Each driver's current time as epoch seconds, by driver index"""
+        return np.array([to_epoch(current_time) for current_time in self.current_times], dtype=np.int64)
+
+    def load_columns(self):
+        """Single query for every driver's periods inside their own look-back"""
+        nows = self.now_seconds()
+        since = min(
+            (current_time - plan.history for current_time, plan in zip(self.current_times, self.plans)),
+            default=self.current_time - timedelta(days=8)
+        )
+        rows = DutyStatusChange.objects.filter(
+            daily_log__driver_id__in=list(self.driver_index),
+            start_time__gte=since
+        ).values_list('daily_log__driver_id', 'status', 'start_time', 'end_time')
+
+        driver_ids, statuses, starts, ends = [], [], [], []
+        for driver_id, status, start_time, end_time in rows:
+            index = self.driver_index[driver_id]
+            driver_ids.append(index)
+            statuses.append(STATUS_CODES[status])
+            starts.append(to_epoch(start_time))
+            ends.append(to_epoch(end_time) if end_time else nows[index])
+
+        driver_idx = np.array(driver_ids, dtype=np.int64)
+        start = np.array(starts, dtype=np.int64)
+        # One query for everyone; drop what lies outside each driver's look-back
+        keep = start >= (nows - self.plan_seconds(lambda plan: plan.history))[driver_idx]
+        return (
+            driver_idx[keep],
+            np.array(statuses, dtype=np.int8)[keep],
+            start[keep],
+            np.array(ends, dtype=np.int64)[keep],
+        )
+
+    def compute_totals(self):
+        """Per-driver totals in the same form HOSRuleEngine.sweep returns"""
+        driver_idx, status, start, end = self.load_columns()
+        count = len(self.drivers)
+
+        # Group each driver's periods together, in start order
+        order = np.lexsort((start, driver_idx))
+        driver_idx, status, start, end = driver_idx[order], status[order], start[order], end[order]
+        positions = np.arange(len(start))
+
+        age = self.now_seconds()[driver_idx] - start
+        duration = (end - start).astype(np.float64)
+        windows = {
+            name: age <= self.plan_seconds(lambda plan: plan.window_lengths[name])[driver_idx]
+            for name in ('break', 'cycle')
+        }
+        reset_duration = self.plan_seconds(lambda plan: plan.reset_duration)[driver_idx]
+        restart_duration = self.plan_seconds(lambda plan: plan.restart_duration)[driver_idx]
+        duty_window = self.plan_seconds(lambda plan: plan.duty_window)[driver_idx]
+        split_sleeper = self.plan_seconds(lambda plan: plan.split_sleeper)[driver_idx]
+        split_other = self.plan_seconds(lambda plan: plan.split_other)[driver_idx]
+
+        is_driving = status == STATUS_CODES['driving']
+        is_service = is_driving | (status == STATUS_CODES['on_duty'])
+        is_rest = ~is_service
+        is_sleeper = status == STATUS_CODES['sleeper_berth']
+        same_driver = driver_idx[1:] == driver_idx[:-1]
+
+        # Rest runs: a rest period continues the run when it starts exactly
+        # where the previous rest period of the same driver ended
+        continues_run = np.zeros(len(start), dtype=bool)
+        continues_run[1:] = (
+            is_rest[1:] & is_rest[:-1] & same_driver & (start[1:] == end[:-1])
+        )
+        run_first = np.maximum.accumulate(np.where(continues_run, 0, positions))
+        run_length = end - start[run_first]
+        is_reset = is_rest & (run_length >= reset_duration)
+        is_restart = is_rest & (run_length >= restart_duration)
+
+        # Longest consecutive sleeper berth stretch of each rest run, kept at the run's first row
+        continues_sleeper = np.zeros(len(start), dtype=bool)
+        continues_sleeper[1:] = is_sleeper[1:] & is_sleeper[:-1] & same_driver & (start[1:] == end[:-1])
+        sleeper_first = np.maximum.accumulate(np.where(continues_sleeper, 0, positions))
+        run_sleeper = np.zeros(len(start), dtype=np.int64)
+        np.maximum.at(run_sleeper, run_first[is_sleeper], (end - start[sleeper_first])[is_sleeper])
+
+        last_reset = np.full(count, -1, dtype=np.int64)
+        np.maximum.at(last_reset, driver_idx[is_reset], positions[is_reset])
+        in_shift = positions > last_reset[driver_idx]
+
+        # Split sleeper berth: consecutive candidate runs (2 hours up to the
+        # reset) of the current shift pair up when one holds the sleeper stretch
+        run_last = np.zeros(len(start), dtype=bool)
+        run_last[:-1] = is_rest[:-1] & ~continues_run[1:]
+        run_last[-1:] = is_rest[-1:]
+        is_candidate = run_last & in_shift & (run_length >= split_other) & (run_length < reset_duration)
+        candidates = positions[is_candidate]
+        first, second = candidates[:-1], candidates[1:]
+        first_sleeper, second_sleeper = run_sleeper[run_first[first]], run_sleeper[run_first[second]]
+        is_pair = (
+            (driver_idx[first] == driver_idx[second])
+            & (run_length[first] + run_length[second] >= reset_duration[second])
+            & (
+                ((first_sleeper >= split_sleeper[first]) & (run_length[second] >= split_other[second]))
+                | ((second_sleeper >= split_sleeper[second]) & (run_length[first] >= split_other[first]))
+            )
+        )
+        pair_second = np.full(count, -1, dtype=np.int64)
+        np.maximum.at(pair_second, driver_idx[second[is_pair]], second[is_pair])
+        pair_first = np.full(len(start), -1, dtype=np.int64)
+        pair_first[second[is_pair]] = first[is_pair]
+        has_pair = pair_second >= 0
+        paired_first = np.full(count, -1, dtype=np.int64)
+        paired_first[has_pair] = pair_first[pair_second[has_pair]]
+
+        # The 14-hour window opens with the first on-duty period after the last
+        # reset; after a split pair it runs from the end of the first rest period,
+        # not counting the second. Driving counts from the end of the first period.
+        no_window = np.iinfo(np.int64).max
+        window_start = np.full(count, no_window, dtype=np.int64)
+        shift_service = in_shift & is_service
+        np.minimum.at(window_start, driver_idx[shift_service], start[shift_service])
+        paired = np.flatnonzero(has_pair)
+        window_start[paired] = end[paired_first[paired]] + run_length[pair_second[paired]]
+        after_pair = positions > pair_second[driver_idx]
+        driving_shift = positions > np.maximum(last_reset, paired_first)[driver_idx]
+
+        window_end = window_start[driver_idx] + duty_window
+        overrun = np.where(
+            in_shift & after_pair & is_driving & (window_start[driver_idx] != no_window),
+            np.clip(end - np.maximum(start, window_end), 0, None),
+            0
+        ).astype(np.float64)
+
+        # The cycle only counts on-duty time after the last 34-hour restart
+        last_restart = np.full(count, -1, dtype=np.int64)
+        np.maximum.at(last_restart, driver_idx[is_restart], positions[is_restart])
+        in_cycle = windows['cycle'] & (positions > last_restart[driver_idx])
+        restart_end = np.full(count, -1, dtype=np.int64)
+        restart_end[last_restart >= 0] = end[last_restart[last_restart >= 0]]
+
+        def grouped_sum(mask):
+            return np.bincount(driver_idx[mask], weights=duration[mask], minlength=count)
+
+        def grouped_any(mask):
+            return np.bincount(driver_idx[mask], minlength=count) > 0
+
+        columns = {
+            'window_overrun_seconds': np.bincount(driver_idx, weights=overrun, minlength=count),
+            'driving_seconds': grouped_sum(driving_shift & is_driving),
+            'break_driving_seconds': grouped_sum(windows['break'] & is_driving),
+            'break_taken': grouped_any(windows['break'] & is_rest & (duration >= 1800)),
+            'cycle_seconds': grouped_sum(in_cycle & is_service),
+        }
+
+        totals = []
+        for index in range(count):
+            driver_totals = HOSRuleEngine.empty_totals()
+            for key, column in columns.items():
+                driver_totals[key] = column[index].item()
+            if window_start[index] != no_window:
+                driver_totals['window_start'] = EPOCH + timedelta(seconds=int(window_start[index]))
+            if restart_end[index] >= 0:
+                driver_totals['last_restart_at'] = EPOCH + timedelta(seconds=int(restart_end[index]))
+            if has_pair[index]:
+                first_last, second_last = paired_first[index], pair_second[index]
+                driver_totals['split_pair'] = {
+                    key: EPOCH + timedelta(seconds=int(value)) for key, value in (
+                        ('first_start', start[run_first[first_last]]),
+                        ('first_end', end[first_last]),
+                        ('second_start', start[run_first[second_last]]),
+                        ('second_end', end[second_last]),
+                    )
+                }
+            totals.append(driver_totals)
+        return totals
+
+    def fleet_table(self):
+        """One row per driver with hours used, remaining times and violations"""
+        table = []
+        rows = zip(self.drivers, self.plans, self.current_times, self.compute_totals())
+        for driver, plan, current_time, totals in rows:
+            results = HOSRuleEngine.evaluate_rules(totals, current_time, plan)
+            report = HOSRuleEngine.build_report(driver.id, results, current_time, plan)
+            table.append({
+                'driver': driver.id,
+                'driver_name': driver.get_full_name() or driver.username,
+                'rule_set': plan.key,
+                'is_compliant': report['is_compliant'],
+                'violations': [violation['violation_type'] for violation in report['violations']],
+                'driving_hours': round(totals['driving_seconds'] / 3600, 2),
+                'window_ends_at': results[0]['window_ends_at'],
+                'break_driving_hours': round(totals['break_driving_seconds'] / 3600, 2),
+                'cycle_hours': round(totals['cycle_seconds'] / 3600, 2),
+                'remaining_times': report['remaining_times'],
+            })
+        return table
@@ -0,0 +1,55 @@
+# backend/hos/management/commands/backfill_hos_violations.py
+from django.core.management.base import BaseCommand
+
+from hos.backfill import ViolationBackfill
+
+
+class Command(BaseCommand):
+    help = 'Replay every driver\'s duty history and store the HOS violations found at each status change'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint and start again from the first driver',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default='default',
+            help='Checkpoint name, to keep separate runs apart',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Duty status rows fetched per database round trip',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Violations written per bulk insert',
+        )
+
+    def handle(self, *args, **options):
+        def report(checkpoint):
+            self.stdout.write(
+                f'Processed {checkpoint.periods_processed} status changes, '
+                f'{checkpoint.violations_created} violations created (driver {checkpoint.last_driver_id})'
+            )
+
+        backfill = ViolationBackfill(
+            key=options['checkpoint'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            progress=report,
+        )
+        checkpoint = backfill.run(restart=options['restart'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Backfill complete: {checkpoint.violations_created} violations from '
+                f'{checkpoint.periods_processed} status changes'
+            )
+        )
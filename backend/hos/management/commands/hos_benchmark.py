@@ -0,0 +1,80 @@
+# backend/hos/management/commands/hos_benchmark.py
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hos.benchmark import BenchmarkSuite, compare, load, over_budget, save
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the HOS engine and hot endpoints on synthetic fleets and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='10x8,100x8',
+            help='Comma-separated fleet sizes as DRIVERSxDAYS (default: 10x8,100x8)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Synthetic data seed')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case; the best is kept')
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmarks/latest.json',
+            help='Where to write this run\'s results',
+        )
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            default='benchmarks/baseline.json',
+            help='Baseline to compare against',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Store this run as the new baseline instead of comparing',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed slowdown before a case counts as a regression (default: 0.25)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [tuple(int(part) for part in size.split('x')) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('Sizes must look like 10x8,100x8')
+
+        def report(case, result):
+            self.stdout.write(f"{case:<45} {result['ms']:>10.2f} ms {result['queries']:>6} queries")
+
+        results = BenchmarkSuite(
+            sizes=sizes, seed=options['seed'], repeat=options['repeat'], progress=report
+        ).run()
+
+        failures = over_budget(results)
+        for case, field, budget, value in failures:
+            self.stdout.write(self.style.ERROR(f'{case}: {field} {value} over budget {budget}'))
+
+        path = options['baseline'] if options['save_baseline'] else options['output']
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        save(results, path)
+        self.stdout.write(f'Results written to {path}')
+        if failures:
+            raise CommandError(f'{len(failures)} case(s) over budget')
+        if options['save_baseline']:
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(f"No baseline at {options['baseline']}; run with --save-baseline"))
+            return
+
+        regressions = compare(results, load(options['baseline']), options['tolerance'])
+        for case, field, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f'{case}: {field} {before} -> {after}'))
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark regression(s)')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,47 @@
+# backend/hos/management/commands/hos_equivalence.py
+from django.core.management.base import BaseCommand, CommandError
+
+from hos.equivalence import ENGINES, FIXTURE_DIR, EquivalenceHarness
+
+
+class Command(BaseCommand):
+    help = 'Check optimized HOS engines against the reference sweep on generated duty timelines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--examples', type=int, default=200, help='Generated timelines per case class')
+        parser.add_argument('--seed', type=int, default=0, help='Generator seed')
+        parser.add_argument(
+            '--engine',
+            action='append',
+            choices=sorted(ENGINES),
+            help='Engine to check; repeat for several (default: all)',
+        )
+        parser.add_argument(
+            '--fixtures',
+            type=str,
+            default=FIXTURE_DIR,
+            help='Directory counterexamples are saved to and replayed from',
+        )
+
+    def handle(self, *args, **options):
+        engines = {name: ENGINES[name] for name in options['engine'] or ENGINES}
+        harness = EquivalenceHarness(
+            engines=engines, examples=options['examples'], seed=options['seed'],
+            fixture_dir=options['fixtures']
+        )
+        results = harness.run()
+
+        for engine, cases in results.items():
+            for case, stats in cases.items():
+                self.stdout.write(
+                    f"{engine:<20} {case:<20} {stats['examples']:>6} examples "
+                    f"{stats['failures']:>4} failures  speedup {stats['speedup']}"
+                )
+        for failure in harness.failures:
+            self.stdout.write(self.style.ERROR(
+                f"{failure['engine']} / {failure['case']}: {len(failure['periods'])} period(s) "
+                f"-> {failure.get('path', 'not saved')}"
+            ))
+        if harness.failures:
+            raise CommandError(f'{len(harness.failures)} counterexample(s) found')
+        self.stdout.write(self.style.SUCCESS('Every engine matches the reference'))
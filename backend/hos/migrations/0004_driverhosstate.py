@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hos', '0003_alter_hosviolation_violation_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverHOSState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('remaining_driving', models.FloatField(default=11)),
+                ('remaining_window', models.FloatField(blank=True, null=True)),
+                ('break_clock', models.FloatField(default=0)),
+                ('break_taken', models.BooleanField(default=False)),
+                ('cycle_hours', models.FloatField(default=0)),
+                ('last_reset_at', models.DateTimeField(blank=True, null=True)),
+                ('rest_run_start', models.DateTimeField(blank=True, null=True)),
+                ('open_status', models.CharField(blank=True, choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty', 'On Duty (Not Driving)')], max_length=20, null=True)),
+                ('open_since', models.DateTimeField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('valid_until', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hos_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
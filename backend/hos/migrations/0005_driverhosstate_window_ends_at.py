@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0004_driverhosstate'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='driverhosstate',
+            name='remaining_window',
+        ),
+        migrations.AddField(
+            model_name='driverhosstate',
+            name='window_ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='driverhosstate',
+            name='window_overrun',
+            field=models.FloatField(default=0),
+        ),
+    ]
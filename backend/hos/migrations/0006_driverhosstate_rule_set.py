@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0005_driverhosstate_window_ends_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driverhosstate',
+            name='last_restart_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='driverhosstate',
+            name='rule_set',
+            field=models.CharField(choices=[('property_70_8', 'Property-carrying 70 hours / 8 days'), ('property_60_7', 'Property-carrying 60 hours / 7 days'), ('short_haul', 'Short-haul 150 air-mile (70 hours / 8 days, no 30-minute break)')], default='property_70_8', max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+def clear_states(apps, schema_editor):
+    # Stored counters predate split sleeper pairing; they are rebuilt on next read
+    apps.get_model('hos', 'DriverHOSState').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0006_driverhosstate_rule_set'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='driverhosstate',
+            name='rest_run_start',
+        ),
+        migrations.AddField(
+            model_name='driverhosstate',
+            name='rest_tracking',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(clear_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hos', '0007_driverhosstate_rest_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViolationBackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(default='default', max_length=50, unique=True)),
+                ('last_driver_id', models.IntegerField(default=0)),
+                ('periods_processed', models.BigIntegerField(default=0)),
+                ('violations_created', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='hosviolation',
+            unique_together={('driver', 'violation_type', 'violation_time')},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hos', '0008_violation_backfill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenViolation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('violation_type', models.CharField(choices=[('14_hour', '14-Hour Rule Violation'), ('11_hour', '11-Hour Driving Violation'), ('break', '30-Minute Break Violation'), ('70_hour', '70-Hour/8-Day Violation'), ('14_hour_compliance', '14-Hour Compliance'), ('11_hour_compliance', '11-Hour Compliance'), ('70_hour_compliance', '70-Hour Compliance'), ('break_compliance', 'Break Compliance')], max_length=20)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_violations', to=settings.AUTH_USER_MODEL)),
+                ('violation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='open_entry', to='hos.hosviolation')),
+            ],
+            options={
+                'unique_together': {('driver', 'violation_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0009_open_violation_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driverhosstate',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
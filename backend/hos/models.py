@@ -1,10 +1,15 @@
 # backend/hos/models.py
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
 from django.utils import timezone
 from datetime import timedelta, datetime
 import json
 from users.models import CustomUser
-from eld.models import DutyStatusChange
+from eld.models import DailyLog
+from eld.timeline import DutyTimeline
+from eld.timezones import driver_now
+from .rules import RULE_SET_CHOICES, DEFAULT_RULE_SET, get_plan
+from .writeback import cycle_hours_writer
 
 class HOSRuleEngine:
     """
@@ -12,214 +17,294 @@ class HOSRuleEngine:
     Implements all federal regulations for ELD compliance
     """
     
+    SERVICE_STATUSES = ('driving', 'on_duty')
+    REST_STATUSES = ('off_duty', 'sleeper_berth')
+    
     @staticmethod
-    def check_14_hour_rule(duty_status_changes, current_time=None):
+    def empty_totals():
+        return {
+            # First on-duty start since the last 10-hour reset
+            'window_start': None,
+            'window_overrun_seconds': 0.0,
+            'driving_seconds': 0.0,
+            'break_driving_seconds': 0.0,
+            'break_taken': False,
+            'cycle_seconds': 0.0,
+            # Earliest instant a counted period leaves one of the windows
+            'expires_at': None,
+            # Consecutive off-duty/sleeper run used for reset and restart detection
+            'rest_run_start': None,
+            'rest_run_end': None,
+            # Longest consecutive sleeper berth stretch inside the current rest run
+            'sleeper_run_start': None,
+            'sleeper_run_end': None,
+            'rest_run_sleeper_seconds': 0.0,
+            # Last rest run that can open a split sleeper pair, and the pair in force
+            'split_candidate': None,
+            'split_pair': None,
+            'last_reset_at': None,
+            'last_restart_at': None,
+        }
+    
+    @classmethod
+    def plan_for_driver(cls, driver):
         """
-        14-Hour Rule: Maximum 14 hours of service window
-        After 14 hours, driver must take 10 hours off
+        Compiled rule-set plan for a driver: the driver's own choice, else
+        the company's. Use select_related('company', 'driverprofile') on
+        driver querysets to resolve it without extra queries.
         """
-        if not current_time:
-            current_time = timezone.now()
+        from users.models import DriverProfile
+        try:
+            key = driver.driverprofile.hos_rule_set
+        except DriverProfile.DoesNotExist:
+            key = None
+        if not key and driver.company_id:
+            key = driver.company.hos_rule_set
+        return get_plan(key)
+    
+    @staticmethod
+    def _close_rest_run(totals, plan):
+        """The rest run ended: keep it as the split candidate if it is long enough"""
+        if totals['rest_run_start'] is not None:
+            rest_run = totals['rest_run_end'] - totals['rest_run_start']
+            if plan.split_other <= rest_run < plan.reset_duration:
+                totals['split_candidate'] = {
+                    'start': totals['rest_run_start'],
+                    'end': totals['rest_run_end'],
+                    'sleeper_seconds': totals['rest_run_sleeper_seconds'],
+                    'driving_seconds': 0.0,  # driving since this run ended
+                }
+        totals['rest_run_start'] = totals['rest_run_end'] = None
+        totals['sleeper_run_start'] = totals['sleeper_run_end'] = None
+        totals['rest_run_sleeper_seconds'] = 0.0
+    
+    @staticmethod
+    def _pair_split_periods(totals, plan):
+        """
+        Pair the current rest run with the previous candidate under the split
+        sleeper berth provision: one of them holds at least 7 consecutive hours
+        in the sleeper berth, the other is at least 2 hours of rest, and the
+        two add up to the reset. Only the latest candidate is ever considered,
+        so pairing stays linear in the number of periods.
+        """
+        candidate = totals['split_candidate']
+        if candidate is None:
+            return False
         
-        violations = []
-        fourteen_hours_ago = current_time - timedelta(hours=14)
+        first = candidate['end'] - candidate['start']
+        second = totals['rest_run_end'] - totals['rest_run_start']
+        split_sleeper = plan.split_sleeper.total_seconds()
+        if first + second < plan.reset_duration:
+            return False
+        if not (
+            (candidate['sleeper_seconds'] >= split_sleeper and second >= plan.split_other)
+            or (totals['rest_run_sleeper_seconds'] >= split_sleeper and first >= plan.split_other)
+        ):
+            return False
         
-        # Filter periods within the 14-hour window
-        recent_periods = [d for d in duty_status_changes 
-                         if d.start_time >= fourteen_hours_ago]
+        totals['split_pair'] = {
+            'first_start': candidate['start'],
+            'first_end': candidate['end'],
+            'second_start': totals['rest_run_start'],
+            'second_end': totals['rest_run_end'],
+        }
+        # Neither rest period counts against the 14 hours: the window runs
+        # from the end of the first one, pushed back by the length of the second
+        totals['window_start'] = candidate['end'] + second
+        totals['window_overrun_seconds'] = 0.0
+        totals['driving_seconds'] = candidate['driving_seconds']
+        return True
+    
+    @classmethod
+    def accumulate(cls, totals, status, start_time, end_time, current_time, plan=None):
+        """Fold one period into the running totals of every rule"""
+        plan = plan or get_plan()
+        end = end_time or current_time
+        duration = (end - start_time).total_seconds()
         
-        if recent_periods:
-            total_driving = timedelta()
-            for period in recent_periods:
-                if period.status in ['driving', 'on_duty']:
-                    end_time = period.end_time or current_time
-                    total_driving += (end_time - period.start_time)
-            
-            total_driving_hours = total_driving.total_seconds() / 3600
+        if status in cls.REST_STATUSES:
+            if totals['rest_run_end'] != start_time:
+                cls._close_rest_run(totals, plan)
+                totals['rest_run_start'] = start_time
+            totals['rest_run_end'] = end
+            if status == 'sleeper_berth':
+                if totals['sleeper_run_end'] != start_time:
+                    totals['sleeper_run_start'] = start_time
+                totals['sleeper_run_end'] = end
+                totals['rest_run_sleeper_seconds'] = max(
+                    totals['rest_run_sleeper_seconds'],
+                    (end - totals['sleeper_run_start']).total_seconds()
+                )
             
-            if total_driving_hours >= 14:
-                violations.append({
-                    'violation_type': '14_hour',
-                    'violation_time': current_time,
-                    'description': f'14-hour window violation: {total_driving_hours:.2f} hours worked',
-                    'remaining_time': 0
-                })
+            rest_run = end - totals['rest_run_start']
+            if rest_run >= plan.reset_duration:
+                totals['last_reset_at'] = end
+                totals['window_start'] = None
+                totals['window_overrun_seconds'] = 0.0
+                totals['driving_seconds'] = 0.0
+                totals['split_candidate'] = totals['split_pair'] = None
             else:
-                remaining_time = 14 - total_driving_hours
-                violations.append({
-                    'violation_type': '14_hour_compliance',
-                    'violation_time': current_time,
-                    'description': f'14-hour compliance: {total_driving_hours:.2f}/14 hours used',
-                    'remaining_time': remaining_time
-                })
+                cls._pair_split_periods(totals, plan)
+            if rest_run >= plan.restart_duration:
+                # 34-hour restart: the cycle starts over
+                totals['last_restart_at'] = end
+                totals['cycle_seconds'] = 0.0
+        else:
+            cls._close_rest_run(totals, plan)
+            if totals['window_start'] is None:
+                totals['window_start'] = start_time
+            if status == 'driving':
+                totals['driving_seconds'] += duration
+                if totals['split_candidate'] is not None:
+                    totals['split_candidate']['driving_seconds'] += duration
+                # Driving past the last hour of the window
+                window_end = totals['window_start'] + plan.duty_window
+                overrun = (end - max(start_time, window_end)).total_seconds()
+                if overrun > 0:
+                    totals['window_overrun_seconds'] += overrun
+        
+        age = current_time - start_time
+        windows = [(name, length) for name, length in plan.rule_windows if age <= length]
+        if not windows:
+            return totals
+        
+        expires_at = start_time + windows[0][1]
+        windows = {name for name, length in windows}
+        if totals['expires_at'] is None or expires_at < totals['expires_at']:
+            totals['expires_at'] = expires_at
+        
+        is_service = status in cls.SERVICE_STATUSES
         
-        return violations
+        if 'cycle' in windows and is_service:
+            totals['cycle_seconds'] += duration
+        if 'break' in windows:
+            if status == 'driving':
+                totals['break_driving_seconds'] += duration
+            elif status in cls.REST_STATUSES and duration >= 1800:  # 30 minutes
+                totals['break_taken'] = True
+        
+        return totals
+    
+    @classmethod
+    def sweep(cls, periods, current_time, plan=None):
+        """
+        Single pass over (status, start_time, end_time) periods sorted by start_time.
+        Tracks every rule counter at once: 14-hour window and 11-hour driving
+        since the last 10-hour reset or split sleeper pair, 8-hour break clock
+        and the cycle since the last 34-hour restart.
+        """
+        plan = plan or get_plan()
+        totals = cls.empty_totals()
+        for status, start_time, end_time in periods:
+            cls.accumulate(totals, status, start_time, end_time, current_time, plan)
+        return totals
     
     @staticmethod
-    def check_11_hour_driving_limit(duty_status_changes, current_time=None):
+    def evaluate_rules(totals, current_time, plan=None):
         """
-        11-Hour Rule: Maximum 11 hours of driving
-        After 11 hours driving, 10 hours off required
+        Turn sweep totals into one result per rule, in the same shape
+        the individual checks have always produced
         """
-        if not current_time:
-            current_time = timezone.now()
-        
-        violations = []
-        
-        # Calculate total driving in last 24 hours
-        twenty_four_hours_ago = current_time - timedelta(hours=24)
-        driving_periods = [d for d in duty_status_changes 
-                          if d.start_time >= twenty_four_hours_ago 
-                          and d.status == 'driving']
+        plan = plan or get_plan()
+        results = []
         
-        total_driving = timedelta()
-        for period in driving_periods:
-            end_time = period.end_time or current_time
-            total_driving += (end_time - period.start_time)
-        
-        total_driving_hours = total_driving.total_seconds() / 3600
+        # 14-Hour Rule: no driving after the 14th hour since coming on duty
+        # following 10 consecutive hours off or a split sleeper berth pair
+        if totals['window_start'] is None:
+            results.append({
+                'violation_type': '14_hour_compliance',
+                'violation_time': current_time,
+                'description': f'{plan.window_limit}-hour compliance: window not started since last 10-hour reset',
+                'remaining_time': plan.window_limit,
+                'window_ends_at': None,
+                'split_sleeper_pair': None
+            })
+        else:
+            window_ends_at = totals['window_start'] + plan.duty_window
+            window_hours = (current_time - totals['window_start']).total_seconds() / 3600
+            overrun_hours = totals['window_overrun_seconds'] / 3600
+            if overrun_hours > 0:
+                results.append({
+                    'violation_type': '14_hour',
+                    'violation_time': current_time,
+                    'description': f'{plan.window_limit}-hour window violation: {overrun_hours:.2f} hours driven after window closed at {window_ends_at:%H:%M}',
+                    'remaining_time': 0,
+                    'window_ends_at': window_ends_at,
+                    'split_sleeper_pair': totals['split_pair']
+                })
+            else:
+                results.append({
+                    'violation_type': '14_hour_compliance',
+                    'violation_time': current_time,
+                    'description': f'{plan.window_limit}-hour compliance: {min(window_hours, plan.window_limit):.2f}/{plan.window_limit} hours used',
+                    'remaining_time': max(0, plan.window_limit - window_hours),
+                    'window_ends_at': window_ends_at,
+                    'split_sleeper_pair': totals['split_pair']
+                })
         
-        if total_driving_hours > 11:
-            violations.append({
+        # 11-Hour Rule: Maximum 11 hours of driving since the last reset
+        driving_hours = totals['driving_seconds'] / 3600
+        if driving_hours > plan.driving_limit:
+            results.append({
                 'violation_type': '11_hour',
                 'violation_time': current_time,
-                'description': f'11-hour driving limit exceeded: {total_driving_hours:.2f} hours driven',
+                'description': f'{plan.driving_limit}-hour driving limit exceeded: {driving_hours:.2f} hours driven',
                 'remaining_driving': 0
             })
         else:
-            remaining_driving = 11 - total_driving_hours
-            violations.append({
+            results.append({
                 'violation_type': '11_hour_compliance',
                 'violation_time': current_time,
-                'description': f'11-hour compliance: {total_driving_hours:.2f}/11 hours used',
-                'remaining_driving': remaining_driving
+                'description': f'{plan.driving_limit}-hour compliance: {driving_hours:.2f}/{plan.driving_limit} hours used',
+                'remaining_driving': plan.driving_limit - driving_hours
             })
         
-        return violations
-    
-    @staticmethod
-    def check_30_min_break(duty_status_changes, current_time=None):
-        """
-        30-Minute Break Rule: After 8 hours cumulative driving,
-        driver must take 30-minute break
-        """
-        if not current_time:
-            current_time = timezone.now()
-        
-        violations = []
-        eight_hours_ago = current_time - timedelta(hours=8)
-        
-        # Calculate driving in last 8 hours
-        driving_periods = [d for d in duty_status_changes 
-                          if d.start_time >= eight_hours_ago 
-                          and d.status == 'driving']
-        
-        total_driving = timedelta()
-        for period in driving_periods:
-            end_time = period.end_time or current_time
-            total_driving += (end_time - period.start_time)
-        
-        total_driving_hours = total_driving.total_seconds() / 3600
-        
-        if total_driving_hours >= 8:
-            # Check if 30-minute break was taken
-            has_break = False
-            off_duty_periods = [d for d in duty_status_changes 
-                               if d.start_time >= eight_hours_ago 
-                               and d.status in ['off_duty', 'sleeper_berth']]
-            
-            for period in off_duty_periods:
-                end_time = period.end_time or current_time
-                break_duration = end_time - period.start_time
-                if break_duration.total_seconds() >= 1800:  # 30 minutes
-                    has_break = True
-                    break
-            
-            if not has_break:
-                violations.append({
+        # 30-Minute Break Rule: required after 8 hours cumulative driving
+        if plan.break_required and totals['break_driving_seconds'] / 3600 >= plan.break_after:
+            if not totals['break_taken']:
+                results.append({
                     'violation_type': 'break',
                     'violation_time': current_time,
-                    'description': '30-minute break required after 8 hours of driving',
+                    'description': f'30-minute break required after {plan.break_after} hours of driving',
                     'break_required': 30
                 })
             else:
-                violations.append({
+                results.append({
                     'violation_type': 'break_compliance',
                     'violation_time': current_time,
                     'description': '30-minute break requirement satisfied',
                     'break_required': 0
                 })
         
-        return violations
-    
-    @staticmethod
-    def check_70_hour_8day(driver, duty_status_changes, current_time=None):
-        """
-        70-Hour/8-Day Rule: Maximum 70 hours over 8 consecutive days
-        """
-        if not current_time:
-            current_time = timezone.now()
-        
-        violations = []
-        
-        # Calculate total service hours over 8 days
-        eight_days_ago = current_time - timedelta(days=8)
-        service_periods = [d for d in duty_status_changes 
-                          if d.start_time >= eight_days_ago 
-                          and d.status in ['driving', 'on_duty']]
-        
-        total_service = timedelta()
-        for period in service_periods:
-            end_time = period.end_time or current_time
-            total_service += (end_time - period.start_time)
-        
-        total_service_hours = total_service.total_seconds() / 3600
-        
-        if total_service_hours > 70:
-            violations.append({
+        # Cycle Rule: 70 hours/8 days or 60 hours/7 days since the last 34-hour restart
+        cycle_hours = totals['cycle_seconds'] / 3600
+        cycle_name = f'{plan.cycle_limit}-hour/{plan.cycle_days}-day'
+        if cycle_hours > plan.cycle_limit:
+            results.append({
                 'violation_type': '70_hour',
                 'violation_time': current_time,
-                'description': f'70-hour/8-day limit exceeded: {total_service_hours:.2f} hours worked',
-                'remaining_hours': 0
+                'description': f'{cycle_name} limit exceeded: {cycle_hours:.2f} hours worked',
+                'remaining_hours': 0,
+                'last_restart_at': totals['last_restart_at']
             })
         else:
-            remaining_hours = 70 - total_service_hours
-            # Update driver profile
-            from users.models import DriverProfile
-            try:
-                driver_profile = DriverProfile.objects.get(user=driver)
-                driver_profile.current_cycle_used = total_service_hours
-                driver_profile.save()
-            except DriverProfile.DoesNotExist:
-                pass
-            
-            violations.append({
+            results.append({
                 'violation_type': '70_hour_compliance',
                 'violation_time': current_time,
-                'description': f'70-hour compliance: {total_service_hours:.2f}/70 hours used',
-                'remaining_hours': remaining_hours
+                'description': f'{cycle_name} compliance: {cycle_hours:.2f}/{plan.cycle_limit} hours used',
+                'remaining_hours': plan.cycle_limit - cycle_hours,
+                'last_restart_at': totals['last_restart_at']
             })
         
-        return violations
+        return results
     
     @classmethod
-    def calculate_compliance(cls, driver, current_time=None):
-        """
-        Main method to calculate complete HOS compliance
-        Returns all compliance statuses and violations
-        """
-        if not current_time:
-            current_time = timezone.now()
-        
-        # Get all recent duty status changes
-        duty_status_changes = DutyStatusChange.objects.filter(
-            daily_log__driver=driver,
-            start_time__gte=current_time - timedelta(days=8)
-        )
-        
+    def build_report(cls, driver_id, results, current_time, plan=None):
+        """Compile rule results into the compliance report"""
         compliance_report = {
-            'driver': driver.id,
+            'driver': driver_id,
             'calculation_time': current_time,
+            'rule_set': (plan or get_plan()).key,
             'is_compliant': True,
             'violations': [],
             'warnings': [],
@@ -227,33 +312,40 @@ class HOSRuleEngine:
             'remaining_times': {}
         }
         
-        # Execute all compliance checks
-        checks = [
-            cls.check_14_hour_rule(duty_status_changes, current_time),
-            cls.check_11_hour_driving_limit(duty_status_changes, current_time),
-            cls.check_30_min_break(duty_status_changes, current_time),
-            cls.check_70_hour_8day(driver, duty_status_changes, current_time),
-        ]
-        
-        # Compile results
-        for check_result in checks:
-            for result in check_result:
-                if 'violation' in result['violation_type'] and 'compliance' not in result['violation_type']:
-                    compliance_report['violations'].append(result)
-                    compliance_report['is_compliant'] = False
-                elif 'compliance' in result['violation_type']:
-                    compliance_report['compliance_status'][result['violation_type']] = result
-                    # Extract remaining times
-                    if 'remaining_driving' in result:
-                        compliance_report['remaining_times']['driving'] = result['remaining_driving']
-                    if 'remaining_hours' in result:
-                        compliance_report['remaining_times']['cycle'] = result['remaining_hours']
-                    if 'remaining_time' in result:
-                        compliance_report['remaining_times']['14_hour_window'] = result['remaining_time']
-                else:
-                    compliance_report['warnings'].append(result)
+        for result in results:
+            if result['violation_type'].endswith('_compliance'):
+                compliance_report['compliance_status'][result['violation_type']] = result
+                # Extract remaining times
+                if 'remaining_driving' in result:
+                    compliance_report['remaining_times']['driving'] = result['remaining_driving']
+                if 'remaining_hours' in result:
+                    compliance_report['remaining_times']['cycle'] = result['remaining_hours']
+                if 'remaining_time' in result:
+                    compliance_report['remaining_times']['14_hour_window'] = result['remaining_time']
+            elif result['violation_type'] in dict(HOSViolation.VIOLATION_TYPES):
+                compliance_report['violations'].append(result)
+                compliance_report['is_compliant'] = False
+            else:
+                compliance_report['warnings'].append(result)
         
         return compliance_report
+    
+    @classmethod
+    def calculate_compliance(cls, driver, current_time=None, plan=None):
+        """
+        Main method to calculate complete HOS compliance
+        Returns all compliance statuses and violations
+        """
+        if not current_time:
+            current_time = driver_now(driver)
+        plan = plan or cls.plan_for_driver(driver)
+        
+        # One narrow query, already in sweep order
+        timeline = DutyTimeline.for_driver(driver, since=current_time - plan.history)
+        
+        totals = cls.sweep(timeline, current_time, plan)
+        results = cls.evaluate_rules(totals, current_time, plan)
+        return cls.build_report(driver.id, results, current_time, plan)
 
 class HOSViolation(models.Model):
     VIOLATION_TYPES = (
@@ -285,4 +377,302 @@ class HOSViolation(models.Model):
         return f"{self.driver.username} - {self.get_violation_type_display()} - {self.violation_time}"
     
     class Meta:
-        ordering = ['-violation_time']
\ No newline at end of file
+        ordering = ['-violation_time']
+        unique_together = ['driver', 'violation_type', 'violation_time']
+
+class OpenViolation(models.Model):
+    """Index of violations still in progress: at most one per driver and rule"""
+    driver = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='open_violations')
+    violation_type = models.CharField(max_length=20, choices=HOSViolation.VIOLATION_TYPES)
+    violation = models.OneToOneField(HOSViolation, on_delete=models.CASCADE, related_name='open_entry')
+    
+    def __str__(self):
+        return f"{self.driver_id} - {self.violation_type} open since {self.violation_id}"
+    
+    class Meta:
+        unique_together = ['driver', 'violation_type']
+
+class ViolationBackfillCheckpoint(models.Model):
+    """Progress of a violation backfill run; drivers are processed in id order"""
+    key = models.CharField(max_length=50, unique=True, default='default')
+    last_driver_id = models.IntegerField(default=0)  # every driver up to this id is done
+    periods_processed = models.BigIntegerField(default=0)
+    violations_created = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Violation backfill {self.key} - driver {self.last_driver_id}"
+
+# Sent by the DriverHOSState writers with entries=[(state, since)], since being
+# when the state was last written (None after a rebuild); violations are
+# recorded from it (hos.signals), so compliance reads never write them
+state_written = Signal()
+
+
+class DriverHOSState(models.Model):
+    """
+    Per-driver HOS counters, advanced on every duty status change so that
+    compliance reads are a single-row fetch plus a projection to "now".
+    Counters cover closed periods only; the open status is projected on read.
+    """
+    driver = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='hos_state')
+    
+    remaining_driving = models.FloatField(default=11)
+    window_ends_at = models.DateTimeField(null=True, blank=True)  # None until on duty after the last reset
+    window_overrun = models.FloatField(default=0)  # hours driven after the 14-hour window closed
+    break_clock = models.FloatField(default=0)  # driving hours counted towards the 8-hour break
+    break_taken = models.BooleanField(default=False)
+    cycle_hours = models.FloatField(default=0)
+    last_reset_at = models.DateTimeField(null=True, blank=True)
+    last_restart_at = models.DateTimeField(null=True, blank=True)
+    # Rest run and split sleeper bookkeeping carried between status changes
+    rest_tracking = models.JSONField(default=dict, blank=True)
+    
+    # Rule set resolved from the driver or company when the state was rebuilt
+    rule_set = models.CharField(max_length=20, choices=RULE_SET_CHOICES, default=DEFAULT_RULE_SET)
+    
+    open_status = models.CharField(max_length=20, choices=DailyLog.DUTY_STATUS, null=True, blank=True)
+    open_since = models.DateTimeField(null=True, blank=True)
+    
+    # Counters stay exact until a counted period ages out of a rule window
+    computed_at = models.DateTimeField()
+    valid_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Duty revision: bumped in the database on every change of the driver's
+    # history, so every process sees the same value (see hos.cache)
+    revision = models.PositiveBigIntegerField(default=0)
+    
+    # Everything advance writes
+    FOLDED_FIELDS = (
+        'remaining_driving', 'window_ends_at', 'window_overrun', 'break_clock', 'break_taken',
+        'cycle_hours', 'last_reset_at', 'last_restart_at', 'rest_tracking',
+        'open_status', 'open_since', 'computed_at', 'valid_until', 'updated_at',
+    )
+    TRACKED_KEYS = (
+        'rest_run_start', 'rest_run_end', 'sleeper_run_start', 'sleeper_run_end',
+        'rest_run_sleeper_seconds', 'split_candidate', 'split_pair',
+    )
+    
+    def __str__(self):
+        return f"HOS state - {self.driver.username} - {self.computed_at}"
+    
+    def save(self, *args, **kwargs):
+        # The revision only moves through bump_revision's F() update, never
+        # through a copy of the row loaded before a concurrent bump
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'revision'
+            ]
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def rebuild(cls, driver, current_time=None):
+        """Recompute the state from the driver's duty history"""
+        with transaction.atomic():
+            # Locked before the history is read, so concurrent writers rebuild in turn
+            state = cls.objects.select_for_update().filter(driver=driver).first()
+            if not current_time:
+                current_time = driver_now(driver)
+            state = cls._compute(driver, current_time, state)
+            state.save()
+            state.record_cycle_hours(current_time)
+            state_written.send(sender=cls, entries=[(state, None)])
+        return state
+    
+    @classmethod
+    def _compute(cls, driver, current_time, state=None):
+        """state, or a new unsaved one, recomputed in memory from the duty history"""
+        plan = HOSRuleEngine.plan_for_driver(driver)
+        
+        timeline = DutyTimeline.for_driver(driver, since=current_time - plan.history)
+        open_periods = timeline.select(timeline.open)
+        open_period = open_periods[len(open_periods) - 1] if len(open_periods) else None
+        
+        state = state or cls(driver=driver)
+        state.rule_set = plan.key
+        state._store_totals(HOSRuleEngine.sweep(timeline.closed, current_time, plan), open_period, current_time)
+        state.computed_at = current_time
+        return state
+    
+    @classmethod
+    def advance(cls, driver, closed_periods, open_period, current_time=None):
+        """
+        Fold periods closed by a status change into the stored counters and
+        record the newly opened status. Falls back to a rebuild when the
+        stored state is missing, expired or does not match the closed periods.
+        The row is locked for the fold, so concurrent changes fold in turn
+        instead of overwriting each other.
+        """
+        if not current_time:
+            current_time = driver_now(driver)
+        
+        with transaction.atomic():
+            try:
+                state = cls.objects.select_for_update().get(driver=driver)
+            except cls.DoesNotExist:
+                return cls.rebuild(driver, current_time)
+            
+            since = state.computed_at
+            if not state._fold(closed_periods, open_period, current_time):
+                return cls.rebuild(driver, current_time)
+            state.save()
+            state.record_cycle_hours(current_time)
+            transaction.on_commit(cycle_hours_writer.flush)
+            state_written.send(sender=cls, entries=[(state, since)])
+        return state
+    
+    @classmethod
+    def advance_many(cls, entries):
+        """
+        advance for many drivers: entries are (driver, closed_periods,
+        open_period, current_time). Folded states are written with one
+        bulk_update; missing or mismatched ones are rebuilt one by one.
+        """
+        entries = list(entries)
+        with transaction.atomic():
+            # Locked in driver order, so overlapping batches cannot deadlock
+            states = {state.driver_id: state for state in cls.objects.select_for_update().filter(
+                driver__in=[driver for driver, _, _, _ in entries]
+            ).order_by('driver_id')}
+            folded, written = [], []
+            for driver, closed_periods, open_period, current_time in entries:
+                state = states.get(driver.pk)
+                since = state.computed_at if state is not None else None
+                if state is None or not state._fold(closed_periods, open_period, current_time):
+                    cls.rebuild(driver, current_time)
+                    continue
+                # bulk_update skips auto_now
+                state.updated_at = timezone.now()
+                state.record_cycle_hours(current_time)
+                folded.append(state)
+                written.append((state, since))
+            if folded:
+                cls.objects.bulk_update(folded, cls.FOLDED_FIELDS)
+                transaction.on_commit(cycle_hours_writer.flush)
+                state_written.send(sender=cls, entries=written)
+        return folded
+    
+    @classmethod
+    def for_driver(cls, driver, current_time=None):
+        """
+        Stored state for the driver, recomputed in memory if missing or
+        expired. A read: nothing is saved or queued, so readers never race
+        the writers (advance, advance_many, rebuild), which persist states.
+        """
+        if not current_time:
+            current_time = driver_now(driver)
+        
+        state = cls.objects.filter(driver=driver).first()
+        if state is None or state.is_stale(current_time):
+            return cls._compute(driver, current_time, state)
+        return state
+    
+    @property
+    def plan(self):
+        return get_plan(self.rule_set)
+    
+    def _fold(self, closed_periods, open_period, current_time):
+        """Fold closed periods into the counters in memory; False when a rebuild is needed"""
+        closed_periods = list(closed_periods)
+        if self.is_stale(current_time):
+            return False
+        if self.open_status and (
+            not closed_periods
+            or closed_periods[0][0] != self.open_status
+            or closed_periods[0][1] != self.open_since
+        ):
+            return False
+        
+        totals = self._load_totals()
+        for status, start_time, end_time in closed_periods:
+            HOSRuleEngine.accumulate(totals, status, start_time, end_time, current_time, self.plan)
+        
+        self._store_totals(totals, open_period, current_time)
+        self.computed_at = current_time
+        return True
+    
+    def is_stale(self, current_time):
+        return current_time < self.computed_at or (
+            self.valid_until is not None and current_time > self.valid_until
+        )
+    
+    def project(self, current_time):
+        """Totals as the sweep would produce them at current_time"""
+        totals = self._load_totals()
+        if self.open_status:
+            HOSRuleEngine.accumulate(totals, self.open_status, self.open_since, None, current_time, self.plan)
+        return totals
+    
+    def record_cycle_hours(self, current_time):
+        """Queue the profile's cycle figure; written behind by cycle_hours_writer"""
+        cycle_hours = self.project(current_time)['cycle_seconds'] / 3600
+        cycle_hours_writer.record(self.driver_id, cycle_hours)
+    
+    def compliance_report(self, current_time=None):
+        if not current_time:
+            current_time = driver_now(self.driver)
+        
+        results = HOSRuleEngine.evaluate_rules(self.project(current_time), current_time, self.plan)
+        return HOSRuleEngine.build_report(self.driver_id, results, current_time, self.plan)
+    
+    def _load_totals(self):
+        totals = HOSRuleEngine.empty_totals()
+        totals.update({
+            'window_start': self.window_ends_at - self.plan.duty_window if self.window_ends_at else None,
+            'window_overrun_seconds': self.window_overrun * 3600,
+            'driving_seconds': (self.plan.driving_limit - self.remaining_driving) * 3600,
+            'break_driving_seconds': self.break_clock * 3600,
+            'break_taken': self.break_taken,
+            'cycle_seconds': self.cycle_hours * 3600,
+            'expires_at': self.valid_until,
+            'last_reset_at': self.last_reset_at,
+            'last_restart_at': self.last_restart_at,
+        })
+        for key, value in self.rest_tracking.items():
+            totals[key] = self._load_tracked(value)
+        return totals
+    
+    @classmethod
+    def _load_tracked(cls, value):
+        if isinstance(value, dict):
+            return {key: cls._load_tracked(item) for key, item in value.items()}
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value
+    
+    @classmethod
+    def _dump_tracked(cls, value):
+        if isinstance(value, dict):
+            return {key: cls._dump_tracked(item) for key, item in value.items()}
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+    
+    def _store_totals(self, totals, open_period, current_time):
+        self.window_ends_at = totals['window_start'] + self.plan.duty_window if totals['window_start'] else None
+        self.window_overrun = totals['window_overrun_seconds'] / 3600
+        self.remaining_driving = self.plan.driving_limit - totals['driving_seconds'] / 3600
+        self.break_clock = totals['break_driving_seconds'] / 3600
+        self.break_taken = totals['break_taken']
+        self.cycle_hours = totals['cycle_seconds'] / 3600
+        self.valid_until = totals['expires_at']
+        self.last_reset_at = totals['last_reset_at']
+        self.last_restart_at = totals['last_restart_at']
+        # Stored as is: the open status continues the rest run on projection
+        # when it starts where the run ended
+        self.rest_tracking = {key: self._dump_tracked(totals[key]) for key in self.TRACKED_KEYS}
+        
+        if open_period is None:
+            self.open_status = self.open_since = None
+            return
+        
+        self.open_status, self.open_since = open_period[0], open_period[1]
+        expires_at = HOSRuleEngine.accumulate(
+            HOSRuleEngine.empty_totals(), self.open_status, self.open_since, None, current_time, self.plan
+        )['expires_at']
+        if expires_at and (self.valid_until is None or expires_at < self.valid_until):
+            self.valid_until = expires_at
@@ -0,0 +1,156 @@
+# backend/hos/projection.py
+import copy
+from bisect import bisect_right
+from datetime import timedelta
+from itertools import accumulate
+
+from eld.models import DutyStatusChange
+from eld.timezones import driver_now
+from .models import HOSRuleEngine
+from .rules import get_plan
+
+BREAK_DURATION = timedelta(minutes=30)
+
+
+def advance_break_clock(clock, status, start_time, end_time):
+    """
+    clock: (driving seconds since the last 30-minute interruption, start and
+    end of the current non-driving run). Returns the clock after the period.
+    """
+    seconds, pause_start, pause_end = clock
+    if status == 'driving':
+        return seconds + (end_time - start_time).total_seconds(), None, None
+    if pause_end != start_time:
+        pause_start = start_time
+    if end_time - pause_start >= BREAK_DURATION:
+        seconds = 0.0
+    return seconds, pause_start, end_time
+
+
+class ViolationProjector:
+    """
+    When each HOS rule would first be violated under hypothetical future
+    status sequences. The driver's history is swept once up to current_time;
+    every scenario then only folds its own periods on a copy of those totals.
+    Running maxima of the counters after each period never decrease, so the
+    period in which a limit is crossed is found by binary search, and the
+    exact instant follows from the counter's value when that period started.
+    The cycle is taken as of current_time: hours ageing out of the look-back
+    during a scenario are not given back, so its instant is never late.
+    """
+
+    RULES = ('14_hour', '11_hour', 'break', '70_hour')
+
+    def __init__(self, periods, current_time, plan=None):
+        self.current_time = current_time
+        self.plan = plan or get_plan()
+        self.totals = HOSRuleEngine.empty_totals()
+        self.break_clock = (0.0, None, None)
+        for status, start_time, end_time in periods:
+            end = min(end_time or current_time, current_time)
+            HOSRuleEngine.accumulate(self.totals, status, start_time, end, current_time, self.plan)
+            self.break_clock = advance_break_clock(self.break_clock, status, start_time, end)
+
+    @classmethod
+    def for_driver(cls, driver, current_time=None):
+        if not current_time:
+            current_time = driver_now(driver)
+        plan = HOSRuleEngine.plan_for_driver(driver)
+        periods = DutyStatusChange.objects.filter(
+            daily_log__driver=driver,
+            start_time__gte=current_time - plan.history,
+            start_time__lte=current_time
+        ).order_by('start_time').values_list('status', 'start_time', 'end_time')
+        return cls(periods, current_time, plan)
+
+    @classmethod
+    def first_violations(cls, driver_id, since, current_time, plan):
+        """
+        First violation instant of each rule between since and current_time:
+        each contiguous run of recorded periods after since is replayed as a
+        scenario on the totals as of its start, so an instant is when the
+        limit was crossed, not when the crossing was noticed.
+        """
+        periods = [
+            (status, start_time, min(end_time or current_time, current_time))
+            for status, start_time, end_time in DutyStatusChange.objects.filter(
+                daily_log__driver_id=driver_id,
+                start_time__gte=current_time - plan.history,
+                start_time__lte=current_time
+            ).order_by('start_time').values_list('status', 'start_time', 'end_time')
+        ]
+        # Runs of back-to-back periods ending after since: [(first index, run start)]
+        runs = []
+        for index, (_, start_time, end_time) in enumerate(periods):
+            if end_time <= since:
+                continue
+            if not runs or periods[index - 1][2] != start_time:
+                runs.append((index, max(start_time, since)))
+
+        instants = {}
+        for position, (first, run_start) in enumerate(runs):
+            last = runs[position + 1][0] if position + 1 < len(runs) else len(periods)
+            scenario = [
+                (status, (end_time - max(start_time, run_start)).total_seconds() / 60)
+                for status, start_time, end_time in periods[first:last]
+            ]
+            found = cls(periods[:first + 1], run_start, plan).project(scenario)
+            for rule in cls.RULES:
+                if instants.get(rule) is None:
+                    instants[rule] = found[rule]
+        return instants
+
+    def project(self, statuses):
+        """
+        statuses: [(status, minutes), ...] starting at current_time.
+        Returns the first violation instant of each rule: current_time if it
+        is already violated, None if the sequence ends before the limit.
+        """
+        plan = self.plan
+        totals = copy.deepcopy(self.totals)
+        clock = self.break_clock
+
+        # Counter values before the first period and after each one
+        starts = [self.current_time]
+        windows = [totals['window_start']]
+        counters = {
+            '14_hour': [totals['window_overrun_seconds']],
+            '11_hour': [totals['driving_seconds']],
+            'break': [clock[0]],
+            '70_hour': [totals['cycle_seconds']],
+        }
+        for status, minutes in statuses:
+            start_time = starts[-1]
+            end_time = start_time + timedelta(minutes=minutes)
+            HOSRuleEngine.accumulate(totals, status, start_time, end_time, self.current_time, plan)
+            clock = advance_break_clock(clock, status, start_time, end_time)
+            starts.append(end_time)
+            windows.append(totals['window_start'])
+            counters['14_hour'].append(totals['window_overrun_seconds'])
+            counters['11_hour'].append(totals['driving_seconds'])
+            counters['break'].append(clock[0])
+            counters['70_hour'].append(totals['cycle_seconds'])
+
+        limits = {
+            '14_hour': 0,
+            '11_hour': plan.driving_limit * 3600,
+            'break': plan.break_after * 3600 if plan.break_required else None,
+            '70_hour': plan.cycle_limit * 3600,
+        }
+
+        instants = {'ends_at': starts[-1]}
+        for rule in self.RULES:
+            values, limit = counters[rule], limits[rule]
+            index = None if limit is None else bisect_right(list(accumulate(values, max)), limit)
+            if index is None or index == len(values):
+                instants[rule] = None
+            elif index == 0:
+                instants[rule] = self.current_time
+            elif rule == '14_hour':
+                # Overrun starts with the first driving after the window closes
+                instants[rule] = max(starts[index - 1], windows[index] + plan.duty_window)
+            else:
+                # Counters only grow during a period, one second per second,
+                # from their value when it started
+                instants[rule] = starts[index - 1] + timedelta(seconds=limit - values[index - 1])
+        return instants
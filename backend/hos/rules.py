@@ -0,0 +1,92 @@
+# backend/hos/rules.py
+from datetime import timedelta
+
+
+class HOSRuleSet:
+    """
+    Limits of one HOS rule set, kept as plain data.
+    The engine never reads these directly: they are compiled once into an
+    EvaluationPlan holding the timedeltas and look-backs it runs on.
+    """
+
+    def __init__(self, key, label, cycle_hours, cycle_days, driving_hours=11,
+                 window_hours=14, break_after_hours=8, break_required=True,
+                 reset_hours=10, restart_hours=34, split_sleeper_hours=7,
+                 split_other_hours=2):
+        self.key = key
+        self.label = label
+        self.cycle_hours = cycle_hours
+        self.cycle_days = cycle_days
+        self.driving_hours = driving_hours
+        self.window_hours = window_hours
+        self.break_after_hours = break_after_hours
+        self.break_required = break_required
+        self.reset_hours = reset_hours
+        self.restart_hours = restart_hours
+        # Split sleeper berth: one sleeper period of at least split_sleeper_hours
+        # paired with another rest period of at least split_other_hours,
+        # together making up the reset (7/3, 8/2 and everything between)
+        self.split_sleeper_hours = split_sleeper_hours
+        self.split_other_hours = split_other_hours
+
+    def compile(self):
+        return EvaluationPlan(self)
+
+    def __str__(self):
+        return self.label
+
+
+class EvaluationPlan:
+    """A rule set compiled into the values HOSRuleEngine evaluates against"""
+
+    def __init__(self, rule_set):
+        self.key = rule_set.key
+        self.label = rule_set.label
+
+        self.driving_limit = rule_set.driving_hours
+        self.window_limit = rule_set.window_hours
+        self.cycle_limit = rule_set.cycle_hours
+        self.cycle_days = rule_set.cycle_days
+        self.break_after = rule_set.break_after_hours
+        self.break_required = rule_set.break_required
+
+        self.duty_window = timedelta(hours=rule_set.window_hours)
+        self.reset_duration = timedelta(hours=rule_set.reset_hours)
+        self.restart_duration = timedelta(hours=rule_set.restart_hours)
+        self.split_sleeper = timedelta(hours=rule_set.split_sleeper_hours)
+        self.split_other = timedelta(hours=rule_set.split_other_hours)
+
+        # Look-back of each rule, smallest first. A period counts towards a
+        # rule while it started no earlier than current_time minus the look-back.
+        self.rule_windows = tuple(sorted((
+            ('break', timedelta(hours=rule_set.break_after_hours)),
+            ('cycle', timedelta(days=rule_set.cycle_days)),
+        ), key=lambda window: window[1]))
+        self.window_lengths = dict(self.rule_windows)
+
+        # How much duty history the engine needs to load
+        self.history = timedelta(days=rule_set.cycle_days)
+
+
+RULE_SETS = {
+    rule_set.key: rule_set for rule_set in (
+        HOSRuleSet('property_70_8', 'Property-carrying 70 hours / 8 days', cycle_hours=70, cycle_days=8),
+        HOSRuleSet('property_60_7', 'Property-carrying 60 hours / 7 days', cycle_hours=60, cycle_days=7),
+        HOSRuleSet(
+            'short_haul', 'Short-haul 150 air-mile (70 hours / 8 days, no 30-minute break)',
+            cycle_hours=70, cycle_days=8, break_required=False
+        ),
+    )
+}
+DEFAULT_RULE_SET = 'property_70_8'
+RULE_SET_CHOICES = tuple((key, rule_set.label) for key, rule_set in RULE_SETS.items())
+
+_plans = {}
+
+
+def get_plan(key=None):
+    """Compiled plan for a rule set key, compiled at most once per process"""
+    key = key if key in RULE_SETS else DEFAULT_RULE_SET
+    if key not in _plans:
+        _plans[key] = RULE_SETS[key].compile()
+    return _plans[key]
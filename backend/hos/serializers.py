@@ -1,8 +1,31 @@
 from rest_framework import serializers
+from eld.models import DailyLog
 from .models import HOSViolation
 
 class HOSViolationSerializer(serializers.ModelSerializer):
     class Meta:
         model = HOSViolation
         fields = '__all__'
-        read_only_fields = ('driver', 'created_at')
\ No newline at end of file
+        read_only_fields = ('driver', 'created_at')
+
+class ScenarioStatusSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=DailyLog.DUTY_STATUS)
+    minutes = serializers.IntegerField(min_value=1, max_value=8 * 24 * 60)
+
+class ScenarioSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    statuses = ScenarioStatusSerializer(many=True, allow_empty=False)
+    
+    def validate_statuses(self, value):
+        if len(value) > 200:
+            raise serializers.ValidationError('At most 200 statuses per scenario')
+        return value
+
+class ProjectionSerializer(serializers.Serializer):
+    """What-if status sequences, each starting now"""
+    scenarios = ScenarioSerializer(many=True, required=False)
+    
+    def validate_scenarios(self, value):
+        if len(value) > 100:
+            raise serializers.ValidationError('At most 100 scenarios per request')
+        return value
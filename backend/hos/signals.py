@@ -0,0 +1,37 @@
+# backend/hos/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from eld.models import DailyLog, DutyStatusChange
+from .cache import bump_revision, invalidate_reports
+from .models import DriverHOSState, state_written
+from .violations import violation_tracker
+
+
+# Revisions are bumped in the writer's transaction: readers see the new revision with the new rows
+
+@receiver(post_save, sender=DutyStatusChange)
+@receiver(post_delete, sender=DutyStatusChange)
+def duty_status_changed(sender, instance, **kwargs):
+    try:
+        driver_id = instance.daily_log.driver_id
+    except DailyLog.DoesNotExist:
+        # Deleted along with its log; the log's own signal covers it
+        return
+    bump_revision(driver_id)
+
+
+@receiver(post_delete, sender=DailyLog)
+def daily_log_deleted(sender, instance, **kwargs):
+    bump_revision(instance.driver_id)
+
+
+@receiver(state_written, sender=DriverHOSState)
+def record_violations(sender, entries, **kwargs):
+    violation_tracker.detect(entries)
+
+
+@receiver(state_written, sender=DriverHOSState)
+def state_changed(sender, entries, **kwargs):
+    # Cached reports of this process hold the state as it was before
+    invalidate_reports([state.driver_id for state, _ in entries])
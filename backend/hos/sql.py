@@ -0,0 +1,260 @@
+# backend/hos/sql.py
+from datetime import timedelta
+
+from django.db import NotSupportedError, connection
+
+from eld.timeline import EPOCH, to_epoch
+from eld.timezones import driver_timezone, local_nows
+from users.models import CustomUser
+from .models import HOSRuleEngine
+
+DAY_SECONDS = 86400
+
+# The few expressions that differ between backends; everything else is
+# standard SQL with window functions
+DIALECTS = {
+    'postgresql': {
+        'epoch': 'CAST(FLOOR(EXTRACT(EPOCH FROM {})) AS BIGINT)',
+        'greatest': 'GREATEST',
+        'least': 'LEAST',
+    },
+    'sqlite': {
+        'epoch': "CAST(strftime('%%s', {}) AS INTEGER)",
+        'greatest': 'MAX',
+        'least': 'MIN',
+    },
+}
+
+DAILY_HOURS_SQL = """
+WITH RECURSIVE
+drivers (driver_id, now_epoch, reset_seconds, restart_seconds, cycle_days) AS (
+    VALUES {drivers}
+),
+days (day) AS (
+    SELECT CAST(%s AS BIGINT)
+    UNION ALL
+    SELECT day + 1 FROM days WHERE day < %s
+),
+periods AS (
+    SELECT
+        log.driver_id,
+        change.id AS period_id,
+        change.status,
+        CASE WHEN change.status IN ('off_duty', 'sleeper_berth') THEN 1 ELSE 0 END AS is_rest,
+        {start_epoch} AS start_epoch,
+        COALESCE({end_epoch}, drivers.now_epoch) AS end_epoch
+    FROM eld_dutystatuschange change
+    JOIN eld_dailylog log ON log.id = change.daily_log_id
+    JOIN drivers ON drivers.driver_id = log.driver_id
+    WHERE change.start_time < %s AND (change.end_time IS NULL OR change.end_time > %s)
+),
+runs AS (
+    -- A rest period continues the rest run when it starts exactly where
+    -- the previous rest period of the driver ended
+    SELECT
+        driver_id, is_rest, start_epoch, end_epoch,
+        SUM(CASE
+            WHEN is_rest = 1 AND previous_rest = 1 AND previous_end = start_epoch THEN 0 ELSE 1
+        END) OVER (PARTITION BY driver_id ORDER BY start_epoch, period_id ROWS UNBOUNDED PRECEDING) AS run_id
+    FROM (
+        SELECT
+            periods.*,
+            LAG(is_rest) OVER (PARTITION BY driver_id ORDER BY start_epoch, period_id) AS previous_rest,
+            LAG(end_epoch) OVER (PARTITION BY driver_id ORDER BY start_epoch, period_id) AS previous_end
+        FROM periods
+    ) ordered
+),
+rests AS (
+    SELECT
+        runs.driver_id,
+        (MAX(end_epoch) - 1) / {day} AS day,
+        MAX(end_epoch) AS rest_end,
+        MAX(end_epoch) - MIN(start_epoch) AS rest_seconds
+    FROM runs
+    WHERE is_rest = 1
+    GROUP BY runs.driver_id, run_id
+),
+pieces AS (
+    SELECT
+        periods.driver_id,
+        days.day,
+        periods.status,
+        {greatest}(periods.start_epoch, days.day * {day}) AS start_epoch,
+        {least}(periods.end_epoch, (days.day + 1) * {day})
+            - {greatest}(periods.start_epoch, days.day * {day}) AS seconds
+    FROM periods
+    JOIN days ON periods.start_epoch < (days.day + 1) * {day} AND periods.end_epoch > days.day * {day}
+),
+piece_totals AS (
+    SELECT
+        driver_id,
+        day,
+        SUM(CASE WHEN status = 'driving' THEN seconds ELSE 0 END) AS driving_seconds,
+        SUM(CASE WHEN status IN ('driving', 'on_duty') THEN seconds ELSE 0 END) AS on_duty_seconds
+    FROM pieces
+    GROUP BY driver_id, day
+),
+rest_totals AS (
+    SELECT
+        rests.driver_id,
+        rests.day,
+        SUM(CASE WHEN rest_seconds >= reset_seconds THEN 1 ELSE 0 END) AS resets,
+        MAX(CASE WHEN rest_seconds >= reset_seconds THEN rest_end END) AS reset_end,
+        MAX(CASE WHEN rest_seconds >= restart_seconds THEN rest_end END) AS restart_end
+    FROM rests
+    JOIN drivers ON drivers.driver_id = rests.driver_id
+    GROUP BY rests.driver_id, rests.day
+),
+restart_totals AS (
+    -- On-duty seconds of the day after its last restart; a restart is a
+    -- rest run, so no on-duty piece straddles its end
+    SELECT
+        rest_totals.driver_id,
+        rest_totals.day,
+        SUM(CASE
+            WHEN pieces.status IN ('driving', 'on_duty') AND pieces.start_epoch >= rest_totals.restart_end
+            THEN pieces.seconds ELSE 0
+        END) AS on_duty_after_restart
+    FROM rest_totals
+    JOIN pieces ON pieces.driver_id = rest_totals.driver_id AND pieces.day = rest_totals.day
+    WHERE rest_totals.restart_end IS NOT NULL
+    GROUP BY rest_totals.driver_id, rest_totals.day
+),
+daily AS (
+    SELECT
+        drivers.driver_id,
+        drivers.cycle_days,
+        days.day,
+        COALESCE(piece_totals.driving_seconds, 0) AS driving_seconds,
+        COALESCE(piece_totals.on_duty_seconds, 0) AS on_duty_seconds,
+        COALESCE(rest_totals.resets, 0) AS resets,
+        rest_totals.reset_end,
+        rest_totals.restart_end,
+        restart_totals.on_duty_after_restart
+    FROM drivers
+    CROSS JOIN days
+    LEFT JOIN piece_totals ON piece_totals.driver_id = drivers.driver_id AND piece_totals.day = days.day
+    LEFT JOIN rest_totals ON rest_totals.driver_id = drivers.driver_id AND rest_totals.day = days.day
+    LEFT JOIN restart_totals ON restart_totals.driver_id = drivers.driver_id AND restart_totals.day = days.day
+),
+rolling AS (
+    SELECT
+        daily.*,
+        SUM(on_duty_seconds) OVER (PARTITION BY driver_id ORDER BY day ROWS UNBOUNDED PRECEDING) AS on_duty_to_date,
+        MAX(reset_end) OVER (PARTITION BY driver_id ORDER BY day ROWS UNBOUNDED PRECEDING) AS last_reset_end,
+        MAX(restart_end) OVER (PARTITION BY driver_id ORDER BY day ROWS UNBOUNDED PRECEDING) AS last_restart_end
+    FROM daily
+),
+restarts AS (
+    SELECT
+        rolling.*,
+        -- On-duty seconds to date at the last restart; running totals only
+        -- grow, so the latest one is the largest
+        MAX(CASE WHEN restart_end IS NOT NULL THEN on_duty_to_date - on_duty_after_restart END)
+            OVER (PARTITION BY driver_id ORDER BY day ROWS UNBOUNDED PRECEDING) AS on_duty_at_restart
+    FROM rolling
+)
+SELECT
+    driver_id, day, driving_seconds, on_duty_seconds,
+    -- Every day of every driver is present, so the cycle is cycle_days rows
+    -- back; like HOSRuleEngine.sweep it starts over at the last restart
+    on_duty_to_date - {greatest}(
+        COALESCE(LAG(on_duty_to_date, cycle_days) OVER (PARTITION BY driver_id ORDER BY day), 0),
+        COALESCE(on_duty_at_restart, 0)
+    ) AS cycle_on_duty_seconds,
+    resets, last_reset_end, last_restart_end
+FROM restarts
+ORDER BY driver_id, day
+"""
+
+
+class DailyDutyHours:
+    """
+    Per-driver daily duty hours evaluated inside the database.
+    One query with window functions over eld_dutystatuschange joined to
+    eld_dailylog returns, for every driver and day, driving and on-duty
+    seconds, on-duty seconds over the driver's cycle days (8 for 70/8,
+    7 for 60/7) since the last 34-hour restart, and the 10-hour resets and
+    34-hour restarts completed so far.
+    Rest runs and resets follow HOSRuleEngine.sweep: consecutive rest
+    periods form one run, which counts on the day it ends. Times are the
+    naive wall-clock times of the logs, so day boundaries are local.
+    History is read from cycle_days before start_date; rest runs that began
+    earlier are only counted from there.
+    """
+
+    def __init__(self, drivers, start_date, end_date, current_time=None):
+        self.drivers = list(drivers.select_related('company', 'driverprofile'))
+        self.plans = [HOSRuleEngine.plan_for_driver(driver) for driver in self.drivers]
+        if current_time:
+            self.current_times = [current_time] * len(self.drivers)
+        else:
+            self.current_times = local_nows([driver_timezone(driver) for driver in self.drivers])
+        self.start_date = start_date
+        self.end_date = end_date
+
+    @classmethod
+    def for_company(cls, company, start_date, end_date, current_time=None):
+        drivers = CustomUser.objects.filter(user_type='driver', company=company).order_by('id')
+        return cls(drivers, start_date, end_date, current_time)
+
+    def sql(self):
+        """The query and its parameters for the current connection"""
+        dialect = DIALECTS.get(connection.vendor)
+        if dialect is None:
+            raise NotSupportedError(f'Daily duty hours are not available on {connection.vendor}')
+
+        history = max((plan.cycle_days for plan in self.plans), default=8)
+        first_day = (self.start_date - EPOCH.date()).days - history
+        last_day = (self.end_date - EPOCH.date()).days
+        params = []
+        for driver, plan, current_time in zip(self.drivers, self.plans, self.current_times):
+            params += [
+                driver.id, to_epoch(current_time),
+                int(plan.reset_duration.total_seconds()), int(plan.restart_duration.total_seconds()),
+                plan.cycle_days,
+            ]
+        params += [
+            first_day, last_day,
+            EPOCH + timedelta(days=last_day + 1), EPOCH + timedelta(days=first_day),
+        ]
+        sql = DAILY_HOURS_SQL.format(
+            drivers=', '.join(['(%s, %s, %s, %s, %s)'] * len(self.drivers)),
+            start_epoch=dialect['epoch'].format('change.start_time'),
+            end_epoch=dialect['epoch'].format('change.end_time'),
+            greatest=dialect['greatest'],
+            least=dialect['least'],
+            day=DAY_SECONDS,
+        )
+        return sql, params
+
+    def rows(self):
+        """One dict per driver and day from start_date to end_date, by driver then date"""
+        if not self.drivers:
+            return []
+        sql, params = self.sql()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            records = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        rows = []
+        for record in records:
+            date = EPOCH.date() + timedelta(days=record['day'])
+            if date < self.start_date:
+                continue
+            rows.append({
+                'driver': record['driver_id'],
+                'date': date,
+                'driving_seconds': int(record['driving_seconds']),
+                'on_duty_seconds': int(record['on_duty_seconds']),
+                'cycle_on_duty_seconds': int(record['cycle_on_duty_seconds']),
+                'resets': int(record['resets']),
+                'last_reset_at': self._time(record['last_reset_end']),
+                'last_restart_at': self._time(record['last_restart_end']),
+            })
+        return rows
+
+    @staticmethod
+    def _time(epoch_seconds):
+        return EPOCH + timedelta(seconds=int(epoch_seconds)) if epoch_seconds is not None else None
@@ -0,0 +1,145 @@
+# backend/hos/synthetic.py
+import random
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+
+from eld.grid import store_grids
+from eld.models import DailyLog, DriverOpenStatus, DutyStatusChange
+from eld.totals import store_totals
+from users.models import Company, CustomUser, DriverProfile
+
+# Duty patterns as repeating (status, hours) cycles. Durations get a seeded
+# jitter in 15-minute steps so drivers of one pattern do not line up.
+PATTERNS = {
+    # 10-hour reset every day, 30-minute break inside the driving
+    'long_haul': (
+        ('on_duty', 0.5), ('driving', 5), ('off_duty', 0.5), ('driving', 5),
+        ('on_duty', 1), ('off_duty', 12),
+    ),
+    # 8/2 and 7/3 sleeper berth splits instead of a full reset
+    'split_sleeper': (
+        ('on_duty', 0.5), ('driving', 5), ('sleeper_berth', 8), ('driving', 5),
+        ('off_duty', 2), ('driving', 4), ('sleeper_berth', 7), ('driving', 3), ('off_duty', 3),
+    ),
+    # Two drivers swapping the wheel: short driving stints between sleeper periods
+    'team': (
+        ('driving', 5), ('sleeper_berth', 5), ('on_duty', 0.5), ('driving', 5),
+        ('sleeper_berth', 4.5),
+    ),
+    # Local routes: lots of on-duty time, back home every night
+    'short_haul': (
+        ('on_duty', 1), ('driving', 2), ('on_duty', 1.5), ('driving', 2.5),
+        ('on_duty', 1), ('driving', 2), ('on_duty', 0.5), ('off_duty', 13.5),
+    ),
+}
+PATTERN_RULE_SETS = {'short_haul': 'short_haul'}
+
+
+def generate_periods(pattern, start, end, rng):
+    """Contiguous (status, start_time, end_time) periods covering start..end, split at midnight"""
+    periods = []
+    current = start
+    steps = PATTERNS[pattern]
+    index = rng.randrange(len(steps))
+    while current < end:
+        status, hours = steps[index % len(steps)]
+        index += 1
+        minutes = max(15, int(hours * 60) + 15 * rng.randint(-2, 2))
+        period_end = min(current + timedelta(minutes=minutes), end)
+        while current < period_end:
+            midnight = datetime.combine(current.date() + timedelta(days=1), datetime.min.time())
+            piece_end = min(period_end, midnight)
+            periods.append((status, current, piece_end))
+            current = piece_end
+    return periods
+
+
+class SyntheticFleet:
+    """
+    Reproducible fleet of drivers with duty history, for benchmarks and
+    property tests. Drivers are spread over the patterns round-robin; the
+    same seed always produces the same rows. Every driver's last period is
+    left open at end_time, like a driver currently on the road.
+    """
+
+    def __init__(self, drivers=10, days=8, seed=0, patterns=None, end_time=None):
+        self.drivers = drivers
+        self.days = days
+        self.seed = seed
+        self.patterns = list(patterns or PATTERNS)
+        self.end_time = (end_time or datetime.now()).replace(second=0, microsecond=0)
+        self.start_time = self.end_time - timedelta(days=days)
+
+    def driver_periods(self, index):
+        rng = random.Random(f'{self.seed}-{index}')
+        pattern = self.patterns[index % len(self.patterns)]
+        return pattern, generate_periods(pattern, self.start_time, self.end_time, rng)
+
+    def create(self, prefix='synthetic'):
+        """Write the fleet in bulk; returns (company, manager, drivers)"""
+        company = Company.objects.create(
+            name=f'{prefix} carrier',
+            dot_number=f'{prefix[:10]}-{self.seed}',
+            main_office_address='1 Synthetic Way'
+        )
+        password = make_password(None)
+        manager = CustomUser.objects.create(
+            username=f'{prefix}-manager', email=f'{prefix}-manager@example.com',
+            password=password, user_type='manager', company=company, is_approved=True
+        )
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{prefix}-driver-{index}', email=f'{prefix}-driver-{index}@example.com',
+                password=password, user_type='driver', company=company, is_approved=True
+            )
+            for index in range(self.drivers)
+        ], batch_size=1000)
+        drivers = list(CustomUser.objects.filter(company=company, user_type='driver').order_by('id'))
+
+        profiles, histories = [], []
+        for index, driver in enumerate(drivers):
+            pattern, periods = self.driver_periods(index)
+            profiles.append(DriverProfile(
+                user=driver, home_terminal_address='1 Synthetic Way',
+                hos_rule_set=PATTERN_RULE_SETS.get(pattern, '')
+            ))
+            histories.append((driver, periods))
+        DriverProfile.objects.bulk_create(profiles, batch_size=1000)
+
+        DailyLog.objects.bulk_create([
+            DailyLog(
+                driver=driver, date=date, carrier=company, main_office_address='1 Synthetic Way',
+                home_terminal_address='1 Synthetic Way', vehicle_number=f'T-{driver.id}'
+            )
+            for driver, periods in histories
+            for date in sorted({start_time.date() for _, start_time, _ in periods})
+        ], batch_size=1000)
+        log_ids = {
+            (driver_id, date): log_id
+            for log_id, driver_id, date in DailyLog.objects.filter(
+                driver__in=drivers
+            ).values_list('id', 'driver_id', 'date')
+        }
+
+        changes = []
+        for driver, periods in histories:
+            for position, (status, start_time, end_time) in enumerate(periods):
+                changes.append(DutyStatusChange(
+                    daily_log_id=log_ids[(driver.id, start_time.date())],
+                    status=status,
+                    start_time=start_time,
+                    end_time=None if position == len(periods) - 1 else end_time,
+                    location='Synthetic'
+                ))
+        DutyStatusChange.objects.bulk_create(changes, batch_size=1000)
+        # bulk_create skips the save hooks that maintain the day totals, grids and open-status pointers
+        store_totals(DailyLog.objects.filter(driver__in=drivers))
+        store_grids(DailyLog.objects.filter(driver__in=drivers))
+        DriverOpenStatus.objects.bulk_create([
+            DriverOpenStatus(driver_id=driver_id, status_change_id=change_id)
+            for change_id, driver_id in DutyStatusChange.objects.filter(
+                daily_log__driver__in=drivers, end_time__isnull=True
+            ).values_list('id', 'daily_log__driver_id')
+        ], batch_size=1000)
+        return company, manager, drivers
@@ -0,0 +1,14 @@
+# backend/hos/tasks.py
+from celery import shared_task
+
+from .backfill import ViolationBackfill
+
+
+@shared_task
+def backfill_hos_violations(key='default', restart=False):
+    """Run the violation backfill in a worker; resumes from its checkpoint"""
+    checkpoint = ViolationBackfill(key=key).run(restart=restart)
+    return {
+        'periods_processed': checkpoint.periods_processed,
+        'violations_created': checkpoint.violations_created,
+    }
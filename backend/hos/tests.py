@@ -1,3 +1,698 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import datetime, timedelta
+from time import monotonic
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from eld.models import DailyLog, DutyStatusChange
+from eld.timeline import DutyTimeline
+from eld.timezones import driver_now
+from users.models import Company, CustomUser, DriverProfile
+from .backfill import ViolationBackfill
+from .benchmark import BenchmarkSuite, compare, over_budget
+from .cache import ComplianceCache, get_revision
+from .equivalence import CASE_CLASSES, ENGINES, EquivalenceHarness, reference_engine
+from .fleet import FleetComplianceCalculator
+from .models import DriverHOSState, HOSRuleEngine, HOSViolation, OpenViolation
+from .projection import ViolationProjector
+from .sql import DailyDutyHours
+from .rules import get_plan
+from .synthetic import PATTERNS, SyntheticFleet
+from .violations import ViolationTracker, violation_tracker
+from .writeback import CycleHoursWriter, cycle_hours_writer
+
+
+class HOSTestMixin:
+    """Shared fixtures for building a driver with a duty history"""
+
+    def create_driver(self, username='driver'):
+        company, _ = Company.objects.get_or_create(
+            dot_number='1234567',
+            defaults={'name': 'Test Carrier', 'main_office_address': 'Test Office'}
+        )
+        return CustomUser.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='password',
+            user_type='driver',
+            company=company
+        )
+
+    def add_status(self, driver, status, start_time, end_time=None):
+        daily_log, _ = DailyLog.objects.get_or_create(
+            driver=driver,
+            date=start_time.date(),
+            defaults={
+                'carrier': driver.company,
+                'main_office_address': 'Test Office',
+                'home_terminal_address': 'Test Terminal',
+                'vehicle_number': 'T-1',
+            }
+        )
+        return DutyStatusChange.objects.create(
+            daily_log=daily_log,
+            status=status,
+            start_time=start_time,
+            end_time=end_time,
+            location='Test'
+        )
+
+
+class HOSRuleEngineTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.driver = self.create_driver()
+        self.now = datetime(2025, 1, 10, 18, 0)
+
+    def test_sweep_tracks_every_rule_in_one_pass(self):
+        periods = [
+            ('off_duty', self.now - timedelta(hours=12), self.now - timedelta(hours=9)),
+            ('driving', self.now - timedelta(hours=9), self.now - timedelta(hours=4)),
+            ('off_duty', self.now - timedelta(hours=4), self.now - timedelta(hours=3, minutes=30)),
+            ('driving', self.now - timedelta(hours=3, minutes=30), None),
+        ]
+        totals = HOSRuleEngine.sweep(periods, self.now)
+
+        self.assertEqual(totals['driving_seconds'], 8.5 * 3600)
+        self.assertEqual(totals['window_start'], self.now - timedelta(hours=9))
+        self.assertEqual(totals['cycle_seconds'], 8.5 * 3600)
+        self.assertTrue(totals['break_taken'])
+
+    def test_window_is_anchored_on_last_ten_hour_reset(self):
+        periods = [
+            ('driving', self.now - timedelta(hours=30), self.now - timedelta(hours=24)),
+            ('off_duty', self.now - timedelta(hours=24), self.now - timedelta(hours=18)),
+            ('sleeper_berth', self.now - timedelta(hours=18), self.now - timedelta(hours=13)),
+            ('on_duty', self.now - timedelta(hours=13), self.now - timedelta(hours=12)),
+            ('driving', self.now - timedelta(hours=12), None),
+        ]
+        totals = HOSRuleEngine.sweep(periods, self.now)
+        results = HOSRuleEngine.evaluate_rules(totals, self.now)
+
+        self.assertEqual(totals['last_reset_at'], self.now - timedelta(hours=13))
+        self.assertEqual(totals['window_start'] + timedelta(hours=14), self.now + timedelta(hours=1))
+        self.assertEqual(results[0]['remaining_time'], 1)
+        self.assertEqual(totals['window_overrun_seconds'], 0)
+
+        later = self.now + timedelta(hours=2)
+        self.assertEqual(HOSRuleEngine.sweep(periods, later)['window_overrun_seconds'], 3600)
+
+    def test_split_sleeper_pair_excludes_both_rest_periods(self):
+        periods = [
+            ('driving', self.now - timedelta(hours=20), self.now - timedelta(hours=15)),
+            ('sleeper_berth', self.now - timedelta(hours=15), self.now - timedelta(hours=7)),
+            ('driving', self.now - timedelta(hours=7), self.now - timedelta(hours=3)),
+            ('off_duty', self.now - timedelta(hours=3), self.now - timedelta(hours=1)),
+            ('driving', self.now - timedelta(hours=1), None),
+        ]
+        totals = HOSRuleEngine.sweep(periods, self.now)
+        results = HOSRuleEngine.evaluate_rules(totals, self.now)
+
+        # 8/2 split: 4 hours driven between the two periods, 1 after the second
+        self.assertEqual(totals['driving_seconds'], 5 * 3600)
+        self.assertEqual(results[0]['window_ends_at'], self.now + timedelta(hours=9))
+        self.assertEqual(results[0]['split_sleeper_pair'], {
+            'first_start': self.now - timedelta(hours=15),
+            'first_end': self.now - timedelta(hours=7),
+            'second_start': self.now - timedelta(hours=3),
+            'second_end': self.now - timedelta(hours=1),
+        })
+
+    def test_restart_clears_cycle_and_rule_set_sets_limit(self):
+        periods = [
+            ('on_duty', self.now - timedelta(days=5), self.now - timedelta(days=4)),
+            ('off_duty', self.now - timedelta(days=4), self.now - timedelta(hours=60)),
+            ('on_duty', self.now - timedelta(hours=60), self.now - timedelta(hours=50)),
+            ('off_duty', self.now - timedelta(hours=50), self.now - timedelta(hours=10)),
+            ('on_duty', self.now - timedelta(hours=10), None),
+        ]
+        plan = get_plan('property_60_7')
+        totals = HOSRuleEngine.sweep(periods, self.now, plan)
+        results = HOSRuleEngine.evaluate_rules(totals, self.now, plan)
+
+        self.assertEqual(totals['last_restart_at'], self.now - timedelta(hours=10))
+        self.assertEqual(totals['cycle_seconds'], 10 * 3600)
+        self.assertEqual(results[-1]['remaining_hours'], 50)
+
+    def test_driving_over_limit_is_reported_as_violation(self):
+        self.add_status(self.driver, 'driving', self.now - timedelta(hours=12), self.now)
+
+        report = HOSRuleEngine.calculate_compliance(self.driver, self.now)
+
+        self.assertFalse(report['is_compliant'])
+        self.assertIn('11_hour', [v['violation_type'] for v in report['violations']])
+        self.assertEqual(report['remaining_times']['cycle'], 58)
+
+
+@override_settings(HOS_CYCLE_FLUSH_SECONDS=0)
+class DriverHOSStateTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.driver = self.create_driver()
+        self.start = datetime(2025, 1, 10, 6, 0)
+
+    def test_advanced_state_matches_full_recalculation(self):
+        previous = None
+        for offset, status in [(0, 'on_duty'), (1, 'driving'), (6, 'off_duty'), (7, 'driving')]:
+            start_time = self.start + timedelta(hours=offset)
+            closed = []
+            if previous:
+                previous.end_time = start_time
+                previous.save()
+                closed.append((previous.status, previous.start_time, previous.end_time))
+            previous = self.add_status(self.driver, status, start_time)
+            DriverHOSState.advance(self.driver, closed, (status, start_time), start_time)
+
+        now = self.start + timedelta(hours=9)
+        state = DriverHOSState.for_driver(self.driver, now)
+
+        self.assertEqual(state.open_status, 'driving')
+        self.assertEqual(state.compliance_report(now), HOSRuleEngine.calculate_compliance(self.driver, now))
+
+    def test_expired_state_is_rebuilt(self):
+        self.add_status(self.driver, 'driving', self.start, self.start + timedelta(hours=2))
+        self.add_status(self.driver, 'off_duty', self.start + timedelta(hours=2))
+        state = DriverHOSState.rebuild(self.driver, self.start + timedelta(hours=2))
+
+        later = self.start + timedelta(hours=30)
+        self.assertTrue(state.is_stale(later))
+        with CaptureQueriesContext(connection) as queries:
+            report = DriverHOSState.for_driver(self.driver, later).compliance_report(later)
+        self.assertEqual(report['remaining_times']['driving'], 11)
+        # Recomputed for the read only: the stored row waits for the next write
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries.captured_queries))
+        self.assertEqual(DriverHOSState.objects.get(driver=self.driver).computed_at, self.start + timedelta(hours=2))
+    
+    def test_missing_state_is_computed_without_writing(self):
+        self.add_status(self.driver, 'driving', self.start, self.start + timedelta(hours=2))
+        now = self.start + timedelta(hours=3)
+        cycle_hours_writer.flush()
+        
+        report = DriverHOSState.for_driver(self.driver, now).compliance_report(now)
+        
+        self.assertEqual(report, HOSRuleEngine.calculate_compliance(self.driver, now))
+        self.assertFalse(DriverHOSState.objects.exists())
+        self.assertEqual(cycle_hours_writer.pending(), {})
+
+    def test_compliance_read_does_not_write(self):
+        self.add_status(self.driver, 'driving', self.start, self.start + timedelta(hours=2))
+
+        with CaptureQueriesContext(connection) as queries:
+            HOSRuleEngine.calculate_compliance(self.driver, self.start + timedelta(hours=3))
+
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries.captured_queries))
+
+    def test_cycle_hours_are_coalesced_into_one_bulk_update(self):
+        drivers = [self.driver, self.create_driver('second')]
+        for driver in drivers:
+            DriverProfile.objects.create(user=driver, home_terminal_address='Test Terminal')
+        writer = CycleHoursWriter(interval=0)
+        writer.record(drivers[0].id, 5)
+        writer.record(drivers[1].id, 7.5)
+        writer.record(drivers[0].id, 6.25)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(writer.flush(), 2)
+
+        self.assertEqual(writer.pending(), {})
+        self.assertEqual(float(DriverProfile.objects.get(user=drivers[0]).current_cycle_used), 6.25)
+        self.assertEqual(float(DriverProfile.objects.get(user=drivers[1]).current_cycle_used), 7.5)
+
+
+@override_settings(HOS_CYCLE_FLUSH_SECONDS=0)
+class ComplianceCacheTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.driver = self.create_driver()
+        self.start = datetime(2025, 1, 10, 6, 0)
+        self.cache = ComplianceCache()
+
+    def test_hit_is_projected_without_a_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_status(self.driver, 'driving', self.start)
+            DriverHOSState.rebuild(self.driver, self.start)
+        self.cache.report(self.driver, self.start + timedelta(hours=1))
+
+        later = self.start + timedelta(hours=2)
+        with self.assertNumQueries(0):
+            report = self.cache.report(self.driver, later)
+
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(report, HOSRuleEngine.calculate_compliance(self.driver, later))
+
+    def test_duty_change_bumps_revision(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            status = self.add_status(self.driver, 'driving', self.start)
+            DriverHOSState.rebuild(self.driver, self.start)
+        self.cache.report(self.driver, self.start + timedelta(hours=1))
+        state_id, revision = get_revision(self.driver.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            status.delete()
+
+        self.assertEqual(get_revision(self.driver.id), (state_id, revision + 1))
+        self.cache.report(self.driver, self.start + timedelta(hours=1))
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_state_written_in_this_process_invalidates_every_cache(self):
+        first, second = ComplianceCache(), ComplianceCache()
+        with self.captureOnCommitCallbacks(execute=True):
+            status = self.add_status(self.driver, 'driving', self.start)
+        now = self.start + timedelta(hours=3)
+        first.report(self.driver, now)
+        second.report(self.driver, now)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            status.end_time = self.start + timedelta(hours=2)
+            status.save()
+            self.add_status(self.driver, 'on_duty', status.end_time)
+            # As the status change views do
+            DriverHOSState.rebuild(self.driver, now)
+
+        for cache in (first, second):
+            self.assertEqual(cache.report(self.driver, now), HOSRuleEngine.calculate_compliance(self.driver, now))
+            self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_other_process_writes_are_seen_once_the_entry_is_revalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_status(self.driver, 'driving', self.start)
+            DriverHOSState.rebuild(self.driver, self.start)
+        now = self.start + timedelta(hours=1)
+        self.cache.report(self.driver, now)
+        checked_at = self.cache._entries[self.driver.id][3]
+
+        # Bumped by another process: nothing is sent in this one
+        DriverHOSState.objects.filter(driver=self.driver).update(revision=F('revision') + 1)
+        self.cache.report(self.driver, now)
+        with mock.patch('hos.cache.monotonic', return_value=checked_at + self.cache.revalidate_seconds):
+            self.cache.report(self.driver, now)
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_rebuilt_state_does_not_match_old_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_status(self.driver, 'driving', self.start)
+            DriverHOSState.rebuild(self.driver, self.start)
+        self.cache.report(self.driver, self.start + timedelta(hours=1))
+
+        DriverHOSState.objects.filter(driver=self.driver).delete()
+        with mock.patch('hos.cache.monotonic', return_value=monotonic() + self.cache.revalidate_seconds):
+            self.cache.report(self.driver, self.start + timedelta(hours=1))
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_memory_ceiling_evicts_least_recently_used(self):
+        drivers = [self.driver, self.create_driver('second'), self.create_driver('third')]
+        self.cache.report(drivers[0], self.start)
+        # Room for two entries of about this size, not three
+        self.cache.max_bytes = self.cache._size * 5 // 2
+        self.cache.report(drivers[1], self.start)
+        self.cache.report(drivers[0], self.start)
+        self.cache.report(drivers[2], self.start)
+
+        self.assertEqual(list(self.cache._entries), [drivers[0].id, drivers[2].id])
+
+
+class ViolationProjectorTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.driver = self.create_driver()
+        self.now = datetime(2025, 1, 10, 12, 0)
+        self.periods = [
+            ('off_duty', self.now - timedelta(hours=14), self.now - timedelta(hours=4)),
+            ('on_duty', self.now - timedelta(hours=4), self.now - timedelta(hours=3)),
+            ('driving', self.now - timedelta(hours=3), None),
+        ]
+
+    def test_keep_driving_instants(self):
+        instants = ViolationProjector(self.periods, self.now).project([('driving', 12 * 60)])
+
+        self.assertEqual(instants['break'], self.now + timedelta(hours=5))
+        self.assertEqual(instants['11_hour'], self.now + timedelta(hours=8))
+        self.assertEqual(instants['14_hour'], self.now + timedelta(hours=10))
+        self.assertIsNone(instants['70_hour'])
+
+    def test_break_and_rest_push_violations_back(self):
+        instants = ViolationProjector(self.periods, self.now).project([
+            ('driving', 4 * 60), ('off_duty', 30), ('driving', 3 * 60), ('on_duty', 3 * 60),
+            ('driving', 30), ('sleeper_berth', 10 * 60),
+        ])
+
+        self.assertIsNone(instants['break'])
+        self.assertIsNone(instants['11_hour'])
+        self.assertEqual(instants['14_hour'], self.now + timedelta(hours=10, minutes=30))
+        self.assertEqual(instants['ends_at'], self.now + timedelta(hours=21))
+
+    def test_projection_endpoint(self):
+        now = timezone.now().replace(microsecond=0)
+        self.add_status(self.driver, 'off_duty', now - timedelta(hours=14), now - timedelta(hours=3))
+        self.add_status(self.driver, 'driving', now - timedelta(hours=3))
+        client = APIClient()
+        client.force_authenticate(self.driver)
+
+        response = client.post(reverse('hos-compliance-projection'), {'scenarios': [
+            {'name': 'rest', 'statuses': [{'status': 'off_duty', 'minutes': 600}]},
+            {'name': 'drive', 'statuses': [{'status': 'driving', 'minutes': 600}]},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        rest, drive = response.data['scenarios']
+        self.assertIsNone(rest['11_hour'])
+        self.assertAlmostEqual((drive['11_hour'] - response.data['calculation_time']).total_seconds(), 8 * 3600, delta=5)
+        self.assertEqual(client.post(reverse('hos-compliance-projection'), {'scenarios': [
+            {'statuses': [{'status': 'flying', 'minutes': 10}]}
+        ]}, format='json').status_code, 400)
+
+
+class ViolationBackfillTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.drivers = [self.create_driver('first'), self.create_driver('second')]
+        self.start = datetime(2025, 1, 10, 6, 0)
+        for driver in self.drivers:
+            self.add_status(driver, 'driving', self.start, self.start + timedelta(hours=8))
+            self.add_status(driver, 'driving', self.start + timedelta(hours=8), self.start + timedelta(hours=12))
+            self.add_status(driver, 'off_duty', self.start + timedelta(hours=12), self.start + timedelta(hours=22))
+
+    def test_backfill_stores_violations_once(self):
+        checkpoint = ViolationBackfill(batch_size=1).run()
+
+        self.assertEqual(checkpoint.periods_processed, 6)
+        self.assertEqual(checkpoint.violations_created, 4)
+        self.assertEqual(checkpoint.last_driver_id, self.drivers[1].id)
+        # Stamped where the limit was crossed, resolved where the rule cleared
+        self.assertEqual(
+            sorted(HOSViolation.objects.filter(driver=self.drivers[0]).values_list(
+                'violation_type', 'violation_time', 'is_resolved', 'resolved_at'
+            )),
+            [
+                ('11_hour', self.start + timedelta(hours=11), True, self.start + timedelta(hours=22)),
+                ('break', self.start + timedelta(hours=8), True, self.start + timedelta(hours=12)),
+            ]
+        )
+        self.assertFalse(OpenViolation.objects.exists())
+
+        rerun = ViolationBackfill().run(restart=True)
+        self.assertEqual(rerun.violations_created, 0)
+        self.assertEqual(HOSViolation.objects.count(), 4)
+
+    def test_backfill_resumes_after_checkpoint(self):
+        ViolationBackfill().run()
+        HOSViolation.objects.filter(driver=self.drivers[1]).delete()
+
+        checkpoint = ViolationBackfill().run()
+
+        self.assertEqual(checkpoint.periods_processed, 6)
+        self.assertFalse(HOSViolation.objects.filter(driver=self.drivers[1]).exists())
+
+    def test_backfill_matches_the_live_tracker(self):
+        driver = self.create_driver('live')
+        self.add_status(driver, 'driving', self.start)
+        DriverHOSState.rebuild(driver, self.start + timedelta(hours=12))
+        live = sorted(HOSViolation.objects.filter(driver=driver).values_list('violation_type', 'violation_time', 'is_resolved'))
+        entries = sorted(OpenViolation.objects.filter(driver=driver).values_list('violation_type', 'violation_id'))
+        self.assertEqual(live, [('11_hour', self.start + timedelta(hours=11), False)])
+
+        ViolationBackfill(current_time=self.start + timedelta(hours=12)).run()
+
+        self.assertEqual(
+            sorted(HOSViolation.objects.filter(driver=driver).values_list('violation_type', 'violation_time', 'is_resolved')),
+            live
+        )
+        self.assertEqual(sorted(OpenViolation.objects.filter(driver=driver).values_list('violation_type', 'violation_id')), entries)
+
+    def test_backfill_indexes_violations_in_progress_for_the_live_tracker(self):
+        driver = self.create_driver('live')
+        status = self.add_status(driver, 'driving', self.start)
+        end = self.start + timedelta(hours=12)
+
+        ViolationBackfill(current_time=end).run()
+        self.assertEqual(list(violation_tracker.open_ids(driver.id)), ['11_hour'])
+
+        status.end_time = end
+        status.save()
+        self.add_status(driver, 'off_duty', end, end + timedelta(hours=10))
+        DriverHOSState.rebuild(driver, end + timedelta(hours=10))
+
+        self.assertEqual(violation_tracker.open_ids(driver.id), {})
+        self.assertEqual(
+            set(HOSViolation.objects.filter(driver=driver).values_list('is_resolved', 'resolved_at')),
+            {(True, end + timedelta(hours=10))}
+        )
+
+    def test_open_status_ends_at_each_drivers_local_now(self):
+        # Kigali, the server zone, is six or seven hours ahead of New York
+        driver = self.create_driver('eastern')
+        DriverProfile.objects.create(
+            user=driver, home_terminal_address='Test Terminal', home_terminal_timezone='America/New_York'
+        )
+        now = driver_now(driver)
+        self.add_status(driver, 'off_duty', now - timedelta(hours=20), now - timedelta(hours=7))
+        self.add_status(driver, 'driving', now - timedelta(hours=7))
+
+        ViolationBackfill().run()
+
+        self.assertFalse(HOSViolation.objects.filter(driver=driver).exists())
+
+
+class ViolationTrackerTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.driver = self.create_driver()
+        self.start = datetime(2025, 1, 10, 6, 0)
+        self.add_status(self.driver, 'driving', self.start, self.start + timedelta(hours=12))
+
+    def report(self, hours):
+        return HOSRuleEngine.calculate_compliance(self.driver, self.start + timedelta(hours=hours))
+
+    def test_repeated_reports_write_once(self):
+        self.assertEqual(violation_tracker.record(self.driver.id, self.report(12)), (['11_hour'], []))
+
+        report = self.report(13)
+        with self.assertNumQueries(1):
+            self.assertEqual(violation_tracker.record(self.driver.id, report), ([], []))
+        self.assertEqual(HOSViolation.objects.count(), 1)
+        self.assertEqual(OpenViolation.objects.count(), 1)
+
+    def test_cleared_rule_is_resolved(self):
+        violation_tracker.record(self.driver.id, self.report(12))
+        self.add_status(self.driver, 'off_duty', self.start + timedelta(hours=12), self.start + timedelta(hours=23))
+
+        self.assertEqual(violation_tracker.record(self.driver.id, self.report(23)), ([], ['11_hour']))
+
+        self.assertFalse(OpenViolation.objects.exists())
+        self.assertEqual(
+            set(HOSViolation.objects.values_list('is_resolved', 'resolved_at')),
+            {(True, self.start + timedelta(hours=23))}
+        )
+
+    def test_resolved_violation_is_detected_again(self):
+        violation_tracker.record(self.driver.id, self.report(12))
+        violation = violation_tracker.open_violations(self.driver.id).get()
+
+        ViolationTracker().resolve(violation, self.start + timedelta(hours=13))
+
+        self.assertEqual(violation_tracker.open_ids(self.driver.id), {})
+        started, _ = violation_tracker.record(self.driver.id, self.report(14))
+        self.assertEqual(started, ['11_hour'])
+
+    def test_status_change_records_the_crossing_instant(self):
+        driver, start = self.create_driver('second'), self.start + timedelta(hours=1)
+        status = self.add_status(driver, 'driving', start)
+        DriverHOSState.rebuild(driver, start)
+        self.assertFalse(OpenViolation.objects.filter(driver=driver).exists())
+
+        end = start + timedelta(hours=12)
+        status.end_time = end
+        status.save()
+        self.add_status(driver, 'off_duty', end)
+        DriverHOSState.advance(driver, [('driving', start, end)], ('off_duty', end), end)
+
+        violation = violation_tracker.open_violations(driver.id).get()
+        self.assertEqual(violation.violation_type, '11_hour')
+        self.assertEqual(violation.violation_time, start + timedelta(hours=11))
+
+    def test_rebuild_records_the_crossing_instant(self):
+        DriverHOSState.rebuild(self.driver, self.start + timedelta(hours=13))
+
+        violation = violation_tracker.open_violations(self.driver.id).get()
+        self.assertEqual(violation.violation_time, self.start + timedelta(hours=11))
+
+    def test_compliance_reads_do_not_write_violations(self):
+        now = timezone.now().replace(microsecond=0)
+        self.add_status(self.driver, 'driving', now - timedelta(hours=12))
+        HOSViolation.objects.create(
+            driver=self.driver, violation_type='70_hour', violation_time=self.start, description='Old'
+        )
+        client = APIClient()
+        client.force_authenticate(self.driver)
+
+        current = client.get(reverse('hos-compliance-current'))
+        response = client.get(reverse('hos-compliance-violations'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(current.data['violations'][0]['violation_type'], '11_hour')
+        self.assertEqual(response.data, [])
+        self.assertEqual(HOSViolation.objects.count(), 1)
+        self.assertFalse(OpenViolation.objects.exists())
+
+
+class FleetComplianceTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.now = datetime(2025, 1, 10, 18, 0)
+        self.drivers = [self.create_driver(f'driver{index}') for index in range(3)]
+        self.add_status(self.drivers[0], 'driving', self.now - timedelta(hours=12), self.now - timedelta(hours=2))
+        self.add_status(self.drivers[0], 'on_duty', self.now - timedelta(hours=2))
+        self.add_status(self.drivers[1], 'driving', self.now - timedelta(hours=13), self.now)
+        self.add_status(self.drivers[1], 'off_duty', self.now - timedelta(days=3), self.now - timedelta(days=2))
+
+    def test_fleet_table_matches_per_driver_reports(self):
+        with self.assertNumQueries(2):
+            calculator = FleetComplianceCalculator.for_company(self.drivers[0].company, self.now)
+            table = calculator.fleet_table()
+
+        self.assertEqual(len(table), 3)
+        for row, driver in zip(table, self.drivers):
+            report = HOSRuleEngine.calculate_compliance(driver, self.now)
+            self.assertEqual(row['is_compliant'], report['is_compliant'])
+            self.assertEqual(row['remaining_times'], report['remaining_times'])
+
+
+class DailyDutyHoursTests(HOSTestMixin, TestCase):
+    def setUp(self):
+        self.now = datetime(2025, 1, 10, 12, 0)
+        self.company, _, self.drivers = SyntheticFleet(
+            drivers=len(PATTERNS), days=6, seed=3, end_time=self.now
+        ).create()
+        # A 34-hour restart spanning two midnights
+        restart = self.create_driver('restart')
+        restart.company = self.company
+        restart.save()
+        self.add_status(restart, 'driving', self.now - timedelta(days=4), self.now - timedelta(days=3, hours=16))
+        self.add_status(restart, 'off_duty', self.now - timedelta(days=3, hours=16), self.now - timedelta(days=2, hours=6))
+        self.add_status(restart, 'on_duty', self.now - timedelta(days=2, hours=6))
+        self.drivers.append(restart)
+
+    def test_rows_match_python_engine(self):
+        start_date, end_date = self.now.date() - timedelta(days=1), self.now.date()
+        with self.assertNumQueries(2):
+            rows = DailyDutyHours.for_company(self.company, start_date, end_date, self.now).rows()
+
+        self.assertEqual(len(rows), len(self.drivers) * 2)
+        for driver in self.drivers:
+            plan = HOSRuleEngine.plan_for_driver(driver)
+            timeline = DutyTimeline.for_driver(driver, current_time=self.now)
+            driver_rows = [row for row in rows if row['driver'] == driver.id]
+            for row in driver_rows:
+                day = timeline.clip_to_day(row['date'])
+                self.assertEqual(row['driving_seconds'], day.total_seconds(['driving']))
+                self.assertEqual(row['on_duty_seconds'], day.total_seconds(['driving', 'on_duty']))
+                # The cycle days, from the last restart if one ended in them
+                tomorrow = datetime.combine(row['date'] + timedelta(days=1), datetime.min.time())
+                cycle_start = max(tomorrow - timedelta(days=plan.cycle_days), row['last_restart_at'] or datetime.min)
+                self.assertEqual(
+                    row['cycle_on_duty_seconds'], timeline.clip(cycle_start, tomorrow).total_seconds(['driving', 'on_duty'])
+                )
+
+            totals = HOSRuleEngine.sweep(timeline, self.now, plan)
+            self.assertEqual(driver_rows[-1]['last_reset_at'], totals['last_reset_at'])
+            self.assertEqual(driver_rows[-1]['last_restart_at'], totals['last_restart_at'])
+        self.assertEqual(rows[-1]['last_restart_at'], self.now - timedelta(days=2, hours=6))
+
+    def test_cycle_starts_over_at_a_restart_like_the_engine(self):
+        restart = self.drivers[-1]
+        rows = DailyDutyHours(
+            CustomUser.objects.filter(id=restart.id), self.now.date(), self.now.date(), self.now
+        ).rows()
+        report = HOSRuleEngine.calculate_compliance(restart, self.now)
+
+        # 8 hours driven before the restart, 54 on duty since
+        self.assertEqual(rows[0]['cycle_on_duty_seconds'], 54 * 3600)
+        self.assertAlmostEqual(report['remaining_times']['cycle'], 70 - rows[0]['cycle_on_duty_seconds'] / 3600)
+
+    @skipUnless(connection.vendor == 'postgresql', 'runs the PostgreSQL dialect (CI database)')
+    def test_postgresql_dialect_matches_python_engine(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.test_rows_match_python_engine()
+            self.test_cycle_starts_over_at_a_restart_like_the_engine()
+        self.assertTrue(any('EXTRACT(EPOCH FROM' in query['sql'] for query in queries.captured_queries))
+
+    def test_endpoint_is_for_managers(self):
+        client = APIClient()
+        client.force_authenticate(self.drivers[0])
+        self.assertEqual(client.get(reverse('hos-compliance-daily-hours')).status_code, 403)
+
+        manager = CustomUser.objects.get(company=self.company, user_type='manager')
+        client.force_authenticate(manager)
+        response = client.get(reverse('hos-compliance-daily-hours'), {'start_date': '2025-01-09', 'end_date': '2025-01-10'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['rows']), len(self.drivers) * 2)
+
+
+class BenchmarkTests(TestCase):
+    def test_synthetic_fleet_is_reproducible_and_contiguous(self):
+        end_time = datetime(2025, 1, 10, 12, 0)
+        fleet = SyntheticFleet(drivers=len(PATTERNS), days=3, seed=7, end_time=end_time)
+        again = SyntheticFleet(drivers=len(PATTERNS), days=3, seed=7, end_time=end_time)
+
+        for index in range(len(PATTERNS)):
+            pattern, periods = fleet.driver_periods(index)
+            self.assertEqual((pattern, periods), again.driver_periods(index))
+            self.assertEqual(periods[0][1], fleet.start_time)
+            self.assertEqual(periods[-1][2], end_time)
+            for previous, period in zip(periods, periods[1:]):
+                self.assertEqual(previous[2], period[1])
+                self.assertEqual(period[1].date(), (period[2] - timedelta(microseconds=1)).date())
+
+    def test_suite_records_cases_and_leaves_no_rows(self):
+        results = BenchmarkSuite(sizes=((4, 2),), repeat=1).run()
+
+        self.assertEqual(results['cases']['engine.fleet_table[4x2]']['queries'], 2)
+        # Query budgets hold on every run; wall time is left to hos_benchmark
+        self.assertEqual(over_budget(results, fields=('queries',)), [])
+        self.assertEqual(
+            over_budget({'cases': {'api.driver_stats[4x2]': {'ms': 11.0, 'queries': 2}}}),
+            [('api.driver_stats[4x2]', 'ms', 10.0, 11.0)]
+        )
+        self.assertIn('api.driver_stats[4x2]', results['cases'])
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertEqual(compare(results, results), [])
+
+        slower = {'cases': {key: dict(case, ms=case['ms'] * 3 + 2) for key, case in results['cases'].items()}}
+        self.assertIn(('engine.fleet_table[4x2]', 'ms'), [regression[:2] for regression in compare(slower, results)])
+
+
+class EquivalenceHarnessTests(TestCase):
+    def test_engines_match_the_reference(self):
+        harness = EquivalenceHarness(examples=15, seed=3)
+        results = harness.run()
+
+        self.assertEqual(harness.failures, [])
+        self.assertEqual(set(results), set(ENGINES))
+        for cases in results.values():
+            self.assertEqual(set(cases), set(CASE_CLASSES))
+            self.assertTrue(all(stats['examples'] == 15 for stats in cases.values()))
+
+    def test_counterexamples_are_shrunk_saved_and_replayed(self):
+        def drops_last_period(periods, current_time, plan):
+            return reference_engine(periods[:-1], current_time, plan)
+
+        with tempfile.TemporaryDirectory() as directory:
+            harness = EquivalenceHarness(
+                engines={'broken': drops_last_period}, cases={'random': CASE_CLASSES['random']},
+                examples=10, seed=1, fixture_dir=directory
+            )
+            harness.run()
+
+            self.assertTrue(harness.failures)
+            failure = harness.failures[0]
+            self.assertEqual(len(failure['periods']), 1)
+            self.assertTrue(os.path.exists(failure['path']))
+
+            replay = EquivalenceHarness(
+                engines={'broken': drops_last_period}, cases={}, fixture_dir=directory
+            )
+            results = replay.run()
+            self.assertEqual(results['broken']['fixtures']['failures'], len(os.listdir(directory)))
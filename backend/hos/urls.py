@@ -7,6 +7,9 @@ router.register(r'violations', views.HOSViolationViewSet, basename='hos-violatio
 
 urlpatterns = [
     path('compliance/', views.HOSComplianceViewSet.as_view({'get': 'current'}), name='hos-compliance-current'),
+    path('compliance/fleet/', views.HOSComplianceViewSet.as_view({'get': 'fleet'}), name='hos-compliance-fleet'),
+    path('compliance/daily-hours/', views.HOSComplianceViewSet.as_view({'get': 'daily_hours'}), name='hos-compliance-daily-hours'),
+    path('compliance/projection/', views.HOSComplianceViewSet.as_view({'post': 'projection'}), name='hos-compliance-projection'),
     path('compliance/violations/', views.HOSComplianceViewSet.as_view({'get': 'violations'}), name='hos-compliance-violations'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
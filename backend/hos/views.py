@@ -1,11 +1,22 @@
 #hos/views.py
 
+from datetime import timedelta
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import NotSupportedError
 from django.utils import timezone
-from .models import HOSViolation, HOSRuleEngine
-from .serializers import HOSViolationSerializer
+from django.utils.dateparse import parse_date
+from .models import HOSViolation
+from .serializers import HOSViolationSerializer, ProjectionSerializer
+from .fleet import FleetComplianceCalculator
+from .cache import compliance_cache
+from .projection import ViolationProjector
+from .sql import DailyDutyHours
+from .violations import violation_tracker
+from eld.timezones import driver_today
+from users.models import CustomUser
 
 class HOSComplianceViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -13,13 +24,91 @@ class HOSComplianceViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def current(self, request):
         """Get current HOS compliance status"""
-        compliance_report = HOSRuleEngine.calculate_compliance(request.user)
-        return Response(compliance_report)
+        # Cached per duty revision; a hit only projects the stored state to now
+        return Response(compliance_cache.report(request.user))
+    
+    def _fleet_drivers(self, request):
+        """Drivers a manager or admin may report on, None for anyone else"""
+        if request.user.user_type == 'manager':
+            return CustomUser.objects.filter(user_type='driver', company=request.user.company).order_by('id')
+        if request.user.user_type == 'admin':
+            drivers = CustomUser.objects.filter(user_type='driver').order_by('id')
+            if request.query_params.get('company'):
+                drivers = drivers.filter(company_id=request.query_params['company'])
+            return drivers
+        return None
+    
+    @action(detail=False, methods=['get'])
+    def fleet(self, request):
+        """Get HOS compliance for every driver of the fleet (manager and admin only)"""
+        drivers = self._fleet_drivers(request)
+        if drivers is None:
+            return Response(
+                {'error': 'Admin or Manager access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        calculator = FleetComplianceCalculator(drivers)
+        
+        return Response({
+            'calculation_time': calculator.current_time,
+            'drivers': calculator.fleet_table()
+        })
+    
+    @action(detail=False, methods=['get'])
+    def daily_hours(self, request):
+        """Daily duty hours, cycle hours and resets per driver, evaluated in the database"""
+        drivers = self._fleet_drivers(request)
+        if drivers is None:
+            return Response(
+                {'error': 'Admin or Manager access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        end_date = parse_date(request.query_params.get('end_date') or '') or driver_today(request.user)
+        start_date = parse_date(request.query_params.get('start_date') or '') or end_date - timedelta(days=7)
+        if start_date > end_date:
+            return Response(
+                {'error': 'start_date must not be after end_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            rows = DailyDutyHours(drivers, start_date, end_date).rows()
+        except NotSupportedError as error:
+            return Response({'error': str(error)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        
+        return Response({'start_date': start_date, 'end_date': end_date, 'rows': rows})
+    
+    @action(detail=False, methods=['post'])
+    def projection(self, request):
+        """Project when each HOS rule would be violated under what-if status sequences"""
+        serializer = ProjectionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Without scenarios: what happens if the driver keeps driving from now
+        scenarios = serializer.validated_data.get('scenarios') or [
+            {'name': 'keep_driving', 'statuses': [{'status': 'driving', 'minutes': 24 * 60}]}
+        ]
+        projector = ViolationProjector.for_driver(request.user)
+        
+        return Response({
+            'calculation_time': projector.current_time,
+            'rule_set': projector.plan.key,
+            'scenarios': [
+                {
+                    'name': scenario.get('name', ''),
+                    **projector.project([(item['status'], item['minutes']) for item in scenario['statuses']])
+                }
+                for scenario in scenarios
+            ]
+        })
     
     @action(detail=False, methods=['get'])
     def violations(self, request):
         """Get HOS violations"""
-        violations = HOSViolation.objects.filter(driver=request.user, is_resolved=False)
+        # Recorded where duty status is written; read through the open-violation
+        # index, not the whole violation history
+        violations = violation_tracker.open_violations(request.user.id)
         serializer = HOSViolationSerializer(violations, many=True)
         return Response(serializer.data)
 
@@ -34,7 +123,5 @@ class HOSViolationViewSet(viewsets.ModelViewSet):
     def resolve(self, request, pk=None):
         """Mark violation as resolved"""
         violation = self.get_object()
-        violation.is_resolved = True
-        violation.resolved_at = timezone.now()
-        violation.save()
+        violation_tracker.resolve(violation, timezone.now())
         return Response({"message": "Violation marked as resolved"})
\ No newline at end of file
@@ -0,0 +1,106 @@
+# backend/hos/violations.py
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+
+from .models import HOSViolation, OpenViolation
+from .projection import ViolationProjector
+
+
+class ViolationTracker:
+    """
+    Persists HOS violations on transitions only, where duty status is
+    written (see DriverHOSState's state_written signal). A report's
+    violations are compared with the driver's open violations: a rule that
+    starts failing gets one HOSViolation row and an OpenViolation index
+    entry, a rule that clears resolves its row and leaves the index.
+    Compliance reads never write; the index is read from the database, so
+    every process sees the same open violations.
+    """
+
+    def open_ids(self, driver_id):
+        """{violation_type: HOSViolation id} of the driver's open violations"""
+        return dict(OpenViolation.objects.filter(driver_id=driver_id).values_list('violation_type', 'violation_id'))
+
+    def open_violations(self, driver_id):
+        return HOSViolation.objects.filter(id__in=self.open_ids(driver_id).values())
+
+    def detect(self, entries):
+        """
+        Record the transitions of freshly written HOS states. entries are
+        (state, since): a violation that starts is stamped with the instant
+        its limit was crossed after since, or after the driver's last reset
+        when the state was rebuilt.
+        """
+        entries = list(entries)
+        open_ids = defaultdict(dict)
+        for driver_id, violation_type, violation_id in OpenViolation.objects.filter(
+            driver_id__in=[state.driver_id for state, _ in entries]
+        ).values_list('driver_id', 'violation_type', 'violation_id'):
+            open_ids[driver_id][violation_type] = violation_id
+
+        for state, since in entries:
+            current_time = state.computed_at
+            report = state.compliance_report(current_time)
+            if not report['violations'] and not open_ids[state.driver_id]:
+                continue
+            instants = {}
+            if any(result['violation_type'] not in open_ids[state.driver_id] for result in report['violations']):
+                since = since or state.last_reset_at or current_time - state.plan.history
+                instants = ViolationProjector.first_violations(state.driver_id, since, current_time, state.plan)
+            for result in report['violations']:
+                result['violation_time'] = instants.get(result['violation_type']) or current_time
+            self._apply(state.driver_id, report, open_ids[state.driver_id])
+
+    def record(self, driver_id, report):
+        """Apply a compliance report; returns (started, cleared) violation types"""
+        return self._apply(driver_id, report, self.open_ids(driver_id))
+
+    def _apply(self, driver_id, report, open_ids):
+        violations = {result['violation_type']: result for result in report['violations']}
+        started = [violation_type for violation_type in violations if violation_type not in open_ids]
+        cleared = [violation_type for violation_type in open_ids if violation_type not in violations]
+        if not started and not cleared:
+            return [], []
+
+        try:
+            with transaction.atomic():
+                if cleared:
+                    HOSViolation.objects.filter(id__in=[open_ids[key] for key in cleared]).update(
+                        is_resolved=True, resolved_at=report['calculation_time']
+                    )
+                    OpenViolation.objects.filter(driver_id=driver_id, violation_type__in=cleared).delete()
+                for violation_type in started:
+                    violation, _ = HOSViolation.objects.get_or_create(
+                        driver_id=driver_id,
+                        violation_type=violation_type,
+                        violation_time=violations[violation_type]['violation_time'],
+                        defaults=self._fields(violations[violation_type])
+                    )
+                    OpenViolation.objects.create(
+                        driver_id=driver_id, violation_type=violation_type, violation=violation
+                    )
+        except IntegrityError:
+            # Another process recorded the same transition first
+            return [], []
+        return started, cleared
+
+    def resolve(self, violation, resolved_at):
+        """Resolve a violation by hand; it leaves the index until it is detected again"""
+        violation.is_resolved = True
+        violation.resolved_at = resolved_at
+        violation.save()
+        OpenViolation.objects.filter(violation=violation).delete()
+
+    @staticmethod
+    def _fields(result):
+        return {
+            'description': result['description'],
+            'remaining_driving': result.get('remaining_driving'),
+            'remaining_hours': result.get('remaining_hours'),
+            'remaining_time': result.get('remaining_time'),
+            'break_required': result.get('break_required'),
+        }
+
+
+violation_tracker = ViolationTracker()
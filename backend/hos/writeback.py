@@ -0,0 +1,72 @@
+# backend/hos/writeback.py
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+
+from users.models import DriverProfile
+
+
+class CycleHoursWriter:
+    """
+    Write-behind persistence of DriverProfile.current_cycle_used.
+    The HOS state records each driver's latest cycle hours here instead of
+    writing the profile; repeated updates for a driver coalesce to the last
+    value and the buffer is written with one bulk_update, either when a duty
+    status change commits or after HOS_CYCLE_FLUSH_SECONDS, whichever is first.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def record(self, driver_id, cycle_hours):
+        with self._lock:
+            self._pending[driver_id] = Decimal(str(round(cycle_hours, 2)))
+            if self._timer is None:
+                self._schedule()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """Write every buffered value in one bulk_update; returns the rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+
+        profiles = list(DriverProfile.objects.filter(user_id__in=list(pending)))
+        for profile in profiles:
+            profile.current_cycle_used = pending[profile.user_id]
+        DriverProfile.objects.bulk_update(profiles, ['current_cycle_used'])
+        return len(profiles)
+
+    def _schedule(self):
+        interval = self.interval
+        if interval is None:
+            interval = getattr(settings, 'HOS_CYCLE_FLUSH_SECONDS', 30)
+        if not interval:
+            return
+        self._timer = threading.Timer(interval, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own connection; don't leave it open
+            connection.close()
+
+
+cycle_hours_writer = CycleHoursWriter()
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_profile_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='hos_rule_set',
+            field=models.CharField(choices=[('property_70_8', 'Property-carrying 70 hours / 8 days'), ('property_60_7', 'Property-carrying 60 hours / 7 days'), ('short_haul', 'Short-haul 150 air-mile (70 hours / 8 days, no 30-minute break)')], default='property_70_8', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='driverprofile',
+            name='hos_rule_set',
+            field=models.CharField(blank=True, choices=[('property_70_8', 'Property-carrying 70 hours / 8 days'), ('property_60_7', 'Property-carrying 60 hours / 7 days'), ('short_haul', 'Short-haul 150 air-mile (70 hours / 8 days, no 30-minute break)')], default='', max_length=20),
+        ),
+    ]
@@ -2,12 +2,15 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
+from hos.rules import RULE_SET_CHOICES, DEFAULT_RULE_SET
+from eld.timezones import HOME_TERMINAL_TIMEZONES
 
 class Company(models.Model):
     name = models.CharField(max_length=255)
     main_office_address = models.TextField()
     dot_number = models.CharField(max_length=20, unique=True)
     mc_number = models.CharField(max_length=20, blank=True, null=True)
+    hos_rule_set = models.CharField(max_length=20, choices=RULE_SET_CHOICES, default=DEFAULT_RULE_SET)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -68,6 +71,11 @@ class DriverProfile(models.Model):
     current_cycle_used = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
     cycle_start_date = models.DateField(auto_now_add=True)
     is_eld_certified = models.BooleanField(default=False)
+    # Overrides the company's HOS rule set when set
+    hos_rule_set = models.CharField(max_length=20, choices=RULE_SET_CHOICES, blank=True, default='')
+    # Zone of the home terminal; duty times and day boundaries are wall-clock
+    # times there. Blank uses the server's TIME_ZONE
+    home_terminal_timezone = models.CharField(max_length=40, choices=HOME_TERMINAL_TIMEZONES, blank=True, default='')
     
     def __str__(self):
         return f"{self.user.get_full_name()}"
\ No newline at end of file
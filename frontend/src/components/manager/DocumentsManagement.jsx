@@ -15,12 +15,9 @@ const DocumentsManagement = () => {
   const loadDocuments = async () => {
     try {
       setLoading(true);
-      // Get all daily logs from all drivers
-      const response = await apiService.eld.getDailyLogs();
-      const logs = response.data || [];
-      
-      // Filter only finalized logs (those that can have PDFs)
-      const finalizedLogs = logs.filter(log => log.is_finalized);
+      // Get every finalized daily log (those that can have PDFs), page by page
+      const response = await apiService.eld.getAllDailyLogs({ is_finalized: true });
+      const finalizedLogs = response.data || [];
       
       // Sort by date (most recent first)
       finalizedLogs.sort((a, b) => new Date(b.date) - new Date(a.date));
@@ -23,10 +23,10 @@ export const useELD = (date = new Date()) => {
       
       // Essayer de récupérer le log d'aujourd'hui
       const todayStr = date.toISOString().split('T')[0];
-      const response = await apiService.eld.getDailyLogs();
+      const response = await apiService.eld.getDailyLogs({ start_date: todayStr, end_date: todayStr });
       
       // Trouver le log pour la date sélectionnée
-      const logForDate = response.data.find(log => {
+      const logForDate = response.data.results.find(log => {
         const logDate = new Date(log.date).toISOString().split('T')[0];
         return logDate === todayStr;
       });
@@ -37,7 +37,7 @@ const ManagerDashboard = () => {
       setLoading(true);
       const [driversRes, logsRes] = await Promise.all([
         apiService.users.getAllUsers().catch(() => ({ data: [] })),
-        apiService.eld.getDailyLogs().catch(() => ({ data: [] }))
+        apiService.eld.getAllDailyLogs().catch(() => ({ data: [] }))
       ]);
 
       const drivers = driversRes.data.filter(u => u.user_type === 'driver');
@@ -73,6 +73,17 @@ api.interceptors.response.use(
   }
 );
 
+// Follow a paginated list's `next` links until the last page; resolves to { data: [...all results] }
+const getAllPages = async (url, params) => {
+  let response = await api.get(url, { params: { page_size: 500, ...params } });
+  const results = [...response.data.results];
+  while (response.data.next) {
+    response = await api.get(response.data.next);
+    results.push(...response.data.results);
+  }
+  return { data: results };
+};
+
 export const apiService = {
   // Auth - UNIQUEMENT les endpoints d'authentification
   auth: {
@@ -99,7 +110,8 @@ export const apiService = {
 
   // Les autres services restent inchangés
   eld: {
-    getDailyLogs: () => api.get('/eld/daily-logs/'),
+    getDailyLogs: (params) => api.get('/eld/daily-logs/', { params }),
+    getAllDailyLogs: (params) => getAllPages('/eld/daily-logs/', params),
     getTodayLog: () => api.get('/eld/daily-logs/today/'),
     createDailyLog: (data) => api.post('/eld/daily-logs/', data),
     createStatusChange: (data) => api.post('/eld/duty-status-changes/', data),